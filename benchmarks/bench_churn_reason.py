@@ -0,0 +1,87 @@
+"""
+Compare per-user churn reason inference (one predict call per at-risk user) against the batched
+path in `total_and_categorial_churn`.
+
+Uses the shipped churn and reason models on random feature rows. The per-user loop is only timed
+up to --max-loop-users rows and extrapolated linearly beyond that. Run from the repository root:
+
+    python -m benchmarks.bench_churn_reason --users 1000 10000 100000
+"""
+import argparse
+import json
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features.churn import FEATURE_COLUMNS, SCORING_CHUNK_SIZE, predict_in_chunks
+
+
+def make_features(n_users: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    sessions = rng.integers(1, 20, n_users)
+    watch_time = rng.gamma(2.0, 8.0, n_users) * sessions
+    return pd.DataFrame({
+        'total_watch_time_7d': watch_time,
+        'total_sessions_7d': sessions,
+        'avg_watch_time_per_session_7d': watch_time / sessions,
+        'median_pauses_7d': rng.integers(0, 5, n_users).astype(float),
+        'median_buffer_events_7d': rng.integers(0, 5, n_users).astype(float),
+        'recommendation_accept_rate_7d': rng.random(n_users),
+        'genre_diversity_7d': rng.integers(1, 7, n_users),
+        'days_since_last_session': rng.integers(0, 30, n_users),
+    })[FEATURE_COLUMNS]
+
+
+def per_user(reason_model, features: pd.DataFrame) -> list:
+    return [reason_model.predict(features.iloc[idx:idx + 1])[0] for idx in range(len(features))]
+
+
+def batched(churn_model, reason_model, features: pd.DataFrame, chunk_size: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        'reason': predict_in_chunks(reason_model.predict, features, chunk_size),
+        'churn_probability': predict_in_chunks(
+            lambda chunk: churn_model.predict_proba(chunk)[:, 1], features, chunk_size
+        ),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--max-loop-users', type=int, default=10_000)
+    parser.add_argument('--chunk-size', type=int, default=SCORING_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    churn_model = joblib.load('models/churn_model.pkl')
+    reason_model = joblib.load('models/churn_reason_v2.pkl')
+
+    results = []
+    for n_users in args.users:
+        features = make_features(n_users)
+
+        start = time.perf_counter()
+        result = batched(churn_model, reason_model, features, args.chunk_size)
+        batched_seconds = time.perf_counter() - start
+
+        loop_users = min(n_users, args.max_loop_users)
+        start = time.perf_counter()
+        loop_reasons = per_user(reason_model, features.iloc[:loop_users])
+        loop_seconds = (time.perf_counter() - start) * n_users / loop_users
+
+        assert list(result['reason'][:loop_users]) == loop_reasons
+        results.append({
+            'users': n_users,
+            'per_user_seconds': loop_seconds,
+            'per_user_extrapolated': loop_users < n_users,
+            'batched_seconds': batched_seconds,
+            'speedup': loop_seconds / batched_seconds,
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
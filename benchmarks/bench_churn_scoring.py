@@ -0,0 +1,79 @@
+"""
+Compare peak memory and wall time of in-memory churn scoring (`total_and_categorial_churn` over
+the full event log) against sharded out-of-core scoring (`churn_scoring.score_store`).
+
+Each run happens in a fresh interpreter. The sharded runs score in-process (--workers 0) so the
+peak RSS shows the per-shard bound, and with a pool for the wall time. Run from the repository root:
+
+    python -m benchmarks.bench_churn_scoring --events 5000000 --users 500000 --shards 8 64
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import write_dataset
+
+IN_MEMORY = (
+    "from features.churn import total_and_categorial_churn\n"
+    "from storage.event_store import read_events\n"
+    "from storage.model_registry import load_model\n"
+    "events = read_events(root='data/events')\n"
+    "pct, users = total_and_categorial_churn(events, None, load_model('churn_model'), load_model('churn_reason_model'))\n"
+    "rows = len(users)\n"
+)
+
+SHARDED = (
+    "from features.churn_scoring import score_store\n"
+    "from storage.model_registry import load_model\n"
+    "results = score_store(load_model('churn_model'), load_model('churn_reason_model'),\n"
+    "                      n_shards={shards}, workers={workers}, root='data/events', results_dir='data/churn_results')\n"
+    "rows = len(results)\n"
+)
+
+MEASURE = (
+    "import os, sys, time, warnings, logging\n"
+    "warnings.filterwarnings('ignore')\n"
+    "logging.disable(logging.WARNING)\n"
+    "os.chdir(sys.argv[1])\n"
+    "sys.path.insert(0, sys.argv[2])\n"
+    "start = time.perf_counter()\n"
+    "{code}"
+    "elapsed = time.perf_counter() - start\n"
+    "hwm = [line for line in open('/proc/self/status') if line.startswith('VmHWM')][0]\n"
+    "print(rows, elapsed, hwm.split()[1])\n"
+)
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(root: str, code: str) -> dict:
+    out = subprocess.run([sys.executable, '-c', MEASURE.format(code=code), root, REPO],
+                         capture_output=True, text=True, check=True)
+    rows, seconds, hwm_kb = out.stdout.split()[-3:]
+    return {'at_risk_users': int(rows), 'seconds': float(seconds), 'peak_rss_mb': int(hwm_kb) / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=2_000_000)
+    parser.add_argument('--users', type=int, default=200_000)
+    parser.add_argument('--shards', type=int, nargs='+', default=[8, 64])
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        write_dataset(root, args.events, args.users, days=14)
+        results = {'in_memory': measure(root, IN_MEMORY)}
+        for shards in args.shards:
+            results[f'sharded_{shards}_in_process'] = measure(root, SHARDED.format(shards=shards, workers=0))
+            results[f'sharded_{shards}_{args.workers}_workers'] = measure(
+                root, SHARDED.format(shards=shards, workers=args.workers)
+            )
+    print(json.dumps({'events': args.events, 'users': args.users, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare cold-load time and peak RSS of the CSV events file against the Parquet event store.
+
+Each load runs in a fresh interpreter so neither path benefits from the other's imports or
+allocations. Run from the repository root:
+
+    python -m benchmarks.bench_event_store --events 1000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import make_events
+from storage.event_store import write_events
+
+LOADERS = {
+    'csv': (
+        "import pandas as pd\n"
+        "df = pd.read_csv({path!r})\n"
+        "df['login_time'] = pd.to_datetime(df['login_time'])\n"
+    ),
+    'parquet': (
+        "from storage.event_store import read_events\n"
+        "df = read_events(root={path!r})\n"
+    ),
+    'parquet_7d_2cols': (
+        "from storage.event_store import read_events\n"
+        "df = read_events(columns=['login_time', 'total_watch_time'], last_n_days=7, root={path!r})\n"
+    ),
+}
+
+# VmHWM is reset on exec, unlike ru_maxrss which keeps the forking parent's peak
+MEASURE = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "{loader}"
+    "elapsed = time.perf_counter() - start\n"
+    "hwm = [line for line in open('/proc/self/status') if line.startswith('VmHWM')][0]\n"
+    "print(len(df), elapsed, hwm.split()[1])\n"
+)
+
+
+def measure(loader: str, path: str) -> dict:
+    code = MEASURE.format(loader=loader.format(path=path))
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    rows, seconds, maxrss_kb = out.stdout.split()
+    return {'rows': int(rows), 'seconds': float(seconds), 'peak_rss_mb': int(maxrss_kb) / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        events = make_events(args.events, n_users=max(args.events // 50, 1), days=args.days)
+        csv_path = os.path.join(tmp, 'events.csv')
+        store_path = os.path.join(tmp, 'events')
+        events.to_csv(csv_path, index=False)
+        write_events(events, store_path)
+        del events
+
+        results = {
+            'csv': measure(LOADERS['csv'], csv_path),
+            'parquet': measure(LOADERS['parquet'], store_path),
+            'parquet_7d_2cols': measure(LOADERS['parquet_7d_2cols'], store_path),
+        }
+    print(json.dumps({'events': args.events, 'days': args.days, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
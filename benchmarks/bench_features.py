@@ -0,0 +1,166 @@
+"""
+Benchmark every dashboard feature function, and loading the dashboard data, at synthetic scale.
+
+For each event count a temporary data directory is filled with synthetic events, users and shows
+(see `synthetic.write_dataset`). Every target then runs in a fresh interpreter: its inputs are
+loaded through the dashboard's own registry, and only the call itself is timed. Peak memory is
+the process high-water mark, so it includes the inputs; setup_rss_mb is the resident size just
+before the call. rows_per_second is the event count over the call time for the targets that scan
+the events (EVENT_TARGETS), and null for those reading rollups or only a model. Everything runs offline. Run from the repository root:
+
+    python -m benchmarks.bench_features --events 10000 100000 1000000 --output bench.json
+
+Compare two commits by diffing their JSON outputs.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks.synthetic import REPO, write_dataset
+from storage.day_partitions import backfill
+from storage.rollups import RollupStore
+
+# Target -> (resources loaded before timing, timed call)
+TARGETS = {
+    'load_data': (
+        {},
+        "data = main.load_data()\n"
+        "data.load({name: name for name in [*FILE_RESOURCES, *MODEL_RESOURCES, *EVENT_RESOURCES, *DERIVED_RESOURCES, 'churn_state']})\n",
+    ),
+    'average_watchtime_for_7_days': (
+        {'events': 'events'},
+        "average_watchtime_for_7_days(events)\n",
+    ),
+    'get_top_watched_shows_last_week': (
+        {'events': 'events', 'shows': 'shows'},
+        "get_top_watched_shows_last_week(events, shows)\n",
+    ),
+    # Same results read from the rollups, rebuilt by `backfill` right after the data is generated
+    'average_watchtime_for_7_days_rollups': (
+        {},
+        "average_watchtime_for_7_days(RollupStore())\n",
+    ),
+    'get_top_watched_shows_last_week_rollups': (
+        {'shows': 'shows'},
+        "get_top_watched_shows_last_week(RollupStore(), shows)\n",
+    ),
+    'total_and_categorial_churn': (
+        {'events': 'events', 'users': 'users', 'churn_model': 'churn_model', 'churn_reason_model': 'churn_reason_model'},
+        "total_and_categorial_churn(events, users, churn_model, churn_reason_model)\n",
+    ),
+    'predicted_hourly_user_activity': (
+        {'events': 'events', 'timing_model': 'timing_model'},
+        "predicted_hourly_user_activity(events, timing_model)\n",
+    ),
+}
+
+# Targets whose call scans the events, the only ones with a rows_per_second. The rollup targets read
+# a few rows per day, hour, user or show, and the forecast only looks up the model's table.
+EVENT_TARGETS = {'load_data', 'average_watchtime_for_7_days', 'get_top_watched_shows_last_week', 'total_and_categorial_churn'}
+
+MEASURE = """
+import os, sys, time, warnings
+warnings.filterwarnings('ignore')
+os.chdir(sys.argv[1])
+sys.path.insert(0, {repo!r})
+import logging
+logging.disable(logging.WARNING)
+import main
+from dashboard_data import DERIVED_RESOURCES, EVENT_RESOURCES, FILE_RESOURCES, MODEL_RESOURCES
+from features.average_watchtime import average_watchtime_for_7_days
+from features.churn import total_and_categorial_churn
+from features.show_time import predicted_hourly_user_activity
+from features.top_shows import get_top_watched_shows_last_week
+from storage.rollups import RollupStore
+
+def rss_kb(field):
+    return int([line for line in open('/proc/self/status') if line.startswith(field)][0].split()[1])
+
+globals().update(main.load_data().load({inputs!r}))
+setup_kb = rss_kb('VmRSS')
+start = time.perf_counter()
+{call}
+elapsed = time.perf_counter() - start
+print(elapsed, setup_kb, rss_kb('VmHWM'))
+"""
+
+
+def measure(root: str, target: str) -> dict:
+    inputs, call = TARGETS[target]
+    code = MEASURE.format(repo=REPO, inputs=inputs, call=call)
+    out = subprocess.run([sys.executable, '-c', code, root], capture_output=True, text=True, check=True)
+    seconds, setup_kb, hwm_kb = out.stdout.split()[-3:]
+    return {
+        'seconds': float(seconds),
+        'setup_rss_mb': int(setup_kb) / 1024,
+        'peak_rss_mb': int(hwm_kb) / 1024,
+    }
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(n_events: int, n_users: int, n_shows: int, days: int, repeat: int, targets: list) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        write_dataset(root, n_events, n_users, n_shows, days)
+        if any(target.endswith('_rollups') for target in targets):
+            backfill(RollupStore(os.path.join(root, 'data', 'rollups')), events_root=os.path.join(root, 'data', 'events'))
+        for target in targets:
+            runs = [measure(root, target) for _ in range(repeat)]
+            best = min(runs, key=lambda result: result['seconds'])
+            results.append({
+                'target': target,
+                'events': n_events,
+                'users': n_users,
+                'shows': n_shows,
+                **best,
+                'rows_per_second': n_events / best['seconds'] if target in EVENT_TARGETS and best['seconds'] > 0 else None,
+            })
+            print(json.dumps(results[-1]), file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--users-per-event', type=float, default=0.02, help='Distinct users as a share of events')
+    parser.add_argument('--shows', type=int, default=200)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per target, the fastest is reported')
+    parser.add_argument('--targets', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': [
+            result
+            for n_events in args.events
+            for result in run(n_events, max(int(n_events * args.users_per_event), 1), args.shows, args.days,
+                              args.repeat, args.targets)
+        ],
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Measure the interned id tables (`UserTable`, categorical user columns, code based groupbys) against
+plain object columns and string keyed joins and groupbys.
+
+Memory: users are generated --chunk-size rows at a time, and every column is measured both as the
+object column the users table used to be loaded as and in its compact form. The object table is
+never held in full, so 10M users fit in a few GB.
+
+Speed: events over all users get a categorical user_id. The churn feature aggregations are timed
+grouped on the categorical column (as `churn_features` used to) and on its integer codes (as it does
+now). The country lookup of every event is timed as a map through a user_id indexed Series and
+through `UserTable.column`, whose id hash table is built once with the table (user_table_build).
+Run from the repository root:
+
+    python -m benchmarks.bench_id_codes --users 10000000 --events 20000000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from benchmarks.synthetic import GENRES, make_users
+from features.churn import churn_features
+from features.events import EventsDataset
+from features.user_table import UserTable
+from storage.user_store import CATEGORICAL_COLUMNS
+
+
+def mb(nbytes: int) -> float:
+    return round(nbytes / 2 ** 20, 1)
+
+
+def build_users(n_users: int, chunk_size: int):
+    """Compact users frame and the bytes every column would take as an object column"""
+    object_bytes = {}
+    chunks = []
+    for start in range(0, n_users, chunk_size):
+        chunk = make_users(min(chunk_size, n_users - start), seed=start)
+        # Same ids as one make_users(n_users) call
+        chunk['user_id'] = np.char.add('u', np.char.zfill(np.arange(start, start + len(chunk)).astype(str), 6)).astype(object)
+        chunk['email'] = chunk['user_id'] + '@example.org'
+        for column, nbytes in chunk.memory_usage(deep=True, index=False).items():
+            object_bytes[column] = object_bytes.get(column, 0) + int(nbytes)
+        for column in CATEGORICAL_COLUMNS:
+            chunk[column] = chunk[column].astype('category')
+        chunks.append(chunk)
+    users = pd.concat(chunks, ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        users[column] = union_categoricals([chunk[column] for chunk in chunks])
+    return users, object_bytes
+
+
+def make_events(user_ids: pd.Index, n_events: int, days: int = 7, seed: int = 0) -> pd.DataFrame:
+    """Events with the churn feature columns and a categorical user_id over every user, sorted by time"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp('2025-07-01')
+    login_time = end - pd.to_timedelta(np.sort(rng.integers(1, days * 24 * 60, n_events))[::-1], unit='min')
+    return pd.DataFrame({
+        'user_id': pd.Categorical.from_codes(rng.integers(0, len(user_ids), n_events).astype(np.int32),
+                                             dtype=pd.CategoricalDtype(user_ids)),
+        'login_time': login_time,
+        'genres_watched': pd.Categorical.from_codes(rng.integers(0, len(GENRES), n_events).astype(np.int8),
+                                                    categories=GENRES),
+        'total_watch_time': rng.gamma(2.0, 8.0, n_events).round(1),
+        'num_pauses': rng.poisson(1.5, n_events).astype(np.int32),
+        'buffer_events': rng.poisson(1.0, n_events).astype(np.int32),
+        'was_recommended': rng.random(n_events) < 0.4,
+    })
+
+
+def categorical_churn_features(events: EventsDataset) -> pd.DataFrame:
+    """The churn feature aggregations as they were computed before, grouped on the categorical user_id"""
+    frame = events.frame
+    agg = frame.groupby('user_id', observed=True).agg(
+        total_watch_time_7d=('total_watch_time', 'sum'),
+        total_sessions_7d=('user_id', 'count'),
+        avg_watch_time_per_session_7d=('total_watch_time', 'mean'),
+        median_pauses_7d=('num_pauses', 'median'),
+        median_buffer_events_7d=('buffer_events', 'median'),
+        recommendation_accept_rate_7d=('was_recommended', 'mean'),
+    )
+    agg['genre_diversity_7d'] = frame[['user_id', 'genres_watched']].drop_duplicates().groupby('user_id', observed=True).size()
+    agg['last_session'] = frame.groupby('user_id', observed=True)['login_time'].max()
+    agg = agg.reset_index()
+    agg['user_id'] = agg['user_id'].astype(object)
+    return agg.sort_values('user_id', ignore_index=True)
+
+
+def timed_seconds(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10_000_000)
+    parser.add_argument('--events', type=int, default=20_000_000)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    users, object_bytes = build_users(args.users, args.chunk_size)
+    compact_bytes = {column: int(nbytes) for column, nbytes in users.memory_usage(deep=True, index=False).items()}
+    memory = {
+        column: {'object_mb': mb(object_bytes[column]), 'compact_mb': mb(compact_bytes[column])}
+        for column in object_bytes
+    }
+    memory['total'] = {'object_mb': mb(sum(object_bytes.values())), 'compact_mb': mb(sum(compact_bytes.values()))}
+    users = users.drop(columns=['email'])
+
+    # The events share the users' id strings, through a separate Index so the table below hashes them itself
+    events = EventsDataset.from_frame(make_events(pd.Index(users['user_id'].to_numpy()), args.events))
+    timings = {}
+    timings['churn_features_categorical'], expected = timed_seconds(lambda: categorical_churn_features(events))
+    timings['churn_features_codes'], features = timed_seconds(lambda: churn_features(events))
+    assert (expected['user_id'].astype(object).to_numpy() == features['user_id'].to_numpy()).all()
+    assert np.allclose(expected['total_watch_time_7d'], features['total_watch_time_7d'])
+    assert (expected['genre_diversity_7d'].to_numpy() == features['genre_diversity_7d'].to_numpy()).all()
+    event_user_ids = events.frame['user_id']
+    del expected, features, events
+
+    timings['user_table_build'], table = timed_seconds(lambda: UserTable(users))
+    # The lookup the dashboard used to build for every call, from the object users table
+    object_users = pd.DataFrame({'user_id': users['user_id'], 'country': users['country'].astype(object)})
+    timings['join_map_object'], mapped = timed_seconds(
+        lambda: event_user_ids.map(object_users.drop_duplicates(subset='user_id').set_index('user_id')['country']))
+    del object_users
+    timings['join_user_table'], joined = timed_seconds(lambda: table.column('country', event_user_ids))
+    assert (mapped.astype(object).to_numpy() == joined.astype(object).to_numpy()).all()
+
+    print(json.dumps({
+        'users': args.users,
+        'events': args.events,
+        'memory': memory,
+        'seconds': {name: round(value, 3) for name, value in timings.items()},
+        'churn_features_speedup': round(timings['churn_features_categorical'] / timings['churn_features_codes'], 1),
+        'join_speedup': round(timings['join_map_object'] / timings['join_user_table'], 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Measure page render latency with the heavy analytics computed inline on every render against
+reading the precompute scheduler's snapshots (PRECOMPUTE_ENABLED=1).
+
+Each page is rendered --renders times with Streamlit's AppTest in one interpreter, every render a
+new session, against a temporary data directory filled with synthetic events and users. The first
+render loads the data (and waits for the first snapshots), the following ones show what a viewer
+waits for once the dashboard is warm. Run from the repository root:
+
+    python -m benchmarks.bench_precompute --events 1000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import REPO, write_dataset
+
+PAGES = {
+    'churn': ('ui.churnpage', 'churnpage', 'snapshot=snapshots["churn"]'),
+    'activity': ('ui.activitypage', 'activitypage', 'snapshots=snapshots'),
+}
+
+PAGE_SCRIPT = """
+import sys
+sys.path.insert(0, {repo!r})
+import streamlit as st
+import main
+from {module} import {function}, REQUIRES, PRECOMPUTE_JOBS
+
+st.set_page_config(layout="wide")
+data = main.load_data()
+scheduler = main.load_scheduler()
+if scheduler is None:
+    {function}(**data.load(REQUIRES))
+else:
+    snapshots = scheduler.latest(PRECOMPUTE_JOBS)
+    {function}(**data.load(REQUIRES), {snapshot_argument})
+"""
+
+MEASURE = """
+import os, sys, time, warnings
+warnings.filterwarnings('ignore')
+os.chdir(sys.argv[1])
+from streamlit.testing.v1 import AppTest
+seconds = []
+for _ in range(int(sys.argv[3])):
+    at = AppTest.from_file(sys.argv[2], default_timeout=3600)
+    start = time.perf_counter()
+    at.run()
+    seconds.append(time.perf_counter() - start)
+    assert not at.exception, [e.value for e in at.exception]
+print(*seconds)
+"""
+
+
+def measure(root: str, page: str, precompute: bool, renders: int) -> dict:
+    module, function, snapshot_argument = PAGES[page]
+    script = os.path.join(root, f'page_{page}.py')
+    with open(script, 'w') as f:
+        f.write(PAGE_SCRIPT.format(repo=REPO, module=module, function=function, snapshot_argument=snapshot_argument))
+    env = {**os.environ, 'PRECOMPUTE_ENABLED': '1' if precompute else '0'}
+    out = subprocess.run([sys.executable, '-c', MEASURE, root, script, str(renders)],
+                         capture_output=True, text=True, check=True, env=env)
+    first, *warm = [float(value) for value in out.stdout.split()[-renders:]]
+    warm = sorted(warm)
+    return {
+        'first_render_seconds': round(first, 3),
+        'warm_render_p50_seconds': round(warm[len(warm) // 2], 3),
+        'warm_render_max_seconds': round(warm[-1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--renders', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        write_dataset(root, args.events, args.users, days=120)
+        results = {
+            page: {mode: measure(root, page, mode == 'precompute', args.renders) for mode in ('inline', 'precompute')}
+            for page in PAGES
+        }
+    print(json.dumps({'events': args.events, 'users': args.users, 'renders': args.renders, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Compare the sketch based approximate analytics (storage/sketches.py) against the exact pandas path
+on distinct users, distinct genres and the top 10 shows of a window: accuracy, memory and latency.
+
+Events over --days days are generated in --batch-size batches with Zipf distributed show
+popularity and fed to a SketchStore in a temporary directory, like the server's sketch sink does.
+The exact path keeps the same events as categorical columns (as EventsDataset does) and answers
+with nunique and value_counts. Run from the repository root:
+
+    python -m benchmarks.bench_sketches --events 10000000 --users 2000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from benchmarks.synthetic import GENRES
+from storage.sketches import SketchStore
+
+
+def mb(nbytes: int) -> float:
+    return round(nbytes / 2 ** 20, 3)
+
+
+def make_batch(rng: np.random.Generator, size: int, n_users: int, n_shows: int, days: int,
+               end: pd.Timestamp) -> pd.DataFrame:
+    """Events with the sketched columns, popular shows first (s00000 is the most watched)"""
+    return pd.DataFrame({
+        'user_id': np.char.add('u', np.char.zfill(rng.integers(0, n_users, size).astype(str), 7)).astype(object),
+        'login_time': end - pd.to_timedelta(rng.integers(1, days * 24 * 60, size), unit='min'),
+        'genres_watched': np.array(GENRES, dtype=object)[rng.integers(0, len(GENRES), size)],
+        'content_watched': np.char.add('s', np.char.zfill(((rng.zipf(1.2, size) - 1) % n_shows).astype(str), 5)).astype(object),
+    })
+
+
+def directory_bytes(root: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(root) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=2_000_000)
+    parser.add_argument('--shows', type=int, default=20_000)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--batch-size', type=int, default=100_000, help='Events per ingest batch')
+    parser.add_argument('--k', type=int, default=10, help='Top shows compared')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    end = pd.Timestamp('2025-07-01')
+    with tempfile.TemporaryDirectory() as root:
+        store = SketchStore(os.path.join(root, 'sketches'))
+        batches = []
+        ingest_seconds = 0.0
+        for start in range(0, args.events, args.batch_size):
+            batch = make_batch(rng, min(args.batch_size, args.events - start), args.users, args.shows, args.days, end)
+            started = time.perf_counter()
+            store.append(batch)
+            ingest_seconds += time.perf_counter() - started
+            # The exact path keeps every event, encoded like EventsDataset
+            batches.append(batch.drop(columns='login_time').astype('category'))
+        for day in store.days():
+            store.compact(day)
+        sketch_bytes = directory_bytes(store.root)
+
+        # Exact: the window's events in memory, one pass each
+        events = pd.DataFrame({
+            column: union_categoricals([batch[column] for batch in batches]) for column in batches[0].columns
+        })
+        del batches
+        exact_bytes = int(events.memory_usage(deep=True, index=False).sum())
+        started = time.perf_counter()
+        exact_users = events['user_id'].nunique()
+        exact_genres = events['genres_watched'].nunique()
+        exact_counts = events['content_watched'].value_counts()
+        exact_seconds = time.perf_counter() - started
+
+        # Approximate: merge the day sketches of the window, from disk and then from the store's cache
+        cold_store = SketchStore(store.root)
+        started = time.perf_counter()
+        cold_store.window(args.days)
+        sketch_cold_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        window = cold_store.window(args.days)
+        users, genres, top = window.users.estimate(), window.genres.estimate(), window.shows.top(args.k)
+        sketch_seconds = time.perf_counter() - started
+
+    exact_top = exact_counts.index[:args.k]
+    true_counts = exact_counts.reindex(top['item']).fillna(0).to_numpy()
+    print(json.dumps({
+        'events': args.events,
+        'users': args.users,
+        'shows': args.shows,
+        'days': args.days,
+        'accuracy': {
+            'distinct_users': {'exact': int(exact_users), 'estimate': round(users),
+                               'relative_error': round(users / exact_users - 1, 5),
+                               'standard_error': round(window.users.relative_error, 5)},
+            'distinct_genres': {'exact': int(exact_genres), 'estimate': round(genres)},
+            'top_shows': {
+                'recall': len(set(top['item']) & set(exact_top)) / args.k,
+                'same_order': list(top['item']) == list(exact_top),
+                'max_count_error': int((top['count'].to_numpy() - true_counts).max()),
+                'error_bound': window.shows.max_error,
+                'within_bounds': bool(((true_counts <= top['count']) & (true_counts >= top['lower'])).all()),
+            },
+        },
+        'memory_mb': {'exact_events': mb(exact_bytes), 'sketch_files': mb(sketch_bytes), 'sketch_window': mb(window.nbytes)},
+        'seconds': {
+            'exact_query': round(exact_seconds, 3),
+            'sketch_query_cold': round(sketch_cold_seconds, 3),
+            'sketch_query_warm': round(sketch_seconds, 4),
+            'sketch_ingest_total': round(ingest_seconds, 3),
+        },
+        'sketch_ingest_us_per_event': round(ingest_seconds / args.events * 1e6, 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
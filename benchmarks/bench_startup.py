@@ -0,0 +1,81 @@
+"""
+Measure dashboard startup per page: time until the page has fully rendered (first paint) and
+peak RSS, with the lazy per-page loading against loading every dataset and model up front.
+
+Each measurement renders one page with Streamlit's AppTest in a fresh interpreter, against a
+temporary data directory filled with synthetic events and users. Run from the repository root:
+
+    python -m benchmarks.bench_startup --events 1000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import REPO, write_dataset
+
+PAGES = {
+    'churn': ('ui.churnpage', 'churnpage'),
+    'activity': ('ui.activitypage', 'activitypage'),
+}
+
+PAGE_SCRIPT = """
+import sys
+sys.path.insert(0, {repo!r})
+import streamlit as st
+import main
+from dashboard_data import DERIVED_RESOURCES, EVENT_RESOURCES, FILE_RESOURCES, MODEL_RESOURCES
+from {module} import {function}, REQUIRES
+
+st.set_page_config(layout="wide")
+data = main.load_data()
+if {eager!r}:
+    for name in [*FILE_RESOURCES, *MODEL_RESOURCES, *EVENT_RESOURCES, *DERIVED_RESOURCES, 'churn_state']:
+        data.get(name)
+{function}(**data.load(REQUIRES))
+"""
+
+MEASURE = """
+import os, sys, time, warnings
+warnings.filterwarnings('ignore')
+os.chdir(sys.argv[1])
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[2], default_timeout=3600)
+start = time.perf_counter()
+at.run()
+elapsed = time.perf_counter() - start
+assert not at.exception, [e.value for e in at.exception]
+hwm = [line for line in open('/proc/self/status') if line.startswith('VmHWM')][0]
+print(elapsed, hwm.split()[1])
+"""
+
+
+def measure(root: str, page: str, eager: bool) -> dict:
+    module, function = PAGES[page]
+    script = os.path.join(root, f'page_{page}_{"eager" if eager else "lazy"}.py')
+    with open(script, 'w') as f:
+        f.write(PAGE_SCRIPT.format(repo=REPO, module=module, function=function, eager=eager))
+    out = subprocess.run([sys.executable, '-c', MEASURE, root, script], capture_output=True, text=True, check=True)
+    seconds, hwm_kb = out.stdout.split()[-2:]
+    return {'first_paint_seconds': float(seconds), 'peak_rss_mb': int(hwm_kb) / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        write_dataset(root, args.events, args.users, days=120)
+        results = {
+            page: {mode: measure(root, page, eager=mode == 'eager') for mode in ('lazy', 'eager')}
+            for page in PAGES
+        }
+    print(json.dumps({'events': args.events, 'users': args.users, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
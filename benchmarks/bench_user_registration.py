@@ -0,0 +1,108 @@
+"""
+Concurrent load test for the user store.
+
+Each worker process opens its own UserStore on a shared database, like separate uvicorn workers,
+and registers users from a small thread pool, like the server's run_in_threadpool. Workers'
+id ranges overlap so duplicates race across processes. Afterwards every row is checked: no
+registration may be lost, duplicated or corrupted. Run from the repository root:
+
+    python -m benchmarks.bench_user_registration --users 20000 --workers 1 4 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from storage.user_store import DuplicateUserError, UserStore, read_users
+
+
+def make_record(number: int) -> dict:
+    return {
+        'user_id': f'u{number:07d}',
+        'email': f'user{number}@example.org',
+        'age': 18 + number % 50,
+        'country': ['India', 'USA', 'UK', 'Germany'][number % 4],
+        'registration_date': '2025-06-01',
+        'preferred_genre': ['Comedy', 'Drama', 'Horror'][number % 3],
+        'subscription_type': ['free', 'premium'][number % 2],
+        'churn': 'no_churn',
+    }
+
+
+def worker(db_path: str, numbers: list, threads: int, start_at: float, results) -> None:
+    store = UserStore(db_path)
+    while time.time() < start_at:
+        time.sleep(0.001)
+
+    def register(number: int) -> bool:
+        try:
+            store.register(make_record(number))
+            return True
+        except DuplicateUserError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        accepted = sum(pool.map(register, numbers))
+    results.put((accepted, len(numbers) - accepted))
+
+
+def run(n_users: int, n_workers: int, threads: int, overlap: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'users.db')
+        UserStore(db_path)
+        per_worker = n_users // n_workers
+        extra = int(per_worker * overlap)
+        # Each worker also tries the first `extra` ids of the next worker's range
+        ranges = [
+            list(range(i * per_worker, (i + 1) * per_worker + extra)) for i in range(n_workers)
+        ]
+        expected = set(range(n_workers * per_worker + extra))
+
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1.0
+        processes = [
+            multiprocessing.Process(target=worker, args=(db_path, numbers, threads, start_at, results))
+            for numbers in ranges
+        ]
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.time() - start_at
+
+        users = read_users(db_path)
+        stored = {int(user_id[1:]) for user_id in users['user_id']}
+        intact = all(
+            record == make_record(int(record['user_id'][1:])) for record in users.to_dict(orient='records')
+        )
+        accepted = sum(outcome[0] for outcome in outcomes)
+        return {
+            'workers': n_workers,
+            'accepted': accepted,
+            'rejected_duplicates': sum(outcome[1] for outcome in outcomes),
+            'stored': len(users),
+            'lost': len(expected - stored),
+            'duplicated_rows': len(users) - len(stored),
+            'rows_intact': intact,
+            'seconds': elapsed,
+            'registrations_per_second': accepted / elapsed,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--threads', type=int, default=4, help='Thread pool size per worker')
+    parser.add_argument('--overlap', type=float, default=0.1, help='Share of each range also sent by another worker')
+    args = parser.parse_args()
+
+    print(json.dumps([run(args.users, n, args.threads, args.overlap) for n in args.workers], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Load test the ingest endpoints with the live metrics counters enabled and disabled.
+
+Requests go through the FastAPI app in-process (httpx ASGI transport), so the numbers measure the
+handlers, validation, buffering and counters rather than the network. Events are written to a
+temporary event store. Run from the repository root:
+
+    python -m benchmarks.load_live_metrics --seconds 10 --concurrency 32 --batch-size 1 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import httpx
+
+import server
+from benchmarks.synthetic import make_events
+from features.live_metrics import LiveMetrics
+
+
+def payloads(n_events: int) -> list:
+    events = make_events(n_events, n_users=10_000)
+    events['login_time'] = events['login_time'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    return events.to_dict(orient='records')
+
+
+async def run(seconds: float, concurrency: int, batch_size: int, events: list) -> dict:
+    transport = httpx.ASGITransport(app=server.app)
+    sent = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker(client: httpx.AsyncClient, offset: int):
+        nonlocal sent
+        position = offset
+        while time.perf_counter() < deadline:
+            batch = [events[(position + i) % len(events)] for i in range(batch_size)]
+            position += batch_size
+            if batch_size == 1:
+                response = await client.post('/log-event', json=batch[0])
+            else:
+                response = await client.post('/log-events', json=batch)
+            response.raise_for_status()
+            sent += batch_size
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        await asyncio.gather(*(worker(client, i * 997) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {'events': sent, 'seconds': elapsed, 'events_per_second': sent / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1, 100])
+    args = parser.parse_args()
+
+    events = payloads(20_000)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        server.event_buffer.start()
+        try:
+            for batch_size in args.batch_size:
+                for enabled in (False, True):
+                    server.live_metrics = LiveMetrics() if enabled else None
+                    result = asyncio.run(run(args.seconds, args.concurrency, batch_size, events))
+                    result.update({'batch_size': batch_size, 'live_metrics': enabled})
+                    if enabled:
+                        result['snapshot_active_users'] = server.live_metrics.snapshot()['active_users']
+                    results.append(result)
+        finally:
+            server.event_buffer.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
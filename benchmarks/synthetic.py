@@ -0,0 +1,127 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from storage.event_store import write_events
+from storage.user_store import UserStore
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GENRES = ['Action', 'Comedy', 'Drama', 'Horror', 'Romance', 'Sci-Fi', 'Thriller']
+
+
+def make_events(n_events: int, n_users: int = 1000, n_shows: int = 200, days: int = 30,
+                end: str = '2025-06-30', seed: int = 0) -> pd.DataFrame:
+    """
+    Generate synthetic events matching the `UserEventData` schema.
+
+    Args:
+        n_events: Number of events to generate
+        n_users: Number of distinct user ids (u000000, u000001, ...)
+        n_shows: Number of distinct show ids (s000, s001, ...)
+        days: Events are spread uniformly over this many days ending at `end`
+        end: Last day covered by the events
+        seed: Random seed, the same arguments always produce the same frame
+
+    Returns:
+        pandas DataFrame with typed event columns
+    """
+    rng = np.random.default_rng(seed)
+    end_ts = pd.Timestamp(end) + pd.Timedelta(days=1)
+    minutes = rng.integers(0, days * 24 * 60, n_events)
+    login_time = end_ts - pd.to_timedelta(minutes + 1, unit='min')
+    return pd.DataFrame({
+        'user_id': np.char.add('u', np.char.zfill(rng.integers(0, n_users, n_events).astype(str), 6)),
+        'login_time': login_time,
+        'content_watched': np.char.add('s', np.char.zfill(rng.integers(0, n_shows, n_events).astype(str), 3)),
+        'genres_watched': np.array(GENRES)[rng.integers(0, len(GENRES), n_events)],
+        'total_watch_time': rng.gamma(2.0, 8.0, n_events).round(1),
+        'num_pauses': rng.poisson(1.5, n_events),
+        'buffer_events': rng.poisson(1.0, n_events),
+        'was_recommended': rng.random(n_events) < 0.4,
+    })
+
+
+COUNTRIES = ['Brazil', 'Canada', 'Germany', 'India', 'UK', 'USA']
+SUBSCRIPTIONS = ['free', 'premium']
+
+
+def make_users(n_users: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate synthetic users matching the `UserRegistrationData` schema, with the same ids as `make_events`.
+
+    Args:
+        n_users: Number of users (u000000, u000001, ...)
+        seed: Random seed
+
+    Returns:
+        pandas DataFrame with the users.csv columns
+    """
+    rng = np.random.default_rng(seed)
+    user_ids = np.char.add('u', np.char.zfill(np.arange(n_users).astype(str), 6))
+    registration = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 540, n_users), unit='D')
+    return pd.DataFrame({
+        'user_id': user_ids,
+        'email': np.char.add(user_ids, '@example.org'),
+        'age': rng.integers(16, 70, n_users),
+        'country': np.array(COUNTRIES)[rng.integers(0, len(COUNTRIES), n_users)],
+        'registration_date': registration.strftime('%Y-%m-%d'),
+        'preferred_genre': np.array(GENRES)[rng.integers(0, len(GENRES), n_users)],
+        'subscription_type': np.array(SUBSCRIPTIONS)[rng.integers(0, len(SUBSCRIPTIONS), n_users)],
+        'churn': 'no_churn',
+    })
+
+
+def make_shows(n_shows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a synthetic show catalog with the data/shows.csv columns, with the same ids as `make_events`.
+
+    Args:
+        n_shows: Number of shows (s000, s001, ...)
+        seed: Random seed
+
+    Returns:
+        pandas DataFrame with the shows.csv columns
+    """
+    rng = np.random.default_rng(seed)
+    show_ids = np.char.add('s', np.char.zfill(np.arange(n_shows).astype(str), 3))
+    released = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, n_shows), unit='D')
+    return pd.DataFrame({
+        'show_id': show_ids,
+        'show_name': np.char.add('Show ', np.arange(n_shows).astype(str)),
+        'genre': np.array(GENRES)[rng.integers(0, len(GENRES), n_shows)],
+        'duration': rng.integers(20, 120, n_shows),
+        'released_date': released.strftime('%Y-%m-%d'),
+        'ratings': rng.uniform(1, 5, n_shows).round(1),
+    })
+
+
+def write_dataset(root: str, n_events: int, n_users: int, n_shows: int = 200, days: int = 30,
+                  end: str = '2025-06-30', chunk_size: int = 5_000_000, seed: int = 0) -> None:
+    """
+    Fill `root` with a complete dashboard data directory: data/events, data/users.db, data/users.csv,
+    data/shows.csv and copies of the repo's models with their registry manifest.
+
+    Events are generated and written chunk_size rows at a time, so 10^8 events need no more memory
+    than one chunk. Each chunk covers the whole day range with its own seed.
+    """
+    data_dir = os.path.join(root, 'data')
+    models_dir = os.path.join(root, 'models')
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(models_dir, exist_ok=True)
+
+    events_dir = os.path.join(data_dir, 'events')
+    for number, start in enumerate(range(0, n_events, chunk_size)):
+        size = min(chunk_size, n_events - start)
+        write_events(make_events(size, n_users, n_shows, days, end, seed=seed + number), events_dir)
+
+    users_csv = os.path.join(data_dir, 'users.csv')
+    make_users(n_users, seed).to_csv(users_csv, index=False)
+    UserStore(os.path.join(data_dir, 'users.db')).import_csv(users_csv)
+    make_shows(n_shows, seed).to_csv(os.path.join(data_dir, 'shows.csv'), index=False)
+
+    for name in os.listdir(os.path.join(REPO, 'models')):
+        if name.endswith('.pkl') or name == 'manifest.json':
+            shutil.copy(os.path.join(REPO, 'models', name), os.path.join(models_dir, name))
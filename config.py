@@ -0,0 +1,57 @@
+import os
+
+# Event ingestion buffer: flush once this many events are queued...
+EVENT_BUFFER_MAX_SIZE = int(os.environ.get("EVENT_BUFFER_MAX_SIZE", "500"))
+# ...or once this many seconds have passed since the last flush
+EVENT_BUFFER_FLUSH_SECONDS = float(os.environ.get("EVENT_BUFFER_FLUSH_SECONDS", "2.0"))
+
+# Dashboard: minimum number of seconds between checks for new events, users, shows or models
+DASHBOARD_REFRESH_SECONDS = float(os.environ.get("DASHBOARD_REFRESH_SECONDS", "30"))
+
+# Activity page: trend windows (days) offered on the watchtime chart, the dashboard keeps enough
+# days of events loaded for the longest
+TREND_WINDOWS = [7, 30, 90]
+
+# Live metrics on the FastAPI server: counters are updated on every logged event
+LIVE_METRICS_ENABLED = os.environ.get("LIVE_METRICS_ENABLED", "1") == "1"
+LIVE_METRICS_ACTIVE_MINUTES = int(os.environ.get("LIVE_METRICS_ACTIVE_MINUTES", "15"))
+LIVE_METRICS_STREAM_SECONDS = float(os.environ.get("LIVE_METRICS_STREAM_SECONDS", "1.0"))
+# Where the dashboard fetches live metrics from, the live panel is hidden when unset
+LIVE_METRICS_URL = os.environ.get("LIVE_METRICS_URL", "")
+
+# Profiling: per-call latency histograms of loads, feature functions, model calls and ingestion,
+# shown on the dashboard's Performance page and on the server's /metrics endpoint
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+
+# Churn page: "memory" scores every user inside the dashboard, "sharded" reads the results table
+# written by `python -m features.churn_scoring`
+CHURN_SCORING = os.environ.get("CHURN_SCORING", "memory")
+
+# Models: the active version of each model comes from models/manifest.json, this pins versions
+# instead, e.g. MODEL_VERSIONS="churn_model=v2,timing_model=v3"
+MODEL_VERSIONS = dict(
+    item.strip().split("=", 1) for item in os.environ.get("MODEL_VERSIONS", "").split(",") if item.strip()
+)
+
+# Rollups: the server keeps per-hour and per-day aggregates of the events in data/rollups and the
+# dashboard and activity model training read those instead of raw events. Run
+# `python -m storage.rollups backfill` once before enabling them on existing data.
+ROLLUPS_ENABLED = os.environ.get("ROLLUPS_ENABLED", "0") == "1"
+
+# Sketches: the server keeps per-day HyperLogLog and Space-Saving sketches of the events in data/sketches
+# and the dashboard offers an approximate mode that reads distinct users and top shows from them. Run
+# `python -m storage.sketches backfill` once before enabling them on existing data.
+SKETCHES_ENABLED = os.environ.get("SKETCHES_ENABLED", "0") == "1"
+
+# Precompute: a background scheduler recomputes the churn results, watch-time trends, top shows and
+# forecasts into shared snapshots, and pages only render the latest snapshot. Each job runs every
+# PRECOMPUTE_CADENCES seconds (e.g. "churn=600,watchtime=30", unlisted jobs keep their defaults),
+# at most PRECOMPUTE_WORKERS at a time
+PRECOMPUTE_ENABLED = os.environ.get("PRECOMPUTE_ENABLED", "0") == "1"
+PRECOMPUTE_CADENCES = {
+    name.strip(): float(seconds)
+    for name, seconds in (
+        item.split("=", 1) for item in os.environ.get("PRECOMPUTE_CADENCES", "").split(",") if item.strip()
+    )
+}
+PRECOMPUTE_WORKERS = int(os.environ.get("PRECOMPUTE_WORKERS", "2"))
@@ -0,0 +1,191 @@
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict
+
+import pandas as pd
+
+import config
+from features.churn_state import ChurnFeatureState
+from features.events import EventsDataset
+from features.show_catalog import ShowCatalog
+from features.show_time import ForecastTable
+from features.user_table import UserTable
+from profiling import timer
+from storage.churn_results import CHURN_RESULTS_DIR, CURRENT_FILE, read_churn_results
+from storage.event_store import EventTail
+from storage.model_registry import MODEL_MANIFEST, ModelRegistry
+from storage.rollups import RollupStore
+from storage.sketches import SketchStore
+from storage.user_store import USERS_DB
+from storage.watch import FileWatcher
+
+
+# File backed resources: name -> (path, loader). Reloaded when the file (or the users database's WAL) changes.
+FILE_RESOURCES = {
+    'shows': ('data/shows.csv', ShowCatalog.from_csv),
+    'users': (USERS_DB, UserTable.from_store),
+    # None until a scoring run has been published, reloaded when the CURRENT pointer moves
+    'churn_results': (f'{CHURN_RESULTS_DIR}/{CURRENT_FILE}', read_churn_results),
+}
+
+# Model resources: name -> model registry name. The active version is reloaded when models/manifest.json
+# changes, e.g. after `python -m storage.model_registry activate` or a training run.
+MODEL_RESOURCES = {
+    'churn_model': 'churn_model',
+    'churn_reason_model': 'churn_reason_model',
+    'timing_model': 'timing_model',
+}
+
+# Derived resources: name -> (source resource, builder). Rebuilt whenever the source is reloaded.
+DERIVED_RESOURCES = {
+    'forecast': ('timing_model', ForecastTable),
+}
+
+# Event resources: name -> EventTail arguments. Refreshed by appending newly written store files.
+# The activity page looks at most max(config.TREND_WINDOWS) days back, the top shows 7 day window
+# is measured from the latest event time so it can span one more calendar day
+ACTIVITY_DAYS = max(config.TREND_WINDOWS) + 1
+EVENT_RESOURCES = {
+    'events': {},
+    'recent_events': {
+        'columns': ['user_id', 'login_time', 'content_watched', 'total_watch_time'],
+        'last_n_days': ACTIVITY_DAYS,
+    },
+}
+
+
+class DashboardData:
+    """
+    Lazy registry of the datasets and models behind the dashboard, kept up to date without a restart.
+
+    Nothing is loaded up front: each page declares the resources it needs and `load` fetches only
+    those, so opening the activity page never pays for the full event log or the churn models.
+    Every resource is cached on its own once loaded.
+
+    `refresh()` only touches loaded resources. Event datasets get the store files written since
+    the previous refresh appended (and the churn feature state is updated with them); files are
+    reloaded only when they change and models when their active version in the model registry
+    changes, together with anything derived from them (e.g. the forecast table built from the
+    activity model). Resources are immutable and swapped in whole, so a page that already holds
+    one keeps a consistent view. `version` increases whenever something changed.
+    """
+
+    def __init__(self, refresh_interval: float = config.DASHBOARD_REFRESH_SECONDS):
+        self.refresh_interval = refresh_interval
+        self.version = 0
+        self._values: Dict[str, Any] = {}
+        self._tails: Dict[str, EventTail] = {}
+        self._watchers: Dict[str, FileWatcher] = {}
+        self._models = ModelRegistry()
+        self._lock = threading.RLock()
+        self._last_refresh = time.monotonic()
+
+    def get(self, name: str) -> Any:
+        """Returns the named resource, loading it on first use"""
+        value = self._values.get(name)
+        if value is not None:
+            return value
+        with self._lock:
+            if name not in self._values:
+                with timer(f'load.{name}') as span:
+                    value = self._values[name] = self._load(name)
+                    span.rows = len(value) if isinstance(value, (EventsDataset, ShowCatalog, pd.DataFrame)) else None
+            return self._values[name]
+
+    def load(self, requires: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Args:
+            requires: Page argument name -> resource name, e.g. a page's REQUIRES
+
+        Returns:
+            Page argument name -> loaded resource, ready to be passed as keyword arguments
+        """
+        return {argument: self.get(name) for argument, name in requires.items()}
+
+    def _load(self, name: str) -> Any:
+        if name in FILE_RESOURCES:
+            path, loader = FILE_RESOURCES[name]
+            # Writes to the SQLite users database land in its write-ahead log until a checkpoint
+            self._watchers[name] = FileWatcher(path, f"{path}-wal") if path == USERS_DB else FileWatcher(path)
+            return loader(path)
+        if name in MODEL_RESOURCES:
+            self._watchers[name] = FileWatcher(MODEL_MANIFEST)
+            return self._models.load(MODEL_RESOURCES[name])
+        if name in EVENT_RESOURCES:
+            tail = self._tails[name] = EventTail(**EVENT_RESOURCES[name])
+            return EventsDataset.from_frame(tail.read_new())
+        if name in DERIVED_RESOURCES:
+            source, builder = DERIVED_RESOURCES[name]
+            return builder(self.get(source))
+        if name == 'rollups':
+            # None when disabled. The store reads only the day files that changed, so it needs no refresh
+            return RollupStore() if config.ROLLUPS_ENABLED else None
+        if name == 'sketches':
+            # Same as the rollups, the store reads the day files that changed
+            return SketchStore() if config.SKETCHES_ENABLED else None
+        if name == 'churn_state':
+            state = ChurnFeatureState()
+            state.update(self.get('events').frame)
+            return state
+        raise KeyError(f"Unknown dashboard resource {name!r}")
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Pick up new events and changed files for the loaded resources, at most once per refresh interval.
+
+        Args:
+            force: Check now even if the refresh interval has not elapsed
+
+        Returns:
+            True if anything was reloaded
+        """
+        if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return False
+        # Another session is already refreshing, it will bump the version for everyone
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            with timer('load.refresh'):
+                return self._refresh()
+        finally:
+            self._lock.release()
+
+    def _refresh(self) -> bool:
+        self._last_refresh = time.monotonic()
+        changed = False
+        try:
+            for name, tail in self._tails.items():
+                new_events = tail.read_new()
+                if new_events.empty:
+                    continue
+                dataset = self._values[name].append(new_events)
+                if tail.last_n_days is not None:
+                    dataset = dataset.trim_before(dataset.latest.normalize() - timedelta(days=tail.last_n_days - 1))
+                self._values[name] = dataset
+                if name == 'events' and 'churn_state' in self._values:
+                    self._values['churn_state'].update(new_events)
+                changed = True
+
+            for name, watcher in self._watchers.items():
+                if not watcher.changed():
+                    continue
+                # A reload that raises leaves the watcher uncommitted, so the next refresh tries again
+                if name in MODEL_RESOURCES:
+                    value = self._models.load(MODEL_RESOURCES[name])
+                else:
+                    path, loader = FILE_RESOURCES[name]
+                    value = loader(path)
+                # The same model when the manifest changed for another one
+                if value is not self._values[name]:
+                    derived_values = {derived: builder(value) for derived, (source, builder) in DERIVED_RESOURCES.items()
+                                      if source == name and derived in self._values}
+                    self._values[name] = value
+                    self._values.update(derived_values)
+                    changed = True
+                watcher.commit()
+        finally:
+            # Resources swapped in before a failure are new to the pages too
+            if changed:
+                self.version += 1
+        return changed
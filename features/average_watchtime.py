@@ -1,24 +1,110 @@
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import List, Tuple
+from typing import List, Optional, Sequence, Tuple, Union
 
-def average_watchtime_for_7_days(event_df) -> List[Tuple[str, float]]:
+from features.events import EventsDataset
+from features.user_table import UserTable
+from profiling import first_arg_rows, timed
+from storage.rollups import RollupStore
+
+def _fill_days(stats: pd.DataFrame, start: pd.Timestamp, today: pd.Timestamp, by: Sequence[str]) -> pd.DataFrame:
+    """Adds a zero row for every day (and group) of the window without data"""
+    dates = pd.date_range(start, today, freq="D", name="date")
+    if by:
+        groups = stats.index.droplevel("date").unique()
+        full_index = pd.MultiIndex.from_tuples(
+            [(day, *(group if isinstance(group, tuple) else (group,))) for day in dates for group in groups],
+            names=["date", *by],
+        )
+    else:
+        full_index = dates
+    return stats.reindex(full_index, fill_value=0).reset_index()
+
+def _no_days(by: Sequence[str], percentiles: Sequence[float]) -> pd.DataFrame:
+    """The daily_watchtime frame of a window without any data"""
+    columns = ["date", *by, "mean", "count", *(f"p{round(q * 100)}" for q in percentiles)]
+    frame = pd.DataFrame(columns=columns)
+    frame["date"] = pd.Series(dtype="datetime64[ns]")
+    return frame
+
+def _daily_watchtime_from_rollups(rollups: RollupStore, days: int, users: Optional[UserTable], by: Sequence[str],
+                                  percentiles: Sequence[float]) -> pd.DataFrame:
+    if percentiles:
+        raise ValueError("Rollups only hold watch time sums and counts, percentiles need the raw events")
+    latest = rollups.latest_hour()
+    if latest is None:
+        return _no_days(by, ())
+    today = latest.normalize()
+    start = today - timedelta(days=days - 1)
+
+    if by:
+        # Per user rows, so each one can be mapped to its user's country or subscription
+        table = rollups.read("user_daily", since=start.date())
+        keys = [table["date"]] + [users.column(column, table["user_id"]) for column in by]
+    else:
+        # 24 rows per day, enough for the overall mean
+        table = rollups.read("hourly_logins", since=start.date())
+        keys = [table["hour_start"].dt.floor("D").rename("date")]
+    sums = table[["watch_time", "watch_time_count"]].groupby(keys, observed=True).sum()
+    stats = pd.DataFrame({"mean": sums["watch_time"] / sums["watch_time_count"], "count": sums["watch_time_count"]})
+    return _fill_days(stats, start, today, by)
+
+@timed('watchtime.daily_watchtime', rows=first_arg_rows)
+def daily_watchtime(event_df: Union[EventsDataset, pd.DataFrame, RollupStore], days: int = 7,
+                    users_df: Optional[Union[UserTable, pd.DataFrame]] = None,
+                    by: Sequence[str] = (), percentiles: Sequence[float] = (0.5, 0.9)) -> pd.DataFrame:
+    """
+    Watch time statistics for each of the last N days, computed in a single groupby over the window.
+
+    With a RollupStore the statistics come from the hourly (or, with `by`, per user daily) rollups, so
+    the cost depends on the number of days and users rather than events. Rollups only support the
+    mean and count, pass percentiles=().
+
+    Args:
+        event_df: EventsDataset (or pandas DataFrame) with at least 'login_time' and 'total_watch_time' columns
+            ('user_id' too when `by` is used), or a RollupStore
+        days: Number of days in the window, ending on the day of the latest event
+        users_df: UserTable (or pandas DataFrame) with user data, needed when `by` is used
+        by: User columns to break the statistics down by, e.g. ['country'] or ['subscription_type']
+        percentiles: Percentiles to compute, each one becomes a column named like 'p50'
+
+    Returns:
+        pandas DataFrame with a 'date' column, one column per `by` entry, then 'mean', 'count' and the
+        percentile columns. Every day in the window is present for every group, days without events have 0.
+        Without any events the frame is empty.
+    """
+    users = UserTable.wrap(users_df) if by else None
+    if isinstance(event_df, RollupStore):
+        return _daily_watchtime_from_rollups(event_df, days, users, by, percentiles)
+    events = EventsDataset.wrap(event_df)
+    if events.latest is None:
+        return _no_days(by, percentiles)
+    today = events.latest.normalize()
+    start = today - timedelta(days=days - 1)
+    window_df = events.since(start)
+
+    keys = [window_df["login_time"].dt.floor("D").rename("date")]
+    # Only the categories of the window's user_id column are looked up, rows are matched by code
+    keys += [users.column(column, window_df["user_id"]) for column in by]
+
+    grouped = window_df["total_watch_time"].groupby(keys, observed=True)
+    stats = grouped.agg(["mean", "count"])
+    if percentiles:
+        quantiles = grouped.quantile(list(percentiles)).unstack()
+        quantiles.columns = [f"p{round(q * 100)}" for q in quantiles.columns]
+        stats = stats.join(quantiles)
+    return _fill_days(stats, start, today, by)
+
+def average_watchtime_for_7_days(event_df: Union[EventsDataset, pd.DataFrame, RollupStore]) -> List[Tuple[str, float]]:
     """
     Returns a list containing tuples of (date, average watch time) for each of the past 7 days.
 
     Args:
-        event_df: pandas DataFrame with at least 'login_time' and 'total_watch_time' columns
+        event_df: EventsDataset (or pandas DataFrame) with at least 'login_time' and 'total_watch_time' columns,
+            or a RollupStore
 
     Returns:
         List of (date, average watch time) tuples for each of the last 7 days (index 0 = 6 days ago, index 6 = today)
     """
-    event_df["login_time"] = pd.to_datetime(event_df["login_time"])
-    today = event_df["login_time"].max().date()
-    averages = []
-    for i in range(6, -1, -1):
-        day = today - timedelta(days=i)
-        day_df = event_df[event_df['login_time'].dt.date == day]
-        avg_watch_time = float(day_df['total_watch_time'].mean()) if not day_df.empty else 0
-        averages.append((str(day), avg_watch_time))
-
-    return averages
+    daily = daily_watchtime(event_df, days=7, percentiles=())
+    return list(zip(daily["date"].dt.strftime("%Y-%m-%d"), daily["mean"].astype(float)))
@@ -1,66 +1,197 @@
-from typing import Any, List, Tuple
+from typing import Any, Optional, Tuple, Union
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
-import streamlit as st
 
-def total_and_categorial_churn(event_df, users_df, churn_model, churn_reason_model) -> Tuple[float, List[Tuple[int, str]]]:
+from features.events import EventsDataset
+from profiling import first_arg_rows, timed, timer
+
+FEATURE_COLUMNS = [
+    'total_watch_time_7d',
+    'total_sessions_7d',
+    'avg_watch_time_per_session_7d',
+    'median_pauses_7d',
+    'median_buffer_events_7d',
+    'recommendation_accept_rate_7d',
+    'genre_diversity_7d',
+    'days_since_last_session',
+]
+
+def _sum_and_mean(codes: np.ndarray, values: pd.Series, n_codes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum and mean of values per code, skipping missing values like a groupby sum and mean"""
+    values = values.to_numpy(dtype=float, na_value=np.nan)
+    present = ~np.isnan(values)
+    if not present.all():
+        codes, values = codes[present], values[present]
+    sums = np.bincount(codes, weights=values, minlength=n_codes)
+    counts = np.bincount(codes, minlength=n_codes)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums, sums / counts
+
+def _int_median(codes: np.ndarray, values: pd.Series, counts: np.ndarray, active: np.ndarray) -> np.ndarray:
+    """
+    Median of integer values for every active code, like a groupby median.
+
+    One sort of (code, value) keys lays every code's values out in order, so each median is read at
+    the middle of its code's run.
+    """
+    values = values.to_numpy()
+    low = int(values.min()) if len(values) else 0
+    span = (int(values.max()) - low + 1) if len(values) else 1
+    # Built and sorted in place, a single int64 array per row is the only copy
+    keys = codes.astype(np.int64)
+    keys *= span
+    keys += values
+    keys -= low
+    keys.sort()
+    starts = (np.cumsum(counts) - counts)[active]
+    sizes = counts[active]
+    lower = keys[starts + (sizes - 1) // 2] % span + low
+    upper = keys[starts + sizes // 2] % span + low
+    return (lower + upper) / 2
+
+@timed('churn.features', rows=first_arg_rows)
+def churn_features(event_df: Union[EventsDataset, pd.DataFrame], today: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Computes the per-user churn features from the full event log.
+
+    Args:
+        event_df: EventsDataset (or pandas object) containing interactions data
+        today: End of the 7 day window, defaults to the latest event. Pass the latest event of the
+            whole log when event_df only holds some of the users (e.g. one shard)
+
+    Result:
+        pandas DataFrame with a 'user_id' column followed by FEATURE_COLUMNS, one row per user
+        active in the 7 days before the latest event, sorted by user_id
+    """
+    events = EventsDataset.wrap(event_df)
+    if today is None:
+        today = events.latest
+    if today is None:
+        # No events at all, e.g. a new install
+        return pd.DataFrame({column: pd.Series(dtype=object if column == 'user_id' else float)
+                             for column in ['user_id'] + FEATURE_COLUMNS})
+    seven_days_ago = today - timedelta(days=7)
+    last_week_df = events.since(seven_days_ago)
+
+    # Aggregate on the dense integer codes of the categorical user_id (bincounts and an integer
+    # groupby instead of hashing the ids) and decode the ids once for the output rows
+    user_ids = last_week_df["user_id"].cat
+    codes = user_ids.codes.to_numpy()
+    if (codes < 0).any():
+        last_week_df, codes = last_week_df[codes >= 0], codes[codes >= 0]
+    n_codes = len(user_ids.categories)
+    with timer('churn.groupby', rows=len(last_week_df)):
+        sessions = np.bincount(codes, minlength=n_codes)
+        # Codes of the users active in the window, ascending, the output rows are read at these codes
+        active = np.flatnonzero(sessions)
+        watch_time_sum, watch_time_mean = _sum_and_mean(codes, last_week_df["total_watch_time"], n_codes)
+        _, accept_rate = _sum_and_mean(codes, last_week_df["was_recommended"], n_codes)
+        median_pauses = _int_median(codes, last_week_df["num_pauses"], sessions, active)
+        median_buffer_events = _int_median(codes, last_week_df["buffer_events"], sessions, active)
+        # Every user here has an event in the window, so their last session is in it as well. Rows
+        # are sorted by login_time, so it is the one in the user's last row
+        last_row = np.zeros(n_codes, dtype=np.int64)
+        np.maximum.at(last_row, codes, np.arange(len(codes)))
+        # Distinct (user, genre) pairs per user, a missing genre counts as one value like len(set(x)) did
+        n_genres = len(last_week_df["genres_watched"].cat.categories) + 1
+        pair_dtype = np.int32 if n_codes * n_genres < np.iinfo(np.int32).max else np.int64
+        pairs = codes.astype(pair_dtype)
+        pairs *= n_genres
+        pairs += last_week_df["genres_watched"].cat.codes.to_numpy() + 1
+        # Sort and keep the first of every run, which is much faster than np.unique on large arrays
+        pairs.sort()
+        first = np.ones(len(pairs), dtype=bool)
+        first[1:] = pairs[1:] != pairs[:-1]
+        genre_diversity = np.bincount(pairs[first] // n_genres, minlength=n_codes)
+
+    final_features_df = pd.DataFrame({
+        "user_id": user_ids.categories.take(active).astype(object),
+        "total_watch_time_7d": watch_time_sum[active],
+        "total_sessions_7d": sessions[active],
+        "avg_watch_time_per_session_7d": watch_time_mean[active],
+        "median_pauses_7d": median_pauses,
+        "median_buffer_events_7d": median_buffer_events,
+        "recommendation_accept_rate_7d": accept_rate[active],
+        "genre_diversity_7d": genre_diversity[active],
+        "days_since_last_session": (today - last_week_df["login_time"].iloc[last_row[active]]).dt.days.to_numpy(),
+    }, copy=False)
+    # Codes follow the category order, which is sorted unless ids were appended to the dataset later
+    if not final_features_df["user_id"].is_monotonic_increasing:
+        final_features_df = final_features_df.sort_values("user_id", ignore_index=True)
+    return final_features_df[['user_id'] + FEATURE_COLUMNS]
+
+# Rows scored per model call, keeps the intermediate arrays bounded for large user counts
+SCORING_CHUNK_SIZE = 50_000
+
+def predict_in_chunks(predict, features: pd.DataFrame, chunk_size: int = SCORING_CHUNK_SIZE, name: str = 'model.predict') -> np.ndarray:
+    """
+    Runs a vectorized predict function over the rows of features, chunk_size rows at a time.
+
+    Args:
+        predict: Callable taking a DataFrame chunk and returning one value per row (e.g. model.predict)
+        features: pandas DataFrame of model inputs
+        chunk_size: Maximum number of rows passed to predict at once
+        name: Profiling name each predict call is timed under
+
+    Result:
+        numpy array with one prediction per row of features
+    """
+    if len(features) == 0:
+        return np.empty(0, dtype=object)
+    predictions = []
+    for start in range(0, len(features), chunk_size):
+        chunk = features.iloc[start:start + chunk_size]
+        with timer(name, rows=len(chunk)):
+            predictions.append(np.asarray(predict(chunk)))
+    return np.concatenate(predictions)
+
+@timed('churn.total_and_categorial_churn', rows=first_arg_rows)
+def total_and_categorial_churn(event_df, users_df, churn_model, churn_reason_model, feature_state=None,
+                               with_probability: bool = True, chunk_size: int = SCORING_CHUNK_SIZE) -> Tuple[float, pd.DataFrame]:
     """
     A function that return total churn percentage from total no of people and also a list containing no
     people in risk of churn in each category
 
     Args:
-        event_df: pandas object containing interactions data
+        event_df: EventsDataset (or pandas object) containing interactions data
         user_df: pandas object containing users data
         model: A pre-trained model (e.g., SVM) for churn prediction
+        feature_state: Optional ChurnFeatureState kept up to date with the events, when given the
+            features are read from it instead of being recomputed from event_df
+        with_probability: Also return the churn probability of each at-risk user
+        chunk_size: Maximum number of users scored per model call
 
     Result:
         percentage of people in risk of churn from total people ( between 0 and 1)
-        list[(userid, reason)]
+        pandas DataFrame of at-risk users with columns 'user_id', 'reason' and 'churn_probability'
     """
-    event_df["login_time"] = pd.to_datetime(event_df["login_time"])
-    today = event_df["login_time"].max()
-    seven_days_ago = today - timedelta(days=7)
-    last_week_df = event_df[event_df["login_time"] >= seven_days_ago]
-
-    agg_df = last_week_df.groupby("user_id").agg(
-        total_watch_time_7d=("total_watch_time", "sum"),
-        total_sessions_7d=("user_id", "count"),
-        avg_watch_time_per_session_7d=("total_watch_time", "mean"),
-        median_pauses_7d=("num_pauses", "median"),
-        median_buffer_events_7d=("buffer_events", "median"),
-        recommendation_accept_rate_7d=("was_recommended", "mean"),
-        genre_diversity_7d=("genres_watched", lambda x: len(set(x)))
-    ).reset_index()
-
-    last_session_df = event_df.groupby("user_id")["login_time"].max().reset_index()
-    last_session_df["days_since_last_session"] = (today - last_session_df["login_time"]).dt.days
-
-    final_features_df = pd.merge(agg_df, last_session_df, on="user_id", how="left")
-    
-    # Drop columns not needed for prediction
-    prediction_features = final_features_df.drop(columns=['user_id','login_time'])
+    if feature_state is not None:
+        final_features_df = feature_state.features()
+    else:
+        final_features_df = churn_features(event_df)
 
-    @st.cache_data
-    def get_churn_predictions(prediction_features):
-        return churn_model.predict(prediction_features)
+    agg_df = final_features_df[['user_id']]
 
-    churn_predictions = get_churn_predictions(prediction_features)
+    # Drop columns not needed for prediction
+    prediction_features = final_features_df[FEATURE_COLUMNS]
 
-    # Calculate total churn percentage and list of (user_id, churn_reason)
-    churned_users = []
-    churn_count = 0
+    # Not cached here: the result depends on the registry's active model, and the churn page's summary
+    # is snapshotted by the precompute scheduler (PRECOMPUTE_ENABLED=1)
+    churn_predictions = predict_in_chunks(churn_model.predict, prediction_features, chunk_size, 'churn.predict')
 
-    for idx, prediction in enumerate(churn_predictions):
-        if prediction == 1:
-            user_id = agg_df.iloc[idx]["user_id"]
-            # Get features for this user and predict churn reason
-            user_features = prediction_features.iloc[idx:idx+1]
-            churn_reason = churn_reason_model.predict(user_features)[0]
-            churned_users.append((user_id, churn_reason))
-            churn_count += 1
+    # Score the reasons for all at-risk users in one batched pass over the masked rows
+    at_risk = churn_predictions == 1
+    at_risk_features = prediction_features[at_risk]
+    churned_users = pd.DataFrame({
+        'user_id': agg_df['user_id'].to_numpy()[at_risk],
+        'reason': predict_in_chunks(churn_reason_model.predict, at_risk_features, chunk_size, 'churn.predict_reason'),
+    })
+    if with_probability:
+        churned_users['churn_probability'] = predict_in_chunks(
+            lambda chunk: churn_model.predict_proba(chunk)[:, 1], at_risk_features, chunk_size, 'churn.predict_proba'
+        )
 
-    churn_percentage = churn_count / len(prediction_features) if len(prediction_features) > 0 else 0.0
+    churn_percentage = len(churned_users) / len(prediction_features) if len(prediction_features) > 0 else 0.0
 
     return (int(churn_percentage*100))/100, churned_users
-
-
@@ -0,0 +1,109 @@
+from typing import Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from features.user_table import UserTable
+from profiling import timed
+from storage.churn_results import RESULT_COLUMNS, ChurnResults
+
+# Columns joined from the users table onto every page
+USER_COLUMNS = ['country', 'subscription_type']
+SORT_ORDERS = ('desc', 'asc', 'user_id')
+
+
+def _parts(results: Union[pd.DataFrame, ChurnResults]) -> Iterable[pd.DataFrame]:
+    if isinstance(results, ChurnResults):
+        return results.iter_shards()
+    return [results]
+
+
+def _sorted(frame: pd.DataFrame, sort: str) -> pd.DataFrame:
+    if sort == 'user_id':
+        return frame.sort_values('user_id', kind='stable')
+    return frame.sort_values('churn_probability', ascending=sort == 'asc', kind='stable')
+
+
+def _user_mask(users: Optional[UserTable], country: Optional[str], subscription_type: Optional[str]) -> Optional[np.ndarray]:
+    """`UserTable.mask` of the users passing the user filters, None when there are no user filters"""
+    filters = {column: value for column, value in [('country', country), ('subscription_type', subscription_type)]
+               if value is not None}
+    if not filters:
+        return None
+    if users is None:
+        raise ValueError("users_df is needed to filter by country or subscription type")
+    return users.mask(**filters)
+
+
+def _with_users(page: pd.DataFrame, users: Optional[UserTable]) -> pd.DataFrame:
+    """The returned page: a fresh index, object reasons and the USER_COLUMNS joined when users are given"""
+    page = page.reset_index(drop=True)
+    page['reason'] = page['reason'].astype(object)
+    if users is not None:
+        for column in USER_COLUMNS:
+            page[column] = users.column(column, page['user_id'])
+    return page
+
+
+@timed('churn.query_at_risk')
+def query_at_risk(results: Union[pd.DataFrame, ChurnResults], users_df: Optional[Union[UserTable, pd.DataFrame]] = None,
+                  reason: Optional[str] = None, country: Optional[str] = None, subscription_type: Optional[str] = None,
+                  sort: Optional[str] = 'desc', offset: int = 0, limit: int = 100) -> Tuple[int, pd.DataFrame]:
+    """
+    One page of at-risk users, filtered and sorted.
+
+    Works on the frame returned by `total_and_categorial_churn` or on a sharded results table, which
+    is scanned one shard at a time and merged into the best offset + limit rows found so far, so
+    memory depends on offset + limit and the size of one shard, not on the number of shards or users.
+    Without filters and sorting a sharded page is read with `ChurnResults.page`, which only opens
+    the shard files the page overlaps.
+
+    Args:
+        results: DataFrame with 'user_id', 'reason' and 'churn_probability', or ChurnResults
+        users_df: UserTable or users DataFrame, needed for the country and subscription filters and joined
+            onto the page. Shard rows are matched to users by row code, not by comparing id strings.
+        reason: Only users with this churn reason
+        country: Only users from this country
+        subscription_type: Only users with this subscription type
+        sort: 'desc' or 'asc' by churn probability, 'user_id' by ascending user id, None keeps the
+            results order (shard order for a sharded table)
+        offset: Index of the first matching user to return
+        limit: Maximum number of users to return
+
+    Returns:
+        Number of matching users, and the page as a DataFrame with 'user_id', 'reason',
+        'churn_probability' plus the USER_COLUMNS when users_df is given
+    """
+    if sort is not None and sort not in SORT_ORDERS:
+        raise ValueError(f"sort must be one of {SORT_ORDERS} or None, got {sort!r}")
+    users = None if users_df is None else UserTable.wrap(users_df)
+    user_mask = _user_mask(users, country, subscription_type)
+    if isinstance(results, ChurnResults) and reason is None and user_mask is None and sort is None:
+        return len(results), _with_users(results.page(offset, limit)[RESULT_COLUMNS], users)
+
+    keep = offset + limit
+    total = 0
+    # Best `keep` rows so far when sorting, otherwise the page rows found so far
+    page = pd.DataFrame(columns=RESULT_COLUMNS)
+    for part in _parts(results):
+        mask = np.ones(len(part), dtype=bool)
+        if reason is not None:
+            mask &= (part['reason'] == reason).to_numpy()
+        if user_mask is not None:
+            mask &= user_mask[users.codes(part['user_id'])]
+        matching = part.loc[mask, RESULT_COLUMNS]
+        if sort is not None:
+            # Only the best `keep` rows of the parts seen so far can make it onto the page. Earlier
+            # parts come first, so ties keep the results order like one stable sort over everything.
+            matching = _sorted(matching, sort).head(keep)
+            if len(matching):
+                page = _sorted(pd.concat([page, matching], ignore_index=True), sort).head(keep) if len(page) else matching
+        else:
+            # Rows before this part's first global index are skipped, rows after the page are dropped
+            matching = matching.iloc[max(offset - total, 0):max(keep - total, 0)]
+            if len(matching):
+                page = pd.concat([page, matching], ignore_index=True) if len(page) else matching
+        total += int(mask.sum())
+
+    page = page.iloc[offset:keep] if sort is not None else page.head(limit)
+    return total, _with_users(page, users)
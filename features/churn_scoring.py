@@ -0,0 +1,207 @@
+"""
+Score churn for every recent user out of core, one shard of users at a time.
+
+Only the last 7 days of events matter for the churn features (a user active in that window also
+has their last session in it), so those partitions are streamed from the event store in record
+batches and split by a hash of user_id into shard files. A process pool then computes the
+features of each shard with `churn_features`, scores them with the churn and reason models, and
+writes the at-risk users to a results table (see storage/churn_results.py). Peak memory depends
+on the batch and shard sizes, not on the number of users. Run from the repository root:
+
+    python -m features.churn_scoring --shards 64 --workers 4
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from features.churn import FEATURE_COLUMNS, churn_features, predict_in_chunks
+from storage.churn_results import CHURN_RESULTS_DIR, ChurnResults, ChurnResultsWriter
+from storage.event_store import EVENT_SCHEMA, EVENTS_DIR, list_partitions, partition_files
+from storage.model_registry import ModelRegistry
+
+N_SHARDS = 16
+BATCH_SIZE = 1_000_000
+# Every event column except content_watched feeds the churn features
+SHARD_COLUMNS = [column for column in EVENT_SCHEMA.names if column != 'content_watched']
+
+
+def shard_of(user_ids, n_shards: int) -> np.ndarray:
+    """Shard number of each user id, stable across processes and runs"""
+    return (pd.util.hash_array(np.asarray(user_ids, dtype=object)) % n_shards).astype(np.int64)
+
+
+def latest_event_time(root: str = EVENTS_DIR) -> Optional[pd.Timestamp]:
+    """Latest login_time in the store, read from the newest day partition only"""
+    days = list_partitions(root)
+    if not days:
+        return None
+    latest = None
+    for path in partition_files(days[-1:], root):
+        value = pc.max(pq.read_table(path, columns=['login_time']).column('login_time')).as_py()
+        if value is not None and (latest is None or value > latest):
+            latest = value
+    return None if latest is None else pd.Timestamp(latest)
+
+
+def split_by_user(since: pd.Timestamp, out_dir: str, n_shards: int, root: str = EVENTS_DIR) -> Dict[int, str]:
+    """
+    Streams the events at or after `since` into one Parquet file per shard of users.
+
+    Returns:
+        Shard number -> file, for the shards that received events
+    """
+    writers: Dict[int, pq.ParquetWriter] = {}
+    paths: Dict[int, str] = {}
+    cutoff = pa.scalar(since.to_pydatetime(), type=pa.timestamp('us'))
+    days = [day for day in list_partitions(root) if day >= since.date()]
+    try:
+        for path in partition_files(days, root):
+            # user_id is read dictionary encoded so each distinct id is hashed once per batch
+            parquet = pq.ParquetFile(path, read_dictionary=['user_id'])
+            for batch in parquet.iter_batches(batch_size=BATCH_SIZE, columns=SHARD_COLUMNS):
+                batch = batch.filter(pc.greater_equal(batch.column('login_time'), cutoff))
+                if batch.num_rows == 0:
+                    continue
+                user_ids = batch.column('user_id')
+                id_shards = shard_of(user_ids.dictionary.to_numpy(zero_copy_only=False), n_shards)
+                shards = id_shards[user_ids.indices.to_numpy(zero_copy_only=False)]
+                order = np.argsort(shards, kind='stable')
+                bounds = np.searchsorted(shards[order], np.arange(n_shards + 1))
+                table = pa.Table.from_batches([batch]).set_column(
+                    SHARD_COLUMNS.index('user_id'), 'user_id', user_ids.dictionary_decode()
+                )
+                for shard in np.flatnonzero(np.diff(bounds)):
+                    part = table.take(pa.array(order[bounds[shard]:bounds[shard + 1]]))
+                    if shard not in writers:
+                        paths[shard] = os.path.join(out_dir, f"shard-{shard:05d}.parquet")
+                        writers[shard] = pq.ParquetWriter(paths[shard], part.schema)
+                    writers[shard].write_table(part)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {int(shard): path for shard, path in paths.items()}
+
+
+# Models of the current worker process, set once by the pool initializer
+_models = {}
+
+
+def _init_worker(churn_model, churn_reason_model) -> None:
+    _models['churn'] = churn_model
+    _models['reason'] = churn_reason_model
+
+
+def _score_shard(shard: int, path: str, today: pd.Timestamp, writer: ChurnResultsWriter) -> dict:
+    churn_model, churn_reason_model = _models['churn'], _models['reason']
+    features = churn_features(pd.read_parquet(path), today=today)
+    prediction_features = features[FEATURE_COLUMNS]
+
+    at_risk = predict_in_chunks(churn_model.predict, prediction_features, name='churn.predict') == 1
+    at_risk_features = prediction_features[at_risk]
+    results = pd.DataFrame({
+        'user_id': features['user_id'].to_numpy()[at_risk],
+        'reason': predict_in_chunks(churn_reason_model.predict, at_risk_features, name='churn.predict_reason'),
+        'churn_probability': predict_in_chunks(
+            lambda chunk: churn_model.predict_proba(chunk)[:, 1], at_risk_features, name='churn.predict_proba'
+        ),
+    })
+    return {
+        'shard': shard,
+        'file': writer.write_shard(shard, results),
+        'rows': len(results),
+        'scored_users': len(features),
+        'reason_counts': results['reason'].value_counts().to_dict(),
+    }
+
+
+def score_store(churn_model, churn_reason_model, n_shards: int = N_SHARDS, workers: Optional[int] = None,
+                root: str = EVENTS_DIR, results_dir: str = CHURN_RESULTS_DIR) -> ChurnResults:
+    """
+    Score every user active in the last 7 days of the store and publish the at-risk users.
+
+    Args:
+        churn_model: Model predicting 1 for users at risk of churn
+        churn_reason_model: Model predicting the churn reason of at-risk users
+        n_shards: Number of user shards, more shards means less memory per worker
+        workers: Worker processes, 0 scores in this process, None uses every core
+        root: Event store directory
+        results_dir: Directory the results table is published to
+
+    Returns:
+        The published results
+    """
+    start = time.perf_counter()
+    today = latest_event_time(root)
+    if today is None:
+        raise ValueError(f"No events found in {root}")
+
+    os.makedirs(results_dir, exist_ok=True)
+    writer = ChurnResultsWriter(results_dir)
+    shard_dir = tempfile.mkdtemp(prefix='.shards-', dir=results_dir)
+    try:
+        shard_files = split_by_user(today - timedelta(days=7), shard_dir, n_shards, root)
+        jobs = [(shard, path, today, writer) for shard, path in sorted(shard_files.items())]
+        if workers == 0:
+            _init_worker(churn_model, churn_reason_model)
+            shards = [_score_shard(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(churn_model, churn_reason_model)) as pool:
+                shards = list(pool.map(_score_shard, *zip(*jobs))) if jobs else []
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+    reason_counts = Counter()
+    for shard in shards:
+        reason_counts.update(shard.pop('reason_counts'))
+    manifest = {
+        'created_at': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'latest_event': today.isoformat(),
+        'n_shards': n_shards,
+        'scored_users': sum(shard['scored_users'] for shard in shards),
+        'at_risk_users': sum(shard['rows'] for shard in shards),
+        'reason_counts': dict(reason_counts),
+        'scoring_seconds': round(time.perf_counter() - start, 3),
+        'shards': shards,
+    }
+    return ChurnResults(writer.commit(manifest))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, default=N_SHARDS)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes, 0 to score in this process')
+    parser.add_argument('--churn-model-version', help='Registry version of churn_model, default the active one')
+    parser.add_argument('--churn-reason-model-version', help='Registry version of churn_reason_model')
+    parser.add_argument('--results-dir', default=CHURN_RESULTS_DIR)
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry()
+    results = score_store(
+        registry.load('churn_model', args.churn_model_version),
+        registry.load('churn_reason_model', args.churn_reason_model_version),
+        n_shards=args.shards,
+        workers=args.workers,
+        results_dir=args.results_dir,
+    )
+    print(f"✅ Scored {results.scored_users} users, {len(results)} at risk, "
+          f"in {results.manifest['scoring_seconds']}s ({results.run_dir})")
+
+
+if __name__ == '__main__':
+    main()
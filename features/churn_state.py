@@ -0,0 +1,166 @@
+import math
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Optional
+
+import pandas as pd
+
+from features.churn import FEATURE_COLUMNS
+
+WINDOW = timedelta(days=7)
+
+
+def _median(counter: Counter, n: int) -> float:
+    """Median of the values counted in `counter` (n values in total), same as pandas' median"""
+    middle = [(n - 1) // 2, n // 2]
+    found = []
+    seen = 0
+    for value in sorted(counter):
+        seen += counter[value]
+        while len(found) < 2 and seen > middle[len(found)]:
+            found.append(value)
+        if len(found) == 2:
+            break
+    return (found[0] + found[1]) / 2
+
+
+def _event_time(event) -> pd.Timestamp:
+    return event[0]
+
+
+class _UserWindow:
+    """Running aggregates over one user's events inside the 7 day window"""
+
+    __slots__ = ("events", "watch_time", "recommended", "pauses", "buffers", "genres", "last_session")
+
+    def __init__(self):
+        # (login_time, total_watch_time, num_pauses, buffer_events, was_recommended, genre), sorted by time
+        self.events = []
+        self.watch_time = 0.0
+        self.recommended = 0
+        self.pauses = Counter()
+        self.buffers = Counter()
+        self.genres = Counter()
+        self.last_session = None
+
+    def add(self, event) -> None:
+        login_time, watch_time, pauses, buffers, recommended, genre = event
+        if self.events and login_time < self.events[-1][0]:
+            insort(self.events, event, key=_event_time)
+        else:
+            self.events.append(event)
+        self.watch_time += watch_time
+        self.recommended += recommended
+        self.pauses[pauses] += 1
+        self.buffers[buffers] += 1
+        self.genres[genre] += 1
+        if self.last_session is None or login_time > self.last_session:
+            self.last_session = login_time
+
+    def expire(self, cutoff: pd.Timestamp) -> None:
+        """Drop events older than the cutoff and take them out of the aggregates"""
+        n_expired = bisect_left(self.events, cutoff, key=_event_time)
+        if n_expired == 0:
+            return
+        for _, watch_time, pauses, buffers, recommended, genre in self.events[:n_expired]:
+            self.watch_time -= watch_time
+            self.recommended -= recommended
+            for counter, key in ((self.pauses, pauses), (self.buffers, buffers), (self.genres, genre)):
+                counter[key] -= 1
+                if counter[key] == 0:
+                    del counter[key]
+        del self.events[:n_expired]
+        if not self.events:
+            self.watch_time = 0.0
+
+
+class ChurnFeatureState:
+    """
+    Per-user churn features maintained incrementally as events arrive.
+
+    Each user active in the window keeps running sums, value counts (for the medians and the
+    genre diversity) and their last session time. Events are expired as the latest event time
+    moves forward, so reading the features costs O(active users) instead of a groupby over the
+    whole event log. The window is the same as `churn_features`: every event at or after
+    7 days before the latest event seen.
+    """
+
+    def __init__(self):
+        self.today: Optional[pd.Timestamp] = None
+        self._users: Dict[str, _UserWindow] = {}
+        self._lock = threading.Lock()
+
+    def update(self, event_df: pd.DataFrame) -> None:
+        """
+        Add a batch of new events to the state.
+
+        Args:
+            event_df: pandas DataFrame with the event columns, events may arrive in any order
+        """
+        if event_df.empty:
+            return
+        login_time = pd.to_datetime(event_df["login_time"])
+        with self._lock:
+            batch_max = login_time.max()
+            advanced = self.today is None or batch_max > self.today
+            if advanced:
+                self.today = batch_max
+            cutoff = self.today - WINDOW
+
+            # Events that are already outside the window can not contribute to any feature:
+            # their user is either not active, or has a later session inside the window
+            in_window = login_time >= cutoff
+            rows = zip(
+                login_time[in_window],
+                event_df["user_id"][in_window],
+                event_df["total_watch_time"][in_window],
+                event_df["num_pauses"][in_window],
+                event_df["buffer_events"][in_window],
+                event_df["was_recommended"][in_window],
+                event_df["genres_watched"][in_window],
+            )
+            for ts, user_id, watch_time, pauses, buffers, recommended, genre in rows:
+                user = self._users.get(user_id)
+                if user is None:
+                    user = self._users[user_id] = _UserWindow()
+                if isinstance(genre, float) and math.isnan(genre):
+                    genre = None
+                user.add((ts, float(watch_time), pauses, buffers, bool(recommended), genre))
+
+            if advanced:
+                self._expire(cutoff)
+
+    def _expire(self, cutoff: pd.Timestamp) -> None:
+        inactive = []
+        for user_id, user in self._users.items():
+            user.expire(cutoff)
+            if not user.events:
+                inactive.append(user_id)
+        for user_id in inactive:
+            del self._users[user_id]
+
+    def features(self) -> pd.DataFrame:
+        """
+        Returns:
+            pandas DataFrame shaped like `churn_features`: 'user_id' followed by FEATURE_COLUMNS,
+            one row per active user, sorted by user_id
+        """
+        with self._lock:
+            rows = []
+            for user_id in sorted(self._users):
+                user = self._users[user_id]
+                sessions = len(user.events)
+                rows.append((
+                    user_id,
+                    user.watch_time,
+                    sessions,
+                    user.watch_time / sessions,
+                    _median(user.pauses, sessions),
+                    _median(user.buffers, sessions),
+                    user.recommended / sessions,
+                    len(user.genres),
+                    (self.today - user.last_session).days,
+                ))
+        return pd.DataFrame.from_records(rows, columns=['user_id'] + FEATURE_COLUMNS)
@@ -0,0 +1,146 @@
+from datetime import timedelta
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from profiling import timed, timer
+
+CATEGORICAL_COLUMNS = ['user_id', 'content_watched', 'genres_watched']
+INT32_COLUMNS = ['num_pauses', 'buffer_events']
+
+
+def _encode_like(values: pd.Series, dtype: pd.CategoricalDtype) -> pd.Series:
+    """
+    Recodes a categorical column against an existing dtype when all of its values are already known.
+
+    Only the new column's categories are looked up (through the cached hash table of the existing
+    categories), so appending a batch of returning users costs O(batch) instead of rebuilding and
+    rehashing a dictionary of every id seen so far. Columns with unseen values are returned unchanged.
+    """
+    known = dtype.categories.get_indexer(values.cat.categories)
+    if (known < 0).any():
+        return values
+    # One extra slot so missing values (code -1) stay missing
+    codes = np.append(known, -1)[values.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype), index=values.index, name=values.name)
+
+
+def _read_only(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    The same columns over read-only views of their arrays, no data is copied.
+
+    Frames derived from the result share those arrays, so an in-place write through any of them
+    (.loc, .iloc, .values) raises instead of changing the data every session reads.
+    """
+    columns = {}
+    for name, column in frame.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes = column.cat.codes.to_numpy()
+            codes.flags.writeable = False
+            columns[name] = pd.Categorical.from_codes(codes, dtype=column.dtype, validate=False)
+        else:
+            values = column.to_numpy()
+            values.flags.writeable = False
+            columns[name] = values
+    # copy=False keeps one block per column over the read-only views
+    return pd.DataFrame(columns, index=frame.index, copy=False)
+
+
+class EventsDataset:
+    """
+    Typed, read-only event log shared by every feature function.
+
+    `login_time` is parsed once, the id and genre columns are categorical and the rows are sorted by
+    `login_time`, so time windows are binary searches on the sorted timestamps instead of a boolean
+    scan of the whole frame. Feature functions receive frames through `frame`, `since` and `window`;
+    those are shallow copies, so adding or replacing columns on them never touches the shared data,
+    and the column arrays are read-only, so writing into them in place raises.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        # Use EventsDataset.from_frame, this expects a frame that is already typed and sorted
+        self._frame = _read_only(frame)
+        self._times = frame['login_time'].to_numpy()
+
+    @classmethod
+    @timed('events.from_frame', rows=lambda cls, event_df: len(event_df))
+    def from_frame(cls, event_df: pd.DataFrame) -> 'EventsDataset':
+        """
+        Args:
+            event_df: pandas DataFrame with event columns, it is copied and left untouched
+
+        Returns:
+            EventsDataset over a typed and time sorted copy of event_df
+        """
+        frame = event_df.copy()
+        with timer('events.parse_login_time', rows=len(frame)):
+            frame['login_time'] = pd.to_datetime(frame['login_time'])
+        for column in CATEGORICAL_COLUMNS:
+            if column in frame.columns and not isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = frame[column].astype('category')
+        for column in INT32_COLUMNS:
+            if column in frame.columns:
+                frame[column] = frame[column].astype(np.int32)
+        frame = frame.sort_values('login_time', kind='stable', ignore_index=True)
+        return cls(frame)
+
+    @classmethod
+    def wrap(cls, events: Union['EventsDataset', pd.DataFrame]) -> 'EventsDataset':
+        """Returns events unchanged if it already is a dataset, otherwise a dataset built from it"""
+        return events if isinstance(events, cls) else cls.from_frame(events)
+
+    def __len__(self) -> int:
+        return len(self._frame)
+
+    @property
+    def columns(self) -> pd.Index:
+        return self._frame.columns
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """All events, sorted by login_time"""
+        return self._frame.copy(deep=False)
+
+    @property
+    def latest(self) -> Optional[pd.Timestamp]:
+        """Time of the latest event, None when there are no events"""
+        return pd.Timestamp(self._times[-1]) if len(self._times) else None
+
+    def since(self, start) -> pd.DataFrame:
+        """Events with login_time >= start"""
+        position = np.searchsorted(self._times, np.datetime64(pd.Timestamp(start)), side='left')
+        return self._frame.iloc[position:].copy(deep=False)
+
+    def append(self, event_df: pd.DataFrame) -> 'EventsDataset':
+        """
+        Args:
+            event_df: New events, e.g. the tail read from the event store
+
+        Returns:
+            New EventsDataset with both the existing and the new events, this one is left unchanged
+        """
+        if event_df.empty:
+            return self
+        new = EventsDataset.from_frame(event_df)._frame
+        for column in CATEGORICAL_COLUMNS:
+            if column in new.columns and column in self._frame.columns:
+                new[column] = _encode_like(new[column], self._frame[column].dtype)
+        frame = pd.concat([self._frame, new], ignore_index=True)
+        for column in CATEGORICAL_COLUMNS:
+            if column in frame.columns and not isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = union_categoricals([self._frame[column], new[column]])
+        if len(self._frame) and new['login_time'].iloc[0] < self._frame['login_time'].iloc[-1]:
+            frame = frame.sort_values('login_time', kind='stable', ignore_index=True)
+        return EventsDataset(frame)
+
+    def trim_before(self, start) -> 'EventsDataset':
+        """New EventsDataset without the events older than start"""
+        return EventsDataset(self.since(start).reset_index(drop=True))
+
+    def window(self, days: float) -> pd.DataFrame:
+        """Events within `days` days of the latest event, boundary included"""
+        if self.latest is None:
+            return self.frame
+        return self.since(self.latest - timedelta(days=days))
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List
+
+
+class LiveMetrics:
+    """
+    Sliding-window counters over the events arriving at the server.
+
+    All state lives in fixed-size ring buffers indexed by second or minute of arrival, so memory is
+    bounded by the window lengths and recording an event is O(1):
+      - events per second over the last `rate_seconds` seconds
+      - distinct active users over the last `active_minutes` minutes
+      - watch time per show per minute over the last `show_minutes` minutes
+    Buckets that fall out of a window are cleared lazily when their slot is reused.
+    """
+
+    def __init__(self, rate_seconds: int = 60, active_minutes: int = 15, show_minutes: int = 60,
+                 clock: Callable[[], float] = time.time):
+        self.rate_seconds = rate_seconds
+        self.active_minutes = active_minutes
+        self.show_minutes = show_minutes
+        self.clock = clock
+        self._lock = threading.Lock()
+
+        self._second_counts = [0] * rate_seconds
+        self._second_stamps = [-1] * rate_seconds
+        self.total_events = 0
+
+        # Users seen in each minute slot, and the last minute each active user was seen
+        self._minute_users = [set() for _ in range(active_minutes)]
+        self._minute_user_stamps = [-1] * active_minutes
+        self._last_seen: Dict[str, int] = {}
+
+        self._show_minutes = [defaultdict(float) for _ in range(show_minutes)]
+        self._show_stamps = [-1] * show_minutes
+
+    def record(self, events: List[Dict[str, Any]]) -> None:
+        """Count a batch of events (dicts with 'user_id', 'content_watched' and 'total_watch_time') as arriving now"""
+        now = self.clock()
+        second = int(now)
+        minute = second // 60
+        with self._lock:
+            slot = second % self.rate_seconds
+            if self._second_stamps[slot] != second:
+                self._second_stamps[slot] = second
+                self._second_counts[slot] = 0
+            self._second_counts[slot] += len(events)
+            self.total_events += len(events)
+
+            user_slot = self._expire_user_slot(minute)
+            show_slot = minute % self.show_minutes
+            if self._show_stamps[show_slot] != minute:
+                self._show_stamps[show_slot] = minute
+                self._show_minutes[show_slot].clear()
+
+            for event in events:
+                user_id = event['user_id']
+                if self._last_seen.get(user_id) != minute:
+                    self._last_seen[user_id] = minute
+                    self._minute_users[user_slot].add(user_id)
+                self._show_minutes[show_slot][event['content_watched']] += event['total_watch_time']
+
+    def _expire_user_slot(self, minute: int) -> int:
+        """Clear the user slot for this minute if it still holds an older minute, returns the slot"""
+        slot = minute % self.active_minutes
+        if self._minute_user_stamps[slot] != minute:
+            old_minute = self._minute_user_stamps[slot]
+            for user_id in self._minute_users[slot]:
+                # Only forget users that were not seen again in a later minute
+                if self._last_seen.get(user_id) == old_minute:
+                    del self._last_seen[user_id]
+            self._minute_users[slot].clear()
+            self._minute_user_stamps[slot] = minute
+        return slot
+
+    def snapshot(self, top_shows: int = 10) -> Dict[str, Any]:
+        """
+        Returns:
+            JSON serialisable dict with the current counter values
+        """
+        now = self.clock()
+        second = int(now)
+        minute = second // 60
+        with self._lock:
+            # Expire every user slot that is older than the window, even without new events
+            for offset in range(self.active_minutes):
+                self._expire_user_slot(minute - offset)
+            events_last_window = sum(
+                count for count, stamp in zip(self._second_counts, self._second_stamps)
+                if second - self.rate_seconds < stamp <= second
+            )
+            per_minute = {
+                stamp: dict(shows) for shows, stamp in zip(self._show_minutes, self._show_stamps)
+                if minute - self.show_minutes < stamp <= minute
+            }
+            total_events = self.total_events
+            active_users = len(self._last_seen)
+
+        totals = Counter()
+        for shows in per_minute.values():
+            totals.update(shows)
+        top = [show_id for show_id, _ in totals.most_common(top_shows)]
+        return {
+            'timestamp': now,
+            'total_events': total_events,
+            'events_per_second': events_last_window / self.rate_seconds,
+            'active_users': active_users,
+            'active_users_window_minutes': self.active_minutes,
+            'watch_time_by_show': {show_id: totals[show_id] for show_id in top},
+            'watch_time_per_minute': [
+                {'minute': stamp * 60, 'shows': {show_id: per_minute[stamp].get(show_id, 0.0) for show_id in top}}
+                for stamp in sorted(per_minute)
+            ],
+        }
@@ -0,0 +1,35 @@
+import pandas as pd
+
+
+class ShowCatalog:
+    """
+    Show metadata indexed by show_id, built once and reused for every lookup.
+
+    Lookups go through a hashed pandas Index, so resolving K show ids costs O(K) no matter how
+    large the catalog is.
+    """
+
+    def __init__(self, shows_df: pd.DataFrame):
+        # Keep the first row for duplicated ids, same as matching on show_id and taking iloc[0]
+        shows = shows_df.drop_duplicates(subset='show_id', keep='first')
+        self.index = pd.Index(shows['show_id'])
+        self.shows = shows.reset_index(drop=True)
+
+    @classmethod
+    def from_csv(cls, path: str = 'data/shows.csv') -> 'ShowCatalog':
+        return cls(pd.read_csv(path))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def lookup(self, show_ids) -> pd.DataFrame:
+        """
+        Args:
+            show_ids: Sequence of show ids
+
+        Returns:
+            pandas DataFrame with the catalog rows for show_ids, in the same order. Ids that are not
+            in the catalog are skipped.
+        """
+        positions = self.index.get_indexer(pd.Index(show_ids))
+        return self.shows.iloc[positions[positions >= 0]].reset_index(drop=True)
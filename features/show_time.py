@@ -1,16 +1,76 @@
+import numpy as np
 import pandas as pd
-import joblib
-from typing import List
-from datetime import timedelta
-from datetime import datetime, timedelta
+from typing import List, Union
+from datetime import datetime
 
+from features.events import EventsDataset
+from features.user_table import UserTable
+from profiling import timed, timer
+
+class ForecastTable:
+    """
+    Predicted user logins for every (dayofweek, hour) slot, computed once per model.
+
+    The activity model only looks at (hour, dayofweek), so all 7x24 answers are predicted in one
+    call when the model is loaded and every forecast after that is an array lookup.
+    """
+
+    def __init__(self, model):
+        slots = pd.DataFrame({
+            'hour': np.tile(np.arange(24), 7),
+            'dayofweek': np.repeat(np.arange(7), 24),
+        })
+        # Round half to even, same as round() on each prediction
+        with timer('activity.predict', rows=len(slots)):
+            predicted = model.predict(slots)
+        self.table = np.rint(predicted).astype(np.int32).reshape(7, 24)
+        self.table.flags.writeable = False
+
+    def day(self, dayofweek: int, scale: float = 1.0) -> List[int]:
+        """Predicted logins for hours 0-23 of a day of the week (Monday=0), optionally scaled"""
+        hours = self.table[dayofweek]
+        if scale != 1.0:
+            hours = np.rint(hours * scale)
+        return [int(value) for value in hours]
+
+    def next_days(self, start: datetime, days: int = 7, scale: float = 1.0) -> pd.DataFrame:
+        """
+        Args:
+            start: First day of the horizon, the time of day is ignored
+            days: Number of days to forecast
+            scale: Factor applied to every prediction, e.g. a country's share of logins
+
+        Returns:
+            pandas DataFrame with one row per hour: 'time' and 'predicted_users'
+        """
+        times = pd.date_range(pd.Timestamp(start).normalize(), periods=days * 24, freq='h')
+        predicted = self.table[times.dayofweek, times.hour]
+        if scale != 1.0:
+            predicted = np.rint(predicted * scale)
+        return pd.DataFrame({'time': times, 'predicted_users': predicted.astype(int)})
+
+def country_shares(events_df: Union[EventsDataset, pd.DataFrame], users_df: Union[UserTable, pd.DataFrame],
+                   days: int = 7) -> pd.Series:
+    """
+    Share of logins coming from each country over the last `days` days, used to split the global forecast.
+
+    Returns:
+        pandas Series indexed by country, summing to 1 (empty when there are no events)
+    """
+    recent = EventsDataset.wrap(events_df).window(days)
+    countries = UserTable.wrap(users_df).column('country', recent['user_id'])
+    shares = countries.value_counts(normalize=True)
+    # Categorical counts list every known country, keep the ones with logins
+    return shares[shares > 0].rename_axis('country')
+
+@timed('activity.predicted_hourly_user_activity')
 def predicted_hourly_user_activity(events_df: pd.DataFrame, model) -> List[int]:
     """
     Predict hourly user activity using a trained ML model (.pkl).
 
     Args:
-        events_df (pd.DataFrame): Contains 'login_time'
-        model: Model to predict the timings
+        events_df (pd.DataFrame): Contains 'login_time' (not used, the model only needs the day of the week)
+        model: Model to predict the timings, or its precomputed ForecastTable
 
     Returns:
         List[int]: Predicted user logins for each hour (0–23)
@@ -20,14 +80,5 @@ def predicted_hourly_user_activity(events_df: pd.DataFrame, model) -> List[int]:
     today = datetime.now()
     dayofweek = today.weekday()  # Monday=0, Sunday=6
 
-    # Prepare feature input: hours 0 to 23 for today
-    features = pd.DataFrame({
-        'hour': list(range(24)),
-        'dayofweek': [dayofweek] * 24
-    })
-
-    # Predict
-    predictions = model.predict(features)
-
-    # Return rounded predictions
-    return [int(round(pred)) for pred in predictions]
+    forecast = model if isinstance(model, ForecastTable) else ForecastTable(model)
+    return forecast.day(dayofweek)
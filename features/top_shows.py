@@ -1,44 +1,114 @@
+import numpy as np
 import pandas as pd
-from datetime import timedelta
-from collections import defaultdict
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
-def get_top_watched_shows_last_week(event_df: pd.DataFrame, shows_df: pd.DataFrame) -> List[Tuple[str, List[str]]]:
+from features.events import EventsDataset
+from features.show_catalog import ShowCatalog
+from profiling import first_arg_rows, timed
+from storage.rollups import RollupStore
+from storage.sketches import SketchStore
+
+def _encode(series: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Integer codes (-1 for missing) and the distinct values they refer to"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, uniques = pd.factorize(series)
+    return codes, pd.Index(uniques)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, highest first, using partial selection instead of a full sort"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    # Break ties on the code so the ranking is deterministic
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+def _show_totals(rollups: RollupStore, window_days: int) -> Tuple[np.ndarray, pd.Index, np.ndarray]:
+    """Watch counts, show ids and watch time sums over the last window_days calendar days of the show rollup"""
+    latest = rollups.latest_hour()
+    if latest is None:
+        return np.zeros(0, dtype=np.int64), pd.Index([]), np.zeros(0)
+    start = (latest.normalize() - pd.Timedelta(days=window_days - 1)).date()
+    totals = rollups.read('show_daily', since=start).groupby('show_id')[['events', 'watch_time']].sum()
+    return totals['events'].to_numpy(), totals.index, totals['watch_time'].to_numpy()
+
+def _show_counts_from_sketches(sketches: SketchStore, window_days: int) -> Tuple[np.ndarray, pd.Index, np.ndarray]:
+    """Approximate watch counts (upper bounds) and show ids over the last window_days calendar days of the sketches"""
+    counts = sketches.window(window_days).shows.counts
+    return counts.to_numpy(), counts.index, np.full(len(counts), np.nan)
+
+@timed('top_shows.top_watched_shows', rows=first_arg_rows)
+def top_watched_shows(event_df: Union[EventsDataset, pd.DataFrame, RollupStore, SketchStore], shows: Union[pd.DataFrame, ShowCatalog], k: int = 10,
+                      window_days: int = 7, rank_by: str = 'count') -> pd.DataFrame:
     """
-    Returns a list of the top 10 watched shows from the last 7 days, with show name and genre.
+    Ranks the most watched shows over the last window_days days.
+
+    With a RollupStore the counts come from the per-show daily rollup and the window is the last
+    window_days whole calendar days, ending on the day of the latest event. With a SketchStore the
+    counts are the Space-Saving upper bounds over the same days (each too high by at most
+    `sketches.window(window_days).shows.max_error`) and watch times are not available.
 
     Args:
-        event_df (pd.DataFrame): DataFrame with event data, including 'login_time' and 'content_watched' (single show IDs).
-        shows_df (pd.DataFrame): DataFrame with show metadata including 'show_id', 'show_name', and 'genre'.
+        event_df (EventsDataset | pd.DataFrame | RollupStore | SketchStore): Event data, including 'login_time',
+            'content_watched' (single show IDs) and 'total_watch_time', or the rollups or sketches.
+        shows (pd.DataFrame | ShowCatalog): Show metadata including 'show_id', 'show_name', and 'genre'.
+        k (int): Number of shows to return.
+        window_days (int): Length of the window, counted back from the latest event.
+        rank_by (str): 'count' to rank by number of watches, 'watch_time' to rank by total watch time.
 
     Returns:
-        List[Tuple[str, List[str]]]: Top 10 (show_name, [genre]) pairs, sorted by watch count.
+        pd.DataFrame: Up to k rows with 'show_id', 'show_name', 'genre', 'watch_count' and 'watch_time',
+        best first. Shows missing from the catalog are left out.
+    """
+    if rank_by not in ('count', 'watch_time'):
+        raise ValueError(f"rank_by must be 'count' or 'watch_time', got {rank_by!r}")
+    catalog = shows if isinstance(shows, ShowCatalog) else ShowCatalog(shows)
+
+    if isinstance(event_df, RollupStore):
+        counts, show_ids, watch_times = _show_totals(event_df, window_days)
+    elif isinstance(event_df, SketchStore):
+        if rank_by != 'count':
+            raise ValueError("Sketches only count watches, rank_by='watch_time' needs the events or rollups")
+        counts, show_ids, watch_times = _show_counts_from_sketches(event_df, window_days)
+    else:
+        # Filter data to the window
+        recent_events = EventsDataset.wrap(event_df).window(window_days)
+
+        # Count watches and sum watch time per show in one pass, skipping NaN show ids
+        codes, show_ids = _encode(recent_events['content_watched'])
+        watch_time = recent_events['total_watch_time'].to_numpy()
+        valid = codes >= 0
+        counts = np.bincount(codes[valid], minlength=len(show_ids))
+        watch_times = np.bincount(codes[valid], weights=watch_time[valid], minlength=len(show_ids))
+
+    top = _top_k(counts if rank_by == 'count' else watch_times, k)
+    top = top[counts[top] > 0]
+
+    ranking = pd.DataFrame({
+        'show_id': show_ids[top],
+        'watch_count': counts[top],
+        'watch_time': watch_times[top],
+    })
+    return ranking.merge(catalog.lookup(ranking['show_id'])[['show_id', 'show_name', 'genre']], on='show_id')[
+        ['show_id', 'show_name', 'genre', 'watch_count', 'watch_time']
+    ]
+
+def get_top_watched_shows_last_week(event_df: Union[EventsDataset, pd.DataFrame, RollupStore, SketchStore], shows_df: Union[pd.DataFrame, ShowCatalog], k: int = 10,
+                                    window_days: int = 7, rank_by: str = 'count') -> List[Tuple[str, List[str]]]:
     """
+    Returns a list of the top watched shows from the last 7 days, with show name and genre.
 
-    # Ensure datetime conversion
-    event_df['login_time'] = pd.to_datetime(event_df['login_time'])
-
-    # Filter data to last 7 days
-    now = event_df['login_time'].max()
-    last_week = now - timedelta(days=7)
-    recent_events = event_df[event_df['login_time'] >= last_week]
-
-    # Count how often each show appears
-    show_counts = defaultdict(int)
-    for show_id in recent_events['content_watched']:
-        if pd.notna(show_id):  # Skip NaN values
-            show_counts[show_id] += 1
-
-    # Sort show_ids by view count and get top 10
-    top_show_ids = sorted(show_counts, key=show_counts.get, reverse=True)[:10]
-
-    # Construct list of (show_name, [genre]) for top 10
-    top_shows = []
-    for show_id in top_show_ids:
-        match = shows_df[shows_df['show_id'] == show_id]
-        if not match.empty:
-            show_name = match['show_name'].iloc[0]
-            genre = match['genre'].iloc[0]
-            top_shows.append((show_name, [genre]))
-
-    return top_shows
+    Args:
+        event_df (EventsDataset | pd.DataFrame | RollupStore | SketchStore): Event data, including 'login_time' and
+            'content_watched' (single show IDs), or the rollups or sketches.
+        shows_df (pd.DataFrame | ShowCatalog): Show metadata including 'show_id', 'show_name', and 'genre'.
+        k (int): Number of shows to return.
+        window_days (int): Length of the window, counted back from the latest event.
+        rank_by (str): 'count' to rank by number of watches, 'watch_time' to rank by total watch time.
+
+    Returns:
+        List[Tuple[str, List[str]]]: Top k (show_name, [genre]) pairs, sorted by watch count (or watch time).
+    """
+    ranking = top_watched_shows(event_df, shows_df, k=k, window_days=window_days, rank_by=rank_by)
+    return [(show_name, [genre]) for show_name, genre in zip(ranking['show_name'], ranking['genre'])]
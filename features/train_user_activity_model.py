@@ -1,34 +1,225 @@
-import pandas as pd
-import joblib
+"""
+Train the hourly user activity model (models/user_activity_model_v<N>.pkl).
+
+Every run saves the model to a file of its own and registers it as a new, active version of
+'timing_model' in the model registry next to it (models/manifest.json), which a running dashboard
+picks up on its next refresh. Earlier versions stay in the registry for a rollback.
+
+Login counts per (day, hour) are built by streaming the event store one record batch at a time,
+so memory depends on the number of hours covered rather than the number of events. The count
+table is kept next to the model, and later runs only recount the newest day partition and any
+newer ones. With ROLLUPS_ENABLED=1 (or --from-rollups) the counts are read from the hourly login
+rollup kept by the server instead (see storage/rollups.py). Run from the repository root:
+
+    python -m features.train_user_activity_model --history-days 28
+    python -m features.train_user_activity_model --warm-start --add-trees 20
+"""
+import argparse
+import json
+import os
+import resource
+import time
 from datetime import datetime, timedelta
+from typing import Optional
+
+import joblib
+import pandas as pd
+import pyarrow.parquet as pq
 from sklearn.ensemble import RandomForestRegressor
 
-# Load event data
-events_df = pd.read_csv('data/events.csv')
-events_df['login_time'] = pd.to_datetime(events_df['login_time'])
+import config
+from storage.event_store import EVENTS_DIR, list_partitions, partition_files
+from storage.model_registry import ModelRegistry
+from storage.rollups import ROLLUPS_DIR, RollupStore
+
+MODEL_PATH = 'models/user_activity_model.pkl'
+COUNTS_PATH = 'models/user_activity_counts.parquet'
+METADATA_PATH = 'models/user_activity_model.json'
+BATCH_SIZE = 1_000_000
+
+
+def count_logins(days, root: str = EVENTS_DIR) -> pd.DataFrame:
+    """
+    Counts logins per hour for the given day partitions, reading only 'login_time' in record batches.
+
+    Returns:
+        pandas DataFrame with 'hour_start' (datetime floored to the hour) and 'user_logins'
+    """
+    totals = []
+    for path in partition_files(days, root):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=BATCH_SIZE, columns=['login_time']):
+            hours = batch.column('login_time').to_pandas().dt.floor('h')
+            totals.append(hours.value_counts())
+    if not totals:
+        return pd.DataFrame({'hour_start': pd.Series(dtype='datetime64[us]'), 'user_logins': pd.Series(dtype='int64')})
+    counts = pd.concat(totals).groupby(level=0).sum()
+    return counts.rename_axis('hour_start').reset_index(name='user_logins')
+
+
+def update_login_counts(counts_path: str = COUNTS_PATH, root: str = EVENTS_DIR, full: bool = False) -> pd.DataFrame:
+    """
+    Brings the stored login count table up to date with the event store.
+
+    The newest day already in the table is recounted (it may have been partial) together with every
+    newer day partition, older days are reused as they are. Use `full` to recount everything, e.g.
+    after late events were written into old partitions.
+
+    Returns:
+        The updated count table, also written to counts_path
+    """
+    days = list_partitions(root)
+    counts = None
+    if not full and os.path.exists(counts_path):
+        counts = pd.read_parquet(counts_path)
+    if counts is not None and len(counts):
+        last_day = counts['hour_start'].max().date()
+        days = [day for day in days if day >= last_day]
+        counts = counts[counts['hour_start'].dt.date < last_day]
+        counts = pd.concat([counts, count_logins(days, root)], ignore_index=True)
+    else:
+        counts = count_logins(days, root)
+    counts = counts.sort_values('hour_start', ignore_index=True)
+    counts.to_parquet(counts_path, index=False)
+    return counts
+
+
+def login_counts_from_rollups(store: RollupStore, since: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    Login counts per hour from the hourly login rollup.
+
+    Returns:
+        pandas DataFrame with 'hour_start' and 'user_logins', like `count_logins`
+    """
+    rollup = store.read('hourly_logins', since=None if since is None else since.date())
+    counts = rollup.rename(columns={'events': 'user_logins'})[['hour_start', 'user_logins']]
+    return counts.sort_values('hour_start', ignore_index=True)
+
+
+def training_table(counts: pd.DataFrame, history_days: int) -> pd.DataFrame:
+    """
+    (day, hour, dayofweek) login counts over the last history_days days before the latest hour with logins.
+
+    The window is aligned to whole hours: the hour containing the cutoff is included.
+    """
+    latest = counts['hour_start'].max()
+    recent = counts[counts['hour_start'] >= (latest - timedelta(days=history_days)).floor('h')]
+    return pd.DataFrame({
+        'day': recent['hour_start'].dt.date,
+        'hour': recent['hour_start'].dt.hour,
+        'dayofweek': recent['hour_start'].dt.dayofweek,
+        'user_logins': recent['user_logins'],
+    })
+
+
+def train(history_days: int = 7, n_estimators: int = 100, n_jobs: int = -1, warm_start: bool = False,
+          add_trees: int = 20, full_recount: bool = False, model_path: str = MODEL_PATH,
+          counts_path: str = COUNTS_PATH, metadata_path: str = METADATA_PATH, root: str = EVENTS_DIR,
+          from_rollups: bool = config.ROLLUPS_ENABLED, rollups_root: str = ROLLUPS_DIR) -> dict:
+    """
+    Train (or extend) the activity model and save it with its metadata.
+
+    Args:
+        history_days: Days of login counts to train on
+        n_estimators: Number of trees for a fresh model
+        n_jobs: Cores used to fit the trees, -1 for all of them
+        warm_start: Keep the trees of the existing model and fit add_trees new ones on the current window
+        add_trees: Trees added by a warm-start run
+        full_recount: Recount every day partition instead of only the newest ones
+        from_rollups: Read the counts from the hourly login rollup instead of counting events
+
+    Returns:
+        Metadata of this run, also recorded in metadata_path
+    """
+    start = time.perf_counter()
+    if from_rollups:
+        store = RollupStore(rollups_root)
+        latest = store.latest_hour()
+        # One extra day so the partially covered first day of the window is complete
+        since = None if latest is None else latest - timedelta(days=history_days + 1)
+        counts = login_counts_from_rollups(store, since)
+    else:
+        counts = update_login_counts(counts_path, root, full=full_recount)
+    if counts.empty:
+        raise ValueError(f"No events found in {rollups_root if from_rollups else root}")
+    table = training_table(counts, history_days)
+    X = table[['hour', 'dayofweek']]
+    y = table['user_logins']
+
+    registry = ModelRegistry(os.path.join(os.path.dirname(model_path), 'manifest.json'), pinned={})
+    if warm_start and 'timing_model' in registry.manifest['models']:
+        # Extends the active version, a copy in memory since the registry loads it memory-mapped
+        model = joblib.load(os.path.join(registry.directory, registry.entry('timing_model')['file']))
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + add_trees, n_jobs=n_jobs)
+    else:
+        warm_start = False
+        model = RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs)
+    model.fit(X, y)
+    # Every version gets a file of its own (user_activity_model_v3.pkl), so earlier versions stay
+    # loadable for a rollback or a MODEL_VERSIONS pin
+    version = registry.next_version('timing_model')
+    stem, extension = os.path.splitext(model_path)
+    version_path = f'{stem}_{version}{extension}'
+    joblib.dump(model, f'{version_path}.tmp')
+    os.replace(f'{version_path}.tmp', version_path)
+    # Forests are read back with mmap_mode='r', which avoids copying their arrays while loading
+    registry.register('timing_model', version_path, version=version, mmap_mode='r')
+
+    run = {
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+        'version': version,
+        'model_path': version_path,
+        'training_seconds': round(time.perf_counter() - start, 3),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'history_days': history_days,
+        'warm_start': warm_start,
+        'n_estimators': model.n_estimators,
+        'n_jobs': n_jobs,
+        'source': 'rollups' if from_rollups else 'events',
+        'training_rows': len(table),
+        'events_counted': int(table['user_logins'].sum()),
+        'latest_hour': str(counts['hour_start'].max()),
+    }
+    metadata = _read_metadata(metadata_path)
+    metadata = {**run, 'runs': metadata.get('runs', []) + [run]}
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return run
 
-# Use data from the last 7 days
-latest_time = events_df["login_time"].max()
-seven_days_ago = latest_time - timedelta(days=7)
-recent_df = events_df[events_df["login_time"] >= seven_days_ago].copy()
 
-# Extract features
-recent_df['hour'] = recent_df['login_time'].dt.hour
-recent_df['dayofweek'] = recent_df['login_time'].dt.dayofweek
-recent_df['day'] = recent_df['login_time'].dt.date
+def _read_metadata(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
 
-# Count logins
-login_counts = recent_df.groupby(['day', 'hour', 'dayofweek']).size().reset_index(name='user_logins')
 
-# Prepare data for model
-X = login_counts[['hour', 'dayofweek']]
-y = login_counts['user_logins']
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history-days', type=int, default=7)
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--warm-start', action='store_true')
+    parser.add_argument('--add-trees', type=int, default=20)
+    parser.add_argument('--full-recount', action='store_true')
+    parser.add_argument('--model-path', default=MODEL_PATH, help='Versions are saved next to it as <name>_v<N>.pkl')
+    parser.add_argument('--from-rollups', action=argparse.BooleanOptionalAction, default=config.ROLLUPS_ENABLED,
+                        help='Read login counts from the hourly rollup (default: ROLLUPS_ENABLED)')
+    args = parser.parse_args(argv)
 
-# Train model
-model = RandomForestRegressor(n_estimators=100, random_state=42)
-model.fit(X, y)
+    run = train(
+        history_days=args.history_days,
+        n_estimators=args.n_estimators,
+        n_jobs=args.n_jobs,
+        warm_start=args.warm_start,
+        add_trees=args.add_trees,
+        full_recount=args.full_recount,
+        model_path=args.model_path,
+        from_rollups=args.from_rollups,
+    )
+    print(f"✅ Model {run['version']} trained and saved to {run['model_path']} in {run['training_seconds']}s "
+          f"(peak RSS {run['peak_rss_mb']} MB)")
 
-# Save model
-joblib.dump(model, 'models/user_activity_model.pkl')
 
-print("✅ Model trained and saved to models/user_activity_model.pkl")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from storage.user_store import CATEGORICAL_COLUMNS, USERS_DB, read_users
+
+
+class UserTable:
+    """
+    Users indexed by user_id, with every id interned to a dense int32 row code.
+
+    The user_id Index is hashed once when the table is built. Resolving K ids to codes afterwards
+    costs O(K), and categorical ids (the event log columns) only resolve their categories. Joins
+    then take rows by code instead of hashing strings again for every frame. Low-cardinality
+    columns are categoricals, so a 10M-user table keeps one dictionary per column rather than 10M
+    Python strings.
+    """
+
+    def __init__(self, users_df: pd.DataFrame):
+        users = users_df.reset_index(drop=True)
+        index = pd.Index(users['user_id'])
+        # is_unique builds the id hash table that every lookup reuses afterwards
+        if not index.is_unique:
+            # Keep the first row for duplicated ids, same as drop_duplicates before set_index
+            users = users[~index.duplicated(keep='first')].reset_index(drop=True)
+            index = pd.Index(users['user_id'])
+        for column in CATEGORICAL_COLUMNS:
+            if column in users.columns and not isinstance(users[column].dtype, pd.CategoricalDtype):
+                users[column] = users[column].astype('category')
+        self.index = index
+        self.frame = users
+
+    @classmethod
+    def from_store(cls, path: str = USERS_DB) -> 'UserTable':
+        return cls(read_users(path))
+
+    @classmethod
+    def wrap(cls, users: Union['UserTable', pd.DataFrame]) -> 'UserTable':
+        """Returns users unchanged if it already is a table, otherwise a table built from it"""
+        return users if isinstance(users, cls) else cls(users)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def codes(self, user_ids) -> np.ndarray:
+        """
+        Args:
+            user_ids: Sequence of user ids, plain or categorical
+
+        Returns:
+            int32 row code of every id, -1 for ids that are not in the table
+        """
+        if isinstance(getattr(user_ids, 'dtype', None), pd.CategoricalDtype):
+            values = pd.Categorical(user_ids)
+            # One extra slot so missing values (code -1) resolve to -1 as well
+            category_codes = np.append(self.index.get_indexer(values.categories), -1)
+            return category_codes[values.codes].astype(np.int32)
+        return self.index.get_indexer(pd.Index(user_ids)).astype(np.int32)
+
+    def column(self, name: str, user_ids) -> pd.Series:
+        """
+        Args:
+            name: Users table column
+            user_ids: Sequence (or Series) of user ids
+
+        Returns:
+            The column value of every id, NaN for unknown ids, with the index of user_ids when it is a Series
+        """
+        values = pd.api.extensions.take(self.frame[name].array, self.codes(user_ids), allow_fill=True)
+        index = user_ids.index if isinstance(user_ids, pd.Series) else None
+        return pd.Series(values, index=index, name=name)
+
+    def mask(self, **equals) -> np.ndarray:
+        """
+        Boolean row mask of the users whose columns equal the given values, e.g. mask(country='US').
+
+        The mask has one extra False entry at the end, so indexing it with `codes` maps unknown ids (-1) to False.
+        """
+        mask = np.ones(len(self) + 1, dtype=bool)
+        mask[-1] = False
+        for column, value in equals.items():
+            mask[:-1] &= (self.frame[column] == value).to_numpy()
+        return mask
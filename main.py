@@ -1,44 +1,94 @@
 import streamlit as st
-import pandas as pd
-import pickle
-import joblib
 
-from ui.churnpage import churnpage
-from ui.activitypage import activitypage
+import config
+from dashboard_data import DashboardData
+from precompute import PrecomputeScheduler
+from profiling import timer
+from ui.churnpage import (churnpage, churnpage_from_results, REQUIRES as CHURN_REQUIRES, RESULTS_REQUIRES,
+                          SNAPSHOT_REQUIRES as CHURN_SNAPSHOT_REQUIRES, PRECOMPUTE_JOBS as CHURN_JOBS)
+from ui.activitypage import activitypage, REQUIRES as ACTIVITY_REQUIRES, PRECOMPUTE_JOBS as ACTIVITY_JOBS
+from ui.performancepage import performancepage
 
-from features.show_time import predicted_hourly_user_activity
-
-@st.cache_data
+@st.cache_resource
 def load_data():
-    """Load and cache the datasets"""
-    shows_df = pd.read_csv('data/shows.csv')
-    events_df = pd.read_csv('data/events.csv')
-    users_df = pd.read_csv('data/users.csv')
-    with open('models/churn_model.pkl', 'rb') as f:
-        churn_model = joblib.load(f)
-    with open('models/churn_reason.pkl', 'rb') as f:
-        churn_reason_model = joblib.load(f)
-    with open('models/user_activity_model.pkl','rb') as f:
-        timing_model = joblib.load(f)
-    return shows_df, events_df, users_df, churn_model, churn_reason_model, timing_model
+    """Registry of datasets and models shared by every session, each loaded when a page first needs it"""
+    return DashboardData()
+
+@st.cache_resource
+def load_scheduler():
+    """Background scheduler shared by every session, None unless PRECOMPUTE_ENABLED=1"""
+    if not config.PRECOMPUTE_ENABLED:
+        return None
+    scheduler = PrecomputeScheduler(load_data(), {**CHURN_JOBS, **ACTIVITY_JOBS},
+                                    config.PRECOMPUTE_CADENCES, config.PRECOMPUTE_WORKERS)
+    scheduler.start()
+    return scheduler
+
+@st.fragment(run_every=config.DASHBOARD_REFRESH_SECONDS)
+def watch_for_new_data(data, scheduler):
+    """Rerun the page when another refresh (from this or any other session) changed the data"""
+    if scheduler is not None:
+        # The scheduler refreshes the data, the page only shows its snapshots
+        shown = st.session_state.get('precompute_shown', {})
+        if any(scheduler.snapshot(name).computed_at != computed_at for name, computed_at in shown.items()):
+            st.rerun()
+        return
+    data.refresh()
+    if st.session_state.get('data_version') != data.version:
+        st.rerun()
 
 def main():
     """Main application function"""
-    # Load cached data
-    shows_df, events_df, users_df, churn_model, churn_reason_model, timing_model = load_data()
+    # Must be the first Streamlit call of the run, before any cached loader can show a spinner
+    st.set_page_config(layout="wide")
     
+    # Get the data registry and pick up anything written since the last refresh
+    data = load_data()
+    scheduler = load_scheduler()
+    if scheduler is None:
+        data.refresh()
+    st.session_state['data_version'] = data.version
+    st.session_state['precompute_shown'] = {}
+
+    def latest_snapshots(jobs):
+        """Latest snapshot of each job, remembered so the page reruns when one of them is replaced"""
+        snapshots = scheduler.latest(jobs)
+        st.session_state['precompute_shown'] = {name: snapshot.computed_at for name, snapshot in snapshots.items()}
+        return snapshots
+    
+    # Approximate mode: distinct counts and top shows come from the sketches kept at ingest
+    approximate = config.SKETCHES_ENABLED and st.sidebar.toggle(
+        "Approximate analytics", key='approximate',
+        help="Read unique users and top shows from the per-day HyperLogLog and Space-Saving sketches instead of the events",
+    )
+    sketches = data.get('sketches') if approximate else None
+
+    # Each page only loads the resources it declares
     def churn_wrapper():
-        return churnpage(events_df, users_df, churn_model, churn_reason_model)
+        with timer('page.churn'):
+            if config.CHURN_SCORING == 'sharded':
+                return churnpage_from_results(**data.load(RESULTS_REQUIRES))
+            if scheduler is not None:
+                # The scheduler's job loads the events and models, the page only needs the users for its table
+                return churnpage(**data.load(CHURN_SNAPSHOT_REQUIRES), snapshot=latest_snapshots(CHURN_JOBS)['churn'], sketches=sketches)
+            return churnpage(**data.load(CHURN_REQUIRES), sketches=sketches)
     
     def activity_wrapper():
-        return activitypage(events_df, shows_df, timing_model)
+        with timer('page.activity'):
+            if scheduler is not None:
+                return activitypage(**data.load(ACTIVITY_REQUIRES), snapshots=latest_snapshots(ACTIVITY_JOBS), sketches=sketches)
+            return activitypage(**data.load(ACTIVITY_REQUIRES), sketches=sketches)
     
     churn_page = st.Page(churn_wrapper, title='Churn Stats', url_path='churn')
     activity_page = st.Page(activity_wrapper, title='User Activity', url_path='activity')
 
-    pg = st.navigation([churn_page, activity_page])
+    pages = [churn_page, activity_page]
+    if config.PROFILING_ENABLED:
+        pages.append(st.Page(performancepage, title='Performance', url_path='performance'))
+
+    pg = st.navigation(pages)
     pg.run()
+    watch_for_new_data(data, scheduler)
     
 if __name__ == '__main__':
     main()
-    
\ No newline at end of file
@@ -0,0 +1,216 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from profiling import timer
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    A heavy computation behind a page, run by the PrecomputeScheduler instead of on every render.
+
+    Args:
+        requires: Function argument name -> dashboard resource, same as a page's REQUIRES
+        function: Called with the loaded resources as keyword arguments, returns the snapshot value
+        cadence: Seconds between runs, unless PRECOMPUTE_CADENCES sets it
+    """
+
+    def __init__(self, requires: Dict[str, str], function: Callable[..., Any], cadence: float):
+        self.requires = requires
+        self.function = function
+        self.cadence = cadence
+
+
+class Snapshot:
+    """Result of one job run. Snapshots are shared by every session and must not be modified."""
+
+    def __init__(self, value: Any, computed_at: datetime, data_version: int, seconds: float):
+        self.value = value
+        self.computed_at = computed_at
+        # DashboardData.version the value was computed from
+        self.data_version = data_version
+        self.seconds = seconds
+
+    def age(self) -> float:
+        """Seconds since the snapshot was computed"""
+        return (datetime.now() - self.computed_at).total_seconds()
+
+    def describe(self) -> str:
+        """Freshness line shown under the page component, e.g. 'Updated 42s ago (12:00:05, took 3.1s)'"""
+        return f"Updated {self.age():.0f}s ago ({self.computed_at:%H:%M:%S}, took {self.seconds:.1f}s)"
+
+
+class _JobState:
+    def __init__(self, job: Job, cadence: float):
+        self.job = job
+        self.cadence = cadence
+        # Jobs only run once a page asked for them, so a dashboard nobody opens the churn page of never scores users
+        self.active = False
+        self.running = False
+        self.next_run = 0.0
+        self.snapshot: Optional[Snapshot] = None
+        # Error of the first run, re-raised to the pages waiting for it. Later failures keep the previous snapshot.
+        self.error: Optional[BaseException] = None
+
+
+class PrecomputeScheduler:
+    """
+    Recomputes the dashboard's heavy analytics in the background and keeps the latest result of each job.
+
+    A loop thread refreshes the DashboardData and hands every due job to a small thread pool, so page
+    renders only read snapshots and their latency does not depend on the data size or on how many
+    sessions are open. A job is due `cadence` seconds after its last run, and is skipped (until its next
+    cadence) when the data did not change since its snapshot was computed. A failed run is logged and
+    retried on the next cadence, pages keep the previous snapshot meanwhile.
+
+    Threads rather than processes: the jobs read the datasets and models the DashboardData holds in this
+    process, copying them to worker processes would cost more than most jobs.
+    """
+
+    def __init__(self, data, jobs: Dict[str, Job], cadences: Optional[Dict[str, float]] = None,
+                 workers: int = 2, tick: float = 1.0):
+        """
+        Args:
+            data: DashboardData the jobs load their resources from, refreshed by the scheduler
+            jobs: Job name -> Job
+            cadences: Job name -> seconds between runs, overrides the jobs' own cadence
+            workers: Maximum number of jobs running at the same time
+            tick: Seconds between checks for due jobs
+        """
+        cadences = cadences or {}
+        unknown = set(cadences) - set(jobs)
+        if unknown:
+            raise KeyError(f"Unknown precompute jobs {sorted(unknown)}, expected some of {sorted(jobs)}")
+        self.data = data
+        self.tick = tick
+        self.workers = workers
+        self._jobs = {name: _JobState(job, cadences.get(name, job.cadence)) for name, job in jobs.items()}
+        self._lock = threading.Lock()
+        self._published = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    def start(self) -> None:
+        """Start the scheduling thread and the worker pool"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="precompute")
+        self._thread = threading.Thread(target=self._run, name="precompute-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop scheduling and wait for the running jobs to finish"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def snapshot(self, name: str) -> Optional[Snapshot]:
+        """Latest snapshot of a job, None before its first successful run"""
+        return self._jobs[name].snapshot
+
+    def latest(self, names: Iterable[str], timeout: Optional[float] = None) -> Dict[str, Snapshot]:
+        """
+        Latest snapshot of each job, waiting for the first run of jobs that have none yet.
+
+        Args:
+            names: Job names, e.g. a page's PRECOMPUTE_JOBS
+            timeout: Maximum seconds to wait, None waits as long as the first runs take
+
+        Returns:
+            Job name -> Snapshot
+
+        Raises:
+            TimeoutError: A first run did not finish in time
+            Exception: Whatever the first run of a job raised
+        """
+        names = list(names)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            for name in names:
+                self._jobs[name].active = True
+        self._wake.set()
+
+        snapshots = {}
+        with self._published:
+            for name in names:
+                state = self._jobs[name]
+                while state.snapshot is None:
+                    if state.error is not None:
+                        raise state.error
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"Precompute job {name!r} has not finished its first run")
+                    self._published.wait(remaining)
+                snapshots[name] = state.snapshot
+        return snapshots
+
+    def run_now(self, name: str) -> Optional[Snapshot]:
+        """Run a job in the calling thread, e.g. to warm up before serving. Returns the new snapshot."""
+        state = self._jobs[name]
+        with self._lock:
+            state.active = True
+            state.running = True
+        self._run_job(name, state)
+        return state.snapshot
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(timeout=self.tick)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.data.refresh()
+            except Exception:
+                logger.exception("Failed to refresh the dashboard data")
+            self._submit_due()
+
+    def _submit_due(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for name, state in self._jobs.items():
+                if not state.active or state.running or now < state.next_run:
+                    continue
+                if state.snapshot is not None and state.snapshot.data_version == self.data.version:
+                    # Nothing changed, the snapshot is still the answer
+                    state.next_run = now + state.cadence
+                    continue
+                state.running = True
+                self._pool.submit(self._run_job, name, state)
+
+    def _run_job(self, name: str, state: _JobState) -> None:
+        data_version = self.data.version
+        computed_at = datetime.now()
+        start = time.perf_counter()
+        try:
+            with timer(f'precompute.{name}'):
+                value = state.job.function(**self.data.load(state.job.requires))
+        except Exception as error:
+            logger.exception("Precompute job %s failed, keeping its previous snapshot", name)
+            with self._published:
+                if state.snapshot is None:
+                    state.error = error
+                state.running = False
+                state.next_run = time.monotonic() + state.cadence
+                self._published.notify_all()
+            return
+        snapshot = Snapshot(value, computed_at, data_version, time.perf_counter() - start)
+        with self._published:
+            state.snapshot = snapshot
+            state.error = None
+            state.running = False
+            state.next_run = time.monotonic() + state.cadence
+            self._published.notify_all()
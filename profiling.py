@@ -0,0 +1,187 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+
+# Upper bounds (seconds) of the latency histogram buckets, the last bucket is unbounded
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+
+class _Timing:
+    """Latency histogram and row count of one instrumented call site"""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def add(self, seconds: float, rows: Optional[int]) -> None:
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if rows is not None:
+            self.rows += rows
+
+    def quantile(self, q: float) -> float:
+        """Estimated from the buckets like Prometheus' histogram_quantile: linear within the bucket"""
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = min(BUCKETS[index], self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+class _Span:
+    """Handle yielded by `Profiler.timer`, set `rows` inside the block when it is only known there"""
+    __slots__ = ('rows',)
+
+    def __init__(self, rows: Optional[int] = None):
+        self.rows = rows
+
+
+class Profiler:
+    """
+    Per-call latency histograms and row counts for the hot paths of the dashboard and the server.
+
+    Call sites are instrumented with the `timed` decorator or the `timer` context manager under a
+    dotted name (e.g. 'churn.predict'). When the profiler is disabled both reduce to a single
+    attribute check, so the instrumentation can stay in place in production.
+    """
+
+    def __init__(self, enabled: bool = False, clock: Callable[[], float] = time.perf_counter):
+        self.enabled = enabled
+        self._clock = clock
+        self._timings: Dict[str, _Timing] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, rows: Optional[int] = None) -> None:
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = _Timing()
+            timing.add(seconds, rows)
+
+    @contextmanager
+    def _timed_block(self, name: str, rows: Optional[int]):
+        span = _Span(rows)
+        start = self._clock()
+        try:
+            yield span
+        finally:
+            self.record(name, self._clock() - start, span.rows)
+
+    def timer(self, name: str, rows: Optional[int] = None):
+        """
+        Context manager timing its block under `name`.
+
+        Args:
+            name: Call site name
+            rows: Rows processed by the block, can also be set on the yielded span
+        """
+        if not self.enabled:
+            return _DISABLED
+        return self._timed_block(name, rows)
+
+    def timed(self, name: str, rows: Optional[Callable[..., int]] = None):
+        """
+        Decorator timing every call of the function under `name`.
+
+        Args:
+            name: Call site name
+            rows: Called with the function's arguments to count the rows it processes, e.g. `lambda df, *_: len(df)`
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = self._clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(name, self._clock() - start, rows(*args, **kwargs) if rows else None)
+            return wrapper
+        return decorator
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timings = {}
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        Returns:
+            One dict per call site: name, calls, rows, total/mean/p50/p90/p99/max seconds, sorted by total time
+        """
+        with self._lock:
+            rows = [
+                {
+                    'name': name,
+                    'calls': timing.count,
+                    'rows': timing.rows,
+                    'total_seconds': timing.total,
+                    'mean_seconds': timing.total / timing.count,
+                    'p50_seconds': timing.quantile(0.5),
+                    'p90_seconds': timing.quantile(0.9),
+                    'p99_seconds': timing.quantile(0.99),
+                    'max_seconds': timing.max,
+                }
+                for name, timing in self._timings.items()
+            ]
+        return sorted(rows, key=lambda row: row['total_seconds'], reverse=True)
+
+    def prometheus(self, prefix: str = 'livestream') -> str:
+        """All histograms in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {prefix}_call_seconds Latency of instrumented calls",
+            f"# TYPE {prefix}_call_seconds histogram",
+        ]
+        with self._lock:
+            timings = sorted(self._timings.items())
+            for name, timing in timings:
+                cumulative = 0
+                for bound, count in zip(BUCKETS, timing.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{prefix}_call_seconds_bucket{{name="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_call_seconds_sum{{name="{name}"}} {timing.total}')
+                lines.append(f'{prefix}_call_seconds_count{{name="{name}"}} {timing.count}')
+            lines.append(f"# HELP {prefix}_call_rows_total Rows processed by instrumented calls")
+            lines.append(f"# TYPE {prefix}_call_rows_total counter")
+            for name, timing in timings:
+                lines.append(f'{prefix}_call_rows_total{{name="{name}"}} {timing.rows}')
+        return "\n".join(lines) + "\n"
+
+
+def first_arg_rows(first, *args, **kwargs) -> Optional[int]:
+    """`rows` counter for functions whose first argument is the frame (or dataset) they process, None for other sources"""
+    return len(first) if hasattr(first, '__len__') else None
+
+
+class _DisabledTimer:
+    """Shared no-op context manager returned by `Profiler.timer` while profiling is off"""
+
+    def __enter__(self):
+        return _NO_SPAN
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _Span()
+_DISABLED = _DisabledTimer()
+
+# Process wide profiler, each of the dashboard and the server has its own
+profiler = Profiler(enabled=config.PROFILING_ENABLED)
+timed = profiler.timed
+timer = profiler.timer
@@ -1,11 +1,45 @@
-from fastapi import FastAPI
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
-import pandas as pd
+from typing import List, Optional
 
-app = FastAPI()
-event_csv = pd.read_csv("data/events.csv")
+import config
+from features.live_metrics import LiveMetrics
+from profiling import profiler, timer
+from storage.event_buffer import EventBuffer
+from storage.event_store import store_sink
+from storage.day_partitions import summary_sink
+from storage.rollups import RollupStore
+from storage.sketches import SketchStore
+from storage.user_store import DuplicateUserError, UserStore
+
+event_sink = store_sink()
+if config.ROLLUPS_ENABLED:
+    event_sink = summary_sink(event_sink, RollupStore())
+if config.SKETCHES_ENABLED:
+    event_sink = summary_sink(event_sink, SketchStore())
+event_buffer = EventBuffer(
+    event_sink,
+    max_size=config.EVENT_BUFFER_MAX_SIZE,
+    flush_interval=config.EVENT_BUFFER_FLUSH_SECONDS,
+)
+live_metrics = LiveMetrics(active_minutes=config.LIVE_METRICS_ACTIVE_MINUTES) if config.LIVE_METRICS_ENABLED else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Opening the store loads the user id index, so do it once the server starts rather than on import
+    app.state.user_store = UserStore()
+    event_buffer.start()
+    yield
+    # Write out anything still queued before the process exits
+    event_buffer.close()
+
+app = FastAPI(lifespan=lifespan)
 
 class UserEventData(BaseModel):
     user_id: str
@@ -28,22 +62,60 @@ class UserRegistrationData(BaseModel):
     churn: str = "no_churn"
 
 @app.post("/register-user")
-async def register_user(data: UserRegistrationData):
-    # Convert the data to a DataFrame row
-    new_row = pd.DataFrame([data.model_dump()])
-    
-    # Append to the existing CSV (assuming users.csv exists)
-    new_row.to_csv("data/users.csv", mode='a', header=False, index=False)
+async def register_user(data: UserRegistrationData, request: Request):
+    # The insert is blocking I/O, run it off the event loop
+    try:
+        await run_in_threadpool(request.app.state.user_store.register, data.model_dump())
+    except DuplicateUserError:
+        raise HTTPException(status_code=409, detail=f"User {data.user_id} is already registered")
     
     return {"message": "User registered successfully", "data": data}
 
 @app.post("/log-event")
 async def add_event_to_datastore(data: UserEventData):
-    # Convert the data to a DataFrame row
-    new_row = pd.DataFrame([data.model_dump()])
-    
-    # Append to the existing CSV
-    new_row.to_csv("data/events.csv", mode='a', header=False, index=False)
+    # Queue the event, the buffer writes it to the datastore in bulk
+    with timer('ingest.log_event', rows=1):
+        records = [data.model_dump()]
+        event_buffer.add(records)
+        if live_metrics is not None:
+            live_metrics.record(records)
     
     return {"message": "Data received successfully", "data": data}
 
+@app.post("/log-events")
+async def add_events_to_datastore(data: List[UserEventData]):
+    # Queue the whole batch at once so clients can send events in bulk
+    with timer('ingest.log_events', rows=len(data)):
+        records = [event.model_dump() for event in data]
+        event_buffer.add(records)
+        if live_metrics is not None:
+            live_metrics.record(records)
+    
+    return {"message": "Data received successfully", "count": len(data)}
+
+@app.get("/metrics/live")
+async def get_live_metrics():
+    if live_metrics is None:
+        return {"message": "Live metrics are disabled"}
+    return live_metrics.snapshot()
+
+@app.get("/metrics/live/stream")
+async def stream_live_metrics():
+    # Server-Sent Events: push a fresh snapshot every LIVE_METRICS_STREAM_SECONDS
+    async def snapshots():
+        while True:
+            payload = live_metrics.snapshot() if live_metrics is not None else {}
+            yield f"data: {json.dumps(payload)}\n\n"
+            await asyncio.sleep(config.LIVE_METRICS_STREAM_SECONDS)
+
+    return StreamingResponse(snapshots(), media_type="text/event-stream")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text format: latency histograms of the instrumented calls (empty unless PROFILING_ENABLED=1)
+    lines = [
+        "# HELP livestream_event_buffer_pending Events queued and not yet written to the store",
+        "# TYPE livestream_event_buffer_pending gauge",
+        f"livestream_event_buffer_pending {event_buffer.pending()}",
+    ]
+    return PlainTextResponse("\n".join(lines) + "\n" + profiler.prometheus(), media_type="text/plain; version=0.0.4")
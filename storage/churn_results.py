@@ -0,0 +1,151 @@
+import json
+import os
+import shutil
+import uuid
+from typing import Any, Dict, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CHURN_RESULTS_DIR = "data/churn_results"
+# Name of the file in CHURN_RESULTS_DIR pointing at the run the dashboard should read
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+RESULT_SCHEMA = pa.schema([
+    ("user_id", pa.string()),
+    ("reason", pa.dictionary(pa.int16(), pa.string())),
+    ("churn_probability", pa.float32()),
+])
+
+RESULT_COLUMNS = RESULT_SCHEMA.names
+
+
+class ChurnResultsWriter:
+    """
+    Writes one scoring run: a Parquet file of at-risk users per shard plus a manifest.
+
+    The run is built in a hidden directory and only becomes visible in `commit`, which renames it
+    into place and then atomically replaces the CURRENT pointer, so readers always see a complete
+    run. The previous run is kept so a reader that is still paging through it is not cut off.
+    """
+
+    def __init__(self, root: str = CHURN_RESULTS_DIR):
+        self.root = root
+        self.name = f"run-{pd.Timestamp.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.tmp_dir = os.path.join(root, f".{self.name}.tmp")
+        os.makedirs(self.tmp_dir)
+
+    def write_shard(self, shard: int, at_risk: pd.DataFrame) -> str:
+        """
+        Args:
+            shard: Shard number
+            at_risk: At-risk users of the shard with RESULT_COLUMNS
+
+        Returns:
+            File name of the shard inside the run
+        """
+        name = f"shard-{shard:05d}.parquet"
+        table = pa.Table.from_pandas(at_risk[RESULT_COLUMNS], schema=RESULT_SCHEMA, preserve_index=False)
+        pq.write_table(table, os.path.join(self.tmp_dir, name))
+        return name
+
+    def commit(self, manifest: Dict[str, Any], keep_runs: int = 2) -> str:
+        """Publishes the run and removes all but the newest keep_runs runs. Returns the run directory"""
+        with open(os.path.join(self.tmp_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        run_dir = os.path.join(self.root, self.name)
+        os.replace(self.tmp_dir, run_dir)
+
+        pointer = os.path.join(self.root, CURRENT_FILE)
+        with open(f"{pointer}.tmp", "w") as f:
+            f.write(self.name)
+        os.replace(f"{pointer}.tmp", pointer)
+
+        runs = sorted(name for name in os.listdir(self.root) if name.startswith("run-"))
+        for name in runs[:-keep_runs]:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        return run_dir
+
+    def abort(self) -> None:
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class ChurnResults:
+    """
+    Read side of a published scoring run.
+
+    Aggregates come from the manifest, so showing them reads no user rows. The at-risk list is read
+    a page at a time: the manifest records the row count of every shard file, so a page only opens
+    the files it overlaps.
+    """
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        with open(os.path.join(run_dir, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self._shards = self.manifest["shards"]
+
+    @classmethod
+    def from_current(cls, pointer: str = os.path.join(CHURN_RESULTS_DIR, CURRENT_FILE)) -> Optional["ChurnResults"]:
+        """The run the CURRENT pointer names, or None if nothing has been scored yet"""
+        try:
+            with open(pointer) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return cls(os.path.join(os.path.dirname(pointer), name))
+
+    def __len__(self) -> int:
+        return self.manifest["at_risk_users"]
+
+    @property
+    def scored_users(self) -> int:
+        return self.manifest["scored_users"]
+
+    @property
+    def churn_percentage(self) -> float:
+        """Share of scored users at risk, truncated to 2 decimals like `total_and_categorial_churn`"""
+        share = len(self) / self.scored_users if self.scored_users > 0 else 0.0
+        return (int(share*100))/100
+
+    @property
+    def reason_counts(self) -> pd.Series:
+        """Number of at-risk users per reason, most common first"""
+        counts = pd.Series(self.manifest["reason_counts"], dtype="int64")
+        return counts.sort_values(ascending=False, kind="stable")
+
+    def page(self, offset: int, limit: int) -> pd.DataFrame:
+        """
+        Args:
+            offset: Index of the first at-risk user to return
+            limit: Maximum number of users to return
+
+        Returns:
+            pandas DataFrame with RESULT_COLUMNS, in shard then user_id order
+        """
+        parts = []
+        start = 0
+        for shard in self._shards:
+            end = start + shard["rows"]
+            if end > offset and start < offset + limit:
+                table = pq.read_table(os.path.join(self.run_dir, shard["file"]))
+                first = max(offset - start, 0)
+                parts.append(table.slice(first, min(end, offset + limit) - start - first))
+            start = end
+            if start >= offset + limit:
+                break
+        if not parts:
+            return RESULT_SCHEMA.empty_table().to_pandas()
+        return pa.concat_tables(parts).to_pandas()
+
+    def iter_shards(self) -> Iterator[pd.DataFrame]:
+        """At-risk users one shard file at a time, for scans that must not hold the whole table"""
+        for shard in self._shards:
+            yield pq.read_table(os.path.join(self.run_dir, shard["file"])).to_pandas()
+
+
+def read_churn_results(path: str = os.path.join(CHURN_RESULTS_DIR, CURRENT_FILE)) -> Optional[ChurnResults]:
+    """Loader for the dashboard, path is the CURRENT pointer file"""
+    return ChurnResults.from_current(path)
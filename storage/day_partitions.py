@@ -0,0 +1,232 @@
+"""
+Day partitioned summary files kept next to the event store: the base of the rollups
+(storage/rollups.py) and the sketches (storage/sketches.py).
+
+Every flushed batch of events is summarised per day and appended as a small partial file
+(<root>/date=.../part-*.ext), the files of a day are merged on read and merged into one file once
+a day has max_parts of them. Subclasses only supply the file format and how summaries merge.
+"""
+import argparse
+import fcntl
+import logging
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from storage.event_store import EVENTS_DIR, list_partitions, partition_files
+
+logger = logging.getLogger(__name__)
+
+# Times a day is listed and read before giving up, when its files keep being compacted away while reading
+READ_ATTEMPTS = 5
+
+
+class DayPartitionedStore:
+    """
+    Summaries of the events of each day, one or more files per day partition.
+
+    Files are written under a temporary name and renamed into place. A merged file lists the files
+    it replaces and readers skip those, so a day is never counted twice while its partial files are
+    being merged and deleted, and a reader that lists a file just before it is deleted lists the day
+    again. Days read once are cached together with the list of files they were read from, and only
+    read again when that list changes.
+
+    Subclasses set EXTENSION and implement `_save`, `_load`, `_read_replaces` and `merge`.
+    """
+
+    EXTENSION = ""
+
+    def __init__(self, root: str, max_parts: int = 64):
+        self.root = root
+        self.max_parts = max_parts
+        self._replaces: Dict[str, Set[str]] = {}
+        self._days: Dict[date, Tuple[Tuple[str, ...], Any]] = {}
+
+    def _save(self, summary: Any, path: str, replaces: Optional[List[str]]) -> None:
+        """Writes a summary to path, `replaces` lists the file names a merged file stands for"""
+        raise NotImplementedError
+
+    def _load(self, path: str) -> Any:
+        raise NotImplementedError
+
+    def _read_replaces(self, path: str) -> List[str]:
+        """File names listed by a merged file"""
+        raise NotImplementedError
+
+    def merge(self, summaries: List[Any]) -> Any:
+        """One summary of everything in `summaries`, the empty summary for an empty list"""
+        raise NotImplementedError
+
+    def _day_dir(self, day: date) -> str:
+        return os.path.join(self.root, f"date={day.isoformat()}")
+
+    @contextmanager
+    def lock(self):
+        """Exclusive lock on the store across processes, held while files are merged (e.g. by several server workers)"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _replaced_by(self, path: str) -> Set[str]:
+        # Merged files are never modified, so their list is read once
+        if path not in self._replaces:
+            self._replaces[path] = set(self._read_replaces(path))
+        return self._replaces[path]
+
+    def _live_files(self, day: date) -> List[str]:
+        """Files of a day partition that are not replaced by a merged file"""
+        directory = self._day_dir(day)
+        if not os.path.isdir(directory):
+            return []
+        files = [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(self.EXTENSION)]
+        replaced = set()
+        for path in files:
+            if os.path.basename(path).startswith("merged-"):
+                replaced |= self._replaced_by(path)
+        return [path for path in files if os.path.basename(path) not in replaced]
+
+    def _write(self, day: date, summary: Any, prefix: str = "part", replaces: Optional[List[str]] = None) -> str:
+        directory = self._day_dir(day)
+        os.makedirs(directory, exist_ok=True)
+        name = f"{prefix}-{pd.Timestamp.now().value}-{uuid.uuid4().hex[:8]}{self.EXTENSION}"
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        self._save(summary, tmp_path, replaces)
+        os.replace(tmp_path, os.path.join(directory, name))
+        return name
+
+    def add(self, day: date, summary: Any) -> None:
+        """Appends the summary of a batch of a day's events, merging the day once it reached max_parts files"""
+        self._write(day, summary)
+        if len(self._live_files(day)) >= self.max_parts:
+            self.compact(day)
+
+    def compact(self, day: date) -> None:
+        """Merges the files of one day partition into a single file and deletes the old ones"""
+        with self.lock():
+            files = self._live_files(day)
+            if len(files) < 2:
+                return
+            self.replace_day(day, self.merge([self._load(path) for path in files]), files)
+
+    def compact_all(self) -> None:
+        for day in self.days():
+            self.compact(day)
+
+    def replace_day(self, day: date, summary: Any, files: List[str]) -> None:
+        """
+        Publishes summary as the day partition in place of `files`, then deletes them.
+
+        Call it while holding `lock()`, so two processes never replace the same files.
+        """
+        self._write(day, summary, prefix="merged", replaces=[os.path.basename(path) for path in files])
+        for path in files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._replaces.pop(path, None)
+
+    def publish_day(self, day: date, summary: Any) -> None:
+        """Replaces every file of a day partition with summary, e.g. one rebuilt from the event store"""
+        with self.lock():
+            self.replace_day(day, summary, self._live_files(day))
+
+    def days(self) -> List[date]:
+        """Sorted days with data"""
+        return list_partitions(self.root)
+
+    def read_day(self, day: date) -> Any:
+        """Summary of every event of one day"""
+        for attempt in range(READ_ATTEMPTS):
+            try:
+                files = tuple(self._live_files(day))
+                cached = self._days.get(day)
+                if cached is not None and cached[0] == files:
+                    return cached[1]
+                summary = self.merge([self._load(path) for path in files])
+            except FileNotFoundError:
+                # Another process compacted the day between listing and reading its files. The merged
+                # file replacing them is already in place, so listing again finds it.
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+                continue
+            self._days[day] = (files, summary)
+            return summary
+
+    def read_days(self, days: List[date]) -> List[Any]:
+        """Summaries of the given days, cached days that are no longer asked for are forgotten"""
+        self._days = {day: cached for day, cached in self._days.items() if day in days}
+        return [self.read_day(day) for day in days]
+
+
+def summary_sink(sink: Callable[[List[Dict[str, Any]]], None], store):
+    """
+    Wraps an `EventBuffer` sink so every batch written to the event store is also appended to a
+    store of summaries (RollupStore, SketchStore).
+
+    A failed update is logged and not retried: the events are already stored (retrying the batch
+    would store them twice), and `backfill` rebuilds the affected days.
+    """
+    def write(records: List[Dict[str, Any]]) -> None:
+        sink(records)
+        try:
+            store.append(records)
+        except Exception:
+            logger.exception("Failed to update %s for %d events, backfill to repair", store.root, len(records))
+    return write
+
+
+def backfill(store, since: Optional[date] = None, events_root: str = EVENTS_DIR, batch_size: int = 1_000_000) -> int:
+    """
+    Recomputes the summaries of every event store day (on or after `since`) from the raw events.
+
+    Each day partition is streamed in record batches of the store's SOURCE_COLUMNS into
+    `store.rebuild_day`, and the rebuilt day replaces all of its files. Events being ingested into
+    a day while it is rebuilt can be counted twice or missed, so backfill days that no longer
+    receive events or stop the server first.
+
+    Returns:
+        Number of events read
+    """
+    total = 0
+
+    def batches(day: date) -> Iterable[pd.DataFrame]:
+        nonlocal total
+        for path in partition_files([day], events_root):
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=store.SOURCE_COLUMNS):
+                total += batch.num_rows
+                yield batch.to_pandas()
+
+    for day in list_partitions(events_root):
+        if since is None or day >= since:
+            store.rebuild_day(day, batches(day))
+    return total
+
+
+def main(store_class, default_root: str, description: str, argv: Optional[List[str]] = None) -> None:
+    """Command line of a summary store: `backfill` from the event store and `compact` every day"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--root", default=default_root)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    fill = subcommands.add_parser("backfill", help="Rebuild from the event store")
+    fill.add_argument("--since", type=date.fromisoformat, help="First day to rebuild, default all days")
+    fill.add_argument("--events-root", default=EVENTS_DIR)
+    subcommands.add_parser("compact", help="Merge the partial files of every day")
+    args = parser.parse_args(argv)
+
+    store = store_class(args.root)
+    if args.command == "backfill":
+        count = backfill(store, args.since, args.events_root)
+        print(f"✅ Rebuilt {args.root} from {count} events")
+    elif args.command == "compact":
+        store.compact_all()
+        print(f"✅ Compacted {args.root}")
@@ -0,0 +1,89 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+Sink = Callable[[List[Dict[str, Any]]], None]
+
+
+class EventBuffer:
+    """
+    In-process write buffer for validated events.
+
+    Records are queued in memory and handed to the sink in bulk once `max_size` records are
+    waiting or `flush_interval` seconds have passed, whichever comes first. Writes happen on a
+    background thread so request handlers never block on disk I/O. `close()` flushes whatever
+    is left, so it should be called on shutdown.
+    """
+
+    def __init__(self, sink: Sink, max_size: int = 500, flush_interval: float = 2.0):
+        self.sink = sink
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """Start the background flush thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="event-buffer-flush", daemon=True)
+        self._thread.start()
+
+    def add(self, records: List[Dict[str, Any]]) -> None:
+        """Queue records for the next flush, waking the flush thread if the buffer is full"""
+        with self._lock:
+            self._pending.extend(records)
+            full = len(self._pending) >= self.max_size
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        """Number of records waiting to be flushed"""
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        Write all queued records to the sink.
+
+        Returns:
+            Number of records written. If the sink raises, the records are put back at the
+            front of the queue so they are retried on the next flush.
+        """
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                self.sink(batch)
+            except Exception:
+                logger.exception("Failed to flush %d events, will retry", len(batch))
+                with self._lock:
+                    self._pending = batch + self._pending
+                return 0
+            return len(batch)
+
+    def close(self) -> None:
+        """Stop the flush thread and write any remaining records"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(timeout=self.flush_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            self.flush()
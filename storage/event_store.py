@@ -0,0 +1,211 @@
+import argparse
+import os
+import uuid
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+EVENTS_DIR = "data/events"
+
+EVENT_SCHEMA = pa.schema([
+    ("user_id", pa.string()),
+    ("login_time", pa.timestamp("us")),
+    ("content_watched", pa.string()),
+    ("genres_watched", pa.string()),
+    ("total_watch_time", pa.float64()),
+    ("num_pauses", pa.int64()),
+    ("buffer_events", pa.int64()),
+    ("was_recommended", pa.bool_()),
+])
+
+EVENT_COLUMNS = EVENT_SCHEMA.names
+
+
+def to_login_time(values: pd.Series) -> pd.Series:
+    """Parse login times the way the store saves them: ISO 8601, converted to naive UTC"""
+    login_time = pd.to_datetime(values, format="ISO8601")
+    if login_time.dt.tz is not None:
+        login_time = login_time.dt.tz_convert("UTC").dt.tz_localize(None)
+    return login_time
+
+
+def _to_table(events: Union[pd.DataFrame, List[Dict[str, Any]]]) -> pa.Table:
+    """Coerce a frame or list of event records to the typed event schema"""
+    df = events if isinstance(events, pd.DataFrame) else pd.DataFrame.from_records(events)
+    df = df[EVENT_COLUMNS].copy()
+    df["login_time"] = to_login_time(df["login_time"])
+    if df["was_recommended"].dtype == object:
+        df["was_recommended"] = df["was_recommended"].map(
+            lambda v: v if isinstance(v, bool) else str(v).strip().lower() == "true"
+        )
+    return pa.Table.from_pandas(df, schema=EVENT_SCHEMA, preserve_index=False)
+
+
+def _partition_dir(root: str, day: date) -> str:
+    return os.path.join(root, f"date={day.isoformat()}")
+
+
+def write_events(events: Union[pd.DataFrame, List[Dict[str, Any]]], root: str = EVENTS_DIR) -> int:
+    """
+    Append events to the store, one new Parquet file per day partition touched.
+
+    Files are written under a temporary name and renamed into place, so readers never see
+    a partially written file.
+
+    Args:
+        events: DataFrame or list of records with the `UserEventData` fields
+        root: Store directory
+
+    Returns:
+        Number of events written
+    """
+    table = _to_table(events)
+    if table.num_rows == 0:
+        return 0
+    days = pd.Series(table.column("login_time").to_pandas()).dt.date
+    for day, idx in days.groupby(days).groups.items():
+        part = table.take(pa.array(idx.to_numpy()))
+        directory = _partition_dir(root, day)
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{pd.Timestamp.now().value}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(part, tmp_path)
+        os.replace(tmp_path, os.path.join(directory, name))
+    return table.num_rows
+
+
+def store_sink(root: str = EVENTS_DIR):
+    """Returns an `EventBuffer` sink that writes each flushed batch into the store"""
+    def write(records: List[Dict[str, Any]]) -> None:
+        write_events(records, root)
+    return write
+
+
+def list_partitions(root: str = EVENTS_DIR) -> List[date]:
+    """Sorted list of the days that have data in the store"""
+    if not os.path.isdir(root):
+        return []
+    days = []
+    for name in os.listdir(root):
+        if name.startswith("date="):
+            days.append(date.fromisoformat(name[len("date="):]))
+    return sorted(days)
+
+
+def partition_files(days: Iterable[date], root: str = EVENTS_DIR) -> List[str]:
+    """All Parquet files belonging to the given day partitions"""
+    files = []
+    for day in days:
+        directory = _partition_dir(root, day)
+        if not os.path.isdir(directory):
+            continue
+        files.extend(
+            os.path.join(directory, name)
+            for name in sorted(os.listdir(directory))
+            if name.endswith(".parquet")
+        )
+    return files
+
+
+def _select_days(days: List[date], last_n_days: Optional[int] = None, since: Optional[date] = None) -> List[date]:
+    if since is not None:
+        days = [day for day in days if day >= since]
+    if last_n_days is not None and days:
+        first_day = days[-1] - timedelta(days=last_n_days - 1)
+        days = [day for day in days if day >= first_day]
+    return days
+
+
+def _read_files(files: List[str], columns: List[str]) -> pd.DataFrame:
+    if not files:
+        return EVENT_SCHEMA.empty_table().select(columns).to_pandas()
+    dataset = ds.dataset(files, schema=EVENT_SCHEMA, format="parquet")
+    return dataset.to_table(columns=columns).to_pandas()
+
+
+def read_events(
+    columns: Optional[List[str]] = None,
+    last_n_days: Optional[int] = None,
+    since: Optional[date] = None,
+    root: str = EVENTS_DIR,
+) -> pd.DataFrame:
+    """
+    Load events from the store, reading only the requested partitions and columns.
+
+    Args:
+        columns: Columns to load, defaults to all event columns
+        last_n_days: Only read the most recent N day partitions that have data
+        since: Only read partitions on or after this day
+        root: Store directory
+
+    Returns:
+        pandas DataFrame with typed columns (`login_time` as datetime64)
+    """
+    columns = list(columns) if columns is not None else EVENT_COLUMNS
+    days = _select_days(list_partitions(root), last_n_days, since)
+    return _read_files(partition_files(days, root), columns)
+
+
+class EventTail:
+    """
+    Incremental reader over the store.
+
+    Store files are never modified once written, so the set of files already read is a complete
+    watermark: each `read_new` call only reads files that appeared since the previous call.
+    """
+
+    def __init__(self, columns: Optional[List[str]] = None, last_n_days: Optional[int] = None,
+                 root: str = EVENTS_DIR):
+        self.columns = list(columns) if columns is not None else EVENT_COLUMNS
+        self.last_n_days = last_n_days
+        self.root = root
+        self._seen = set()
+
+    def read_new(self) -> pd.DataFrame:
+        """
+        Returns:
+            Events from files not read before (everything on the first call), restricted to the
+            last `last_n_days` partitions when set
+        """
+        days = _select_days(list_partitions(self.root), self.last_n_days)
+        files = partition_files(days, self.root)
+        new_files = [path for path in files if path not in self._seen]
+        events = _read_files(new_files, self.columns)
+        # Forget files of partitions that slid out of the window
+        self._seen = self._seen.intersection(files).union(new_files)
+        return events
+
+
+def migrate_csv(csv_path: str, root: str = EVENTS_DIR, chunksize: int = 1_000_000) -> int:
+    """
+    One-shot migration of an events CSV into the Parquet store.
+
+    Args:
+        csv_path: Path to the existing events CSV
+        root: Store directory to write into
+        chunksize: Rows parsed per chunk, bounds memory use for large files
+
+    Returns:
+        Number of events migrated
+    """
+    total = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        total += write_events(chunk, root)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event store utilities")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate = subcommands.add_parser("migrate", help="Copy an events CSV into the Parquet store")
+    migrate.add_argument("csv_path", nargs="?", default="data/events.csv")
+    migrate.add_argument("--root", default=EVENTS_DIR)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        count = migrate_csv(args.csv_path, args.root)
+        print(f"✅ Migrated {count} events from {args.csv_path} to {args.root}")
@@ -0,0 +1,220 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import joblib
+import pandas as pd
+
+import config
+from storage.watch import FileWatcher
+
+MODELS_DIR = "models"
+MODEL_MANIFEST = os.path.join(MODELS_DIR, "manifest.json")
+
+
+class ModelChecksumError(Exception):
+    """Raised when a model file no longer matches the checksum recorded in the manifest"""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def describe(path: str, mmap_mode: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Manifest entry for a model file: checksum, size, class, feature schema and load time.
+
+    The model is loaded twice and the second (warm) load is timed, so the time does not include
+    importing the model's library.
+    """
+    joblib.load(path, mmap_mode=mmap_mode)
+    start = time.perf_counter()
+    model = joblib.load(path, mmap_mode=mmap_mode)
+    load_seconds = time.perf_counter() - start
+    feature_names = getattr(model, "feature_names_in_", None)
+    return {
+        "file": os.path.basename(path),
+        "sha256": _sha256(path),
+        "size_bytes": os.path.getsize(path),
+        "class": f"{type(model).__module__}.{type(model).__name__}",
+        "feature_names": None if feature_names is None else [str(name) for name in feature_names],
+        "n_features": getattr(model, "n_features_in_", None),
+        "mmap_mode": mmap_mode,
+        "load_seconds": round(load_seconds, 4),
+        "registered_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+    }
+
+
+class ModelRegistry:
+    """
+    Versioned models described by models/manifest.json.
+
+    The manifest lists every version of each named model with its file, checksum, size, feature
+    schema and load time, plus the active version. MODEL_VERSIONS pins versions from the
+    environment; otherwise `activate` switches the active version by rewriting the manifest
+    atomically. A running dashboard picks up the change on its next refresh.
+
+    Loaded models are cached per name and reused while the active entry is unchanged, so every
+    session shares one copy. Entries with mmap_mode load numpy arrays as read-only memory maps,
+    which processes loading the same file share through the page cache.
+    """
+
+    def __init__(self, manifest_path: str = MODEL_MANIFEST, pinned: Optional[Dict[str, str]] = None):
+        self.manifest_path = manifest_path
+        self.directory = os.path.dirname(manifest_path)
+        self.pinned = config.MODEL_VERSIONS if pinned is None else pinned
+        self._watcher = FileWatcher(manifest_path)
+        self._manifest = self._read()
+        self._loaded: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Any]:
+        if not os.path.exists(self.manifest_path):
+            return {"models": {}}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest = manifest
+
+    @property
+    def manifest(self) -> Dict[str, Any]:
+        """The manifest, re-read when the file changed"""
+        if self._watcher.changed():
+            self._manifest = self._read()
+            self._watcher.commit()
+        return self._manifest
+
+    def active_version(self, name: str) -> str:
+        if name in self.pinned:
+            return self.pinned[name]
+        try:
+            return self.manifest["models"][name]["active"]
+        except KeyError:
+            raise KeyError(f"No model named {name!r} in {self.manifest_path}")
+
+    def entry(self, name: str, version: Optional[str] = None) -> Dict[str, Any]:
+        version = version or self.active_version(name)
+        try:
+            return {"version": version, **self.manifest["models"][name]["versions"][version]}
+        except KeyError:
+            raise KeyError(f"No version {version!r} of model {name!r} in {self.manifest_path}")
+
+    def load(self, name: str, version: Optional[str] = None):
+        """
+        Returns the model, loading it only if the requested (default: active) entry changed.
+
+        Raises:
+            ModelChecksumError: if the file does not match the manifest checksum
+        """
+        entry = self.entry(name, version)
+        key = (entry["version"], entry["sha256"])
+        with self._lock:
+            cached = self._loaded.get(name)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            path = os.path.join(self.directory, entry["file"])
+            if _sha256(path) != entry["sha256"]:
+                raise ModelChecksumError(f"{path} does not match the checksum of {name} {entry['version']}")
+            model = joblib.load(path, mmap_mode=entry.get("mmap_mode"))
+            self._loaded[name] = (key, model)
+            return model
+
+    def next_version(self, name: str, manifest: Optional[Dict[str, Any]] = None) -> str:
+        """One past the highest vN version of `name` so far, 'v1' for a new model"""
+        manifest = self._read() if manifest is None else manifest
+        versions = manifest["models"].get(name, {}).get("versions", {})
+        numbers = [int(v[1:]) for v in versions if v.startswith("v") and v[1:].isdigit()]
+        return f"v{max(numbers, default=0) + 1}"
+
+    def register(self, name: str, path: str, version: Optional[str] = None, activate: bool = True,
+                 mmap_mode: Optional[str] = None) -> str:
+        """
+        Adds a model file (inside the models directory) as a new version.
+
+        Versions default to one past the highest vN so far (see `next_version`). Every earlier version
+        is kept so it can be activated again, which needs its file: each version must have a file of its
+        own, registering a changed file that an earlier version points at is refused.
+
+        Returns:
+            The registered version
+
+        Raises:
+            ValueError: if an earlier version points at the same file with a different checksum
+        """
+        manifest = self._read()
+        model = manifest["models"].setdefault(name, {"active": None, "versions": {}})
+        entry = describe(path, mmap_mode)
+        for existing, info in model["versions"].items():
+            if info["file"] == entry["file"] and info["sha256"] != entry["sha256"]:
+                raise ValueError(f"{path} was registered as {name} {existing} and has changed since, "
+                                 f"save the new model to a file of its own")
+        version = version or self.next_version(name, manifest)
+        model["versions"][version] = entry
+        if activate or model["active"] not in model["versions"]:
+            model["active"] = version
+        self._write(manifest)
+        return version
+
+    def activate(self, name: str, version: str) -> None:
+        """Makes `version` the active version of `name`, in one atomic rewrite of the manifest"""
+        manifest = self._read()
+        if version not in manifest["models"].get(name, {}).get("versions", {}):
+            raise KeyError(f"No version {version!r} of model {name!r} in {self.manifest_path}")
+        manifest["models"][name]["active"] = version
+        self._write(manifest)
+
+
+def load_model(name: str, version: Optional[str] = None, manifest_path: str = MODEL_MANIFEST):
+    """Loads one model from the registry, for scripts that do not keep a registry around"""
+    return ModelRegistry(manifest_path).load(name, version)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model registry utilities")
+    parser.add_argument("--manifest", default=MODEL_MANIFEST)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("list", help="Show every model version and which one is active")
+    register = subcommands.add_parser("register", help="Add a model file as a new version")
+    register.add_argument("name")
+    register.add_argument("path")
+    register.add_argument("--version")
+    register.add_argument("--mmap", action="store_true", help="Load the model with mmap_mode='r'")
+    register.add_argument("--no-activate", action="store_true")
+    activate = subcommands.add_parser("activate", help="Switch the active version of a model")
+    activate.add_argument("name")
+    activate.add_argument("version")
+    subcommands.add_parser("verify", help="Check every file against its checksum")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.manifest, pinned={})
+    if args.command == "list":
+        for name, model in registry.manifest["models"].items():
+            for version, entry in model["versions"].items():
+                marker = "*" if version == model["active"] else " "
+                print(f"{marker} {name} {version}: {entry['file']} ({entry['size_bytes']} bytes, "
+                      f"{entry['class']}, loads in {entry['load_seconds']}s)")
+    elif args.command == "register":
+        version = registry.register(args.name, args.path, args.version, not args.no_activate,
+                                    "r" if args.mmap else None)
+        print(f"✅ Registered {args.name} {version}")
+    elif args.command == "activate":
+        registry.activate(args.name, args.version)
+        print(f"✅ {args.name} {args.version} is now active")
+    elif args.command == "verify":
+        for name, model in registry.manifest["models"].items():
+            for version, entry in model["versions"].items():
+                ok = _sha256(os.path.join(registry.directory, entry["file"])) == entry["sha256"]
+                print(f"{'✅' if ok else '❌'} {name} {version}: {entry['file']}")
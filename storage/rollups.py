@@ -0,0 +1,196 @@
+"""
+Rollup tables maintained from the event stream, so dashboard metrics and training read per-hour
+and per-day aggregates instead of raw events.
+
+Three tables are kept, each partitioned by day like the event store (data/rollups/<table>/date=.../):
+
+- hourly_logins: one row per hour ('hour_start')
+- user_daily: one row per day and user ('date', 'user_id')
+- show_daily: one row per day and show ('date', 'show_id')
+
+Every row holds 'events' (logins), 'watch_time' (sum of total_watch_time) and 'watch_time_count'
+(number of events with a watch time), so means can be rebuilt exactly from any set of rows.
+Every flushed batch of events is appended as small partial files, which are summed on read and
+merged into one file per day once a day has max_parts of them (see storage/day_partitions.py).
+Rebuild the rollups from the event store (e.g. after enabling them) with:
+
+    python -m storage.rollups backfill --since 2025-06-01
+"""
+import json
+import os
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from storage.day_partitions import DayPartitionedStore, main
+from storage.event_store import to_login_time
+
+ROLLUPS_DIR = "data/rollups"
+# Event columns the rollups are computed from
+SOURCE_COLUMNS = ["user_id", "login_time", "content_watched", "total_watch_time"]
+VALUE_COLUMNS = ["events", "watch_time", "watch_time_count"]
+_VALUE_FIELDS = [("events", pa.int64()), ("watch_time", pa.float64()), ("watch_time_count", pa.int64())]
+
+# Rollup table -> key columns
+ROLLUPS = {
+    "hourly_logins": ["hour_start"],
+    "user_daily": ["date", "user_id"],
+    "show_daily": ["date", "show_id"],
+}
+
+ROLLUP_SCHEMAS = {
+    "hourly_logins": pa.schema([("hour_start", pa.timestamp("us")), *_VALUE_FIELDS]),
+    "user_daily": pa.schema([("date", pa.timestamp("us")), ("user_id", pa.string()), *_VALUE_FIELDS]),
+    "show_daily": pa.schema([("date", pa.timestamp("us")), ("show_id", pa.string()), *_VALUE_FIELDS]),
+}
+
+# Parquet metadata key of a merged file: JSON list of the file names it replaces
+_REPLACES_KEY = b"replaces"
+
+
+def aggregate(events: Union[pd.DataFrame, List[Dict[str, Any]]]) -> Dict[str, pd.DataFrame]:
+    """
+    Rolls events up into every table.
+
+    Args:
+        events: DataFrame or list of records with at least the SOURCE_COLUMNS
+
+    Returns:
+        Table name -> pandas DataFrame with the table's keys and VALUE_COLUMNS
+    """
+    df = events if isinstance(events, pd.DataFrame) else pd.DataFrame.from_records(events)
+    login_time = to_login_time(df["login_time"])
+    watch_time = df["total_watch_time"].astype("float64")
+    values = pd.DataFrame({
+        "events": 1,
+        "watch_time": watch_time,
+        "watch_time_count": watch_time.notna().astype("int64"),
+    })
+    day = login_time.dt.floor("D").rename("date")
+    keys = {
+        "hourly_logins": [login_time.dt.floor("h").rename("hour_start")],
+        "user_daily": [day, df["user_id"].rename("user_id")],
+        "show_daily": [day, df["content_watched"].rename("show_id")],
+    }
+    # NaN keys (events without a show) are dropped, NaN watch times count as 0 in the sums
+    return {table: values.groupby(key, observed=True, sort=False).sum().reset_index() for table, key in keys.items()}
+
+
+def _read_file(path: str) -> pd.DataFrame:
+    # ParquetFile rather than read_table, which would add the hive 'date' partition as a column
+    return pq.ParquetFile(path).read().to_pandas()
+
+
+def merge(table: str, parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """Sums rows with the same key across partial rollups of one table"""
+    if not parts:
+        return ROLLUP_SCHEMAS[table].empty_table().to_pandas()
+    if len(parts) == 1:
+        # Every file already holds each key once
+        return parts[0]
+    frame = pd.concat(parts, ignore_index=True)
+    return frame.groupby(ROLLUPS[table], observed=True, sort=False)[VALUE_COLUMNS].sum().reset_index()
+
+
+class RollupTable(DayPartitionedStore):
+    """
+    The day partitioned Parquet files of one rollup table. A merged file lists the files it
+    replaces in its Parquet metadata.
+    """
+
+    EXTENSION = ".parquet"
+
+    def __init__(self, root: str, table: str, max_parts: int = 64):
+        super().__init__(root, max_parts)
+        self.table = table
+
+    def _save(self, frame: pd.DataFrame, path: str, replaces: Optional[List[str]]) -> None:
+        data = pa.Table.from_pandas(frame, schema=ROLLUP_SCHEMAS[self.table], preserve_index=False)
+        if replaces is not None:
+            data = data.replace_schema_metadata({_REPLACES_KEY: json.dumps(replaces).encode()})
+        pq.write_table(data, path)
+
+    def _load(self, path: str) -> pd.DataFrame:
+        return _read_file(path)
+
+    def _read_replaces(self, path: str) -> List[str]:
+        metadata = pq.read_schema(path).metadata or {}
+        return json.loads(metadata.get(_REPLACES_KEY, b"[]"))
+
+    def merge(self, parts: List[pd.DataFrame]) -> pd.DataFrame:
+        return merge(self.table, parts)
+
+
+class RollupStore:
+    """
+    Every rollup table (data/rollups/<table>/), appended to at ingest and summed on read.
+
+    See `DayPartitionedStore` for how partial files are merged and read.
+    """
+
+    SOURCE_COLUMNS = SOURCE_COLUMNS
+
+    def __init__(self, root: str = ROLLUPS_DIR, max_parts: int = 64):
+        self.root = root
+        self.tables = {table: RollupTable(os.path.join(root, table), table, max_parts) for table in ROLLUPS}
+
+    def append(self, events: Union[pd.DataFrame, List[Dict[str, Any]]]) -> None:
+        """Adds a batch of events to every table, merging days that reached max_parts files"""
+        for table, rollup in aggregate(events).items():
+            days = rollup[ROLLUPS[table][0]].dt.date
+            for day, rows in rollup.groupby(days, sort=False):
+                self.tables[table].add(day, rows)
+
+    def rebuild_day(self, day: date, batches: Iterable[pd.DataFrame]) -> None:
+        """Replaces the rollups of one day with the rollups of `batches`, every event of that day"""
+        parts = {table: [] for table in ROLLUPS}
+        for batch in batches:
+            for table, rollup in aggregate(batch).items():
+                parts[table].append(rollup)
+        for table, rollup_table in self.tables.items():
+            rollup_table.publish_day(day, merge(table, parts[table]))
+
+    def compact(self, table: str, day: date) -> None:
+        """Merges the files of one day partition of a table into a single file"""
+        self.tables[table].compact(day)
+
+    def compact_all(self) -> None:
+        for rollup_table in self.tables.values():
+            rollup_table.compact_all()
+
+    def days(self, table: str = "hourly_logins") -> List[date]:
+        """Sorted days with rollup data"""
+        return self.tables[table].days()
+
+    def read_day(self, table: str, day: date) -> pd.DataFrame:
+        """Rows of one day, each key once"""
+        return self.tables[table].read_day(day)
+
+    def read(self, table: str, since: Optional[date] = None) -> pd.DataFrame:
+        """
+        Args:
+            table: One of ROLLUPS
+            since: Only days on or after this one, defaults to every day
+
+        Returns:
+            pandas DataFrame with the table's keys and VALUE_COLUMNS, each key once
+        """
+        days = [day for day in self.days(table) if since is None or day >= since]
+        frames = self.tables[table].read_days(days)
+        if not frames:
+            return merge(table, [])
+        return pd.concat(frames, ignore_index=True)
+
+    def latest_hour(self) -> Optional[pd.Timestamp]:
+        """Start of the latest hour with logins, None when there are no rollups"""
+        days = self.days("hourly_logins")
+        if not days:
+            return None
+        return self.read_day("hourly_logins", days[-1])["hour_start"].max()
+
+
+if __name__ == "__main__":
+    main(RollupStore, ROLLUPS_DIR, "Rollup table utilities")
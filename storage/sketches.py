@@ -0,0 +1,335 @@
+"""
+Per-day sketches of the event stream for the dashboard's approximate analytics mode.
+
+Every day partition (data/sketches/date=.../) holds EventSketches: a HyperLogLog of the user ids,
+a HyperLogLog of the genres and a SpaceSaving summary of the shows watched.
+
+- HyperLogLog: distinct count in a fixed 2^precision bytes, with a relative standard error of
+  1.04 / sqrt(2^precision).
+- SpaceSaving: the most frequent items with at most `capacity` counters. Every count is an upper
+  bound and count - error a lower bound of the true frequency, and any item more frequent than
+  `floor` (at most total / capacity) is guaranteed to be kept.
+
+Both merge exactly: the merge of two batches' sketches (days, server workers) has the same
+guarantees as one sketch over both. Values are hashed with pandas' fixed-key hash, so sketches
+built in different processes agree.
+
+Like the rollups (see storage/day_partitions.py), each flushed batch of events is written as a
+small partial file and the partial files of a day are merged into one once there are max_parts of
+them. A window is answered by merging the sketches of its days, so its cost and memory depend on
+the number of days, not on the number of events or users. Rebuild the sketches from the event store (e.g. after enabling them) with:
+
+    python -m storage.sketches backfill --since 2025-06-01
+"""
+import math
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from storage.day_partitions import DayPartitionedStore, main
+from storage.event_store import to_login_time
+
+SKETCHES_DIR = "data/sketches"
+# Event columns the sketches are computed from
+SOURCE_COLUMNS = ["user_id", "login_time", "genres_watched", "content_watched"]
+# 16 KB per day, 0.8% relative standard error on distinct users
+USER_PRECISION = 14
+# A handful of genres, linear counting is exact at this size
+GENRE_PRECISION = 8
+# Shows tracked per day, any show watched more than 1/SHOW_CAPACITY of the time is kept
+SHOW_CAPACITY = 1000
+
+
+def hash_values(values) -> np.ndarray:
+    """Stable 64-bit hashes of the non-missing values, a categorical hashes the same as its values"""
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    series = series.dropna()
+    # categorize=False: factorizing first only pays off when values repeat a lot, ids mostly don't
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        category_hashes = pd.util.hash_array(series.cat.categories.to_numpy(dtype=object), categorize=False)
+        return category_hashes[series.cat.codes.to_numpy()]
+    return pd.util.hash_array(series.to_numpy(dtype=object), categorize=False)
+
+
+class HyperLogLog:
+    """
+    Distinct count estimate of everything added, in 2^precision one byte registers.
+
+    The top `precision` bits of a value's hash pick a register, which keeps the longest run of
+    trailing zero bits (plus one) seen in the remaining bits. Merging takes the registerwise max.
+    """
+
+    def __init__(self, precision: int = 14, registers: Optional[np.ndarray] = None):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"precision must be between 4 and 18, got {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+        if len(self.registers) != 1 << precision:
+            raise ValueError(f"Expected {1 << precision} registers for precision {precision}, got {len(self.registers)}")
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of `estimate()`, about 0.8% at the default precision"""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    @property
+    def nbytes(self) -> int:
+        return self.registers.nbytes
+
+    def add(self, values) -> "HyperLogLog":
+        """Adds every non-missing value, returns self"""
+        return self.add_hashes(hash_values(values))
+
+    def add_hashes(self, hashes: np.ndarray) -> "HyperLogLog":
+        bits = 64 - self.precision
+        index = (hashes >> np.uint64(bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << bits) - 1)
+        # Lowest set bit, a power of two so its log2 is exact
+        lowest = rest & (~rest + np.uint64(1))
+        rank = np.full(len(hashes), bits + 1, dtype=np.uint8)
+        nonzero = lowest != 0
+        rank[nonzero] = np.log2(lowest[nonzero]).astype(np.uint8) + 1
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Sketch of everything added to either one"""
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLogs of precision {self.precision} and {other.precision}")
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def estimate(self) -> float:
+        """
+        Estimated number of distinct values added.
+
+        Ertl's improved estimator (2017), computed from the histogram of the register values. Unlike
+        the original HyperLogLog estimate it needs no small range correction and has no bias around
+        2.5 * 2^precision distinct values.
+        """
+        m = len(self.registers)
+        q = 64 - self.precision
+        histogram = np.bincount(self.registers, minlength=q + 2)
+        z = m * _tau(1 - histogram[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * _sigma(histogram[0] / m)
+        return float(m * m / (2 * math.log(2)) / z)
+
+
+def _sigma(x: float) -> float:
+    if x == 1.0:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous, z = z, z + x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0.0 or x == 1.0:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        y *= 0.5
+        previous, z = z, z - (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+class SpaceSaving:
+    """
+    Approximate counts of the most frequent items, with at most `capacity` counters.
+
+    Batches are added as exact counts and merged in, so a batch costs one value_counts rather than
+    one Python step per value. Items missing from a sketch count as `floor`, the upper bound on the
+    frequency of any item it dropped.
+    """
+
+    def __init__(self, capacity: int = 1000, counts: Optional[pd.Series] = None, errors: Optional[pd.Series] = None,
+                 floor: int = 0, total: int = 0):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype="int64") if counts is None else counts
+        self.errors = pd.Series(0, index=self.counts.index, dtype="int64") if errors is None else errors
+        self.floor = floor
+        # Number of values added
+        self.total = total
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.counts.memory_usage(deep=True) + self.errors.memory_usage(index=False))
+
+    @property
+    def max_error(self) -> int:
+        """Largest possible over-count of any item, at most total / capacity"""
+        return max(int(self.errors.max()) if len(self.errors) else 0, self.floor)
+
+    def add(self, values) -> "SpaceSaving":
+        """Adds every non-missing value, returns self"""
+        counts = pd.Series(values).value_counts(dropna=True)
+        # A categorical lists its unused categories with a zero count
+        counts = counts[counts > 0]
+        counts.index = counts.index.astype(object)
+        batch = SpaceSaving(self.capacity, counts.astype("int64"), total=int(counts.sum()))._truncate()
+        merged = self.merge(batch)
+        self.counts, self.errors, self.floor, self.total = merged.counts, merged.errors, merged.floor, merged.total
+        return self
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Sketch of everything added to either one"""
+        items = self.counts.index.union(other.counts.index)
+        counts = (self.counts.reindex(items, fill_value=self.floor)
+                  + other.counts.reindex(items, fill_value=other.floor))
+        errors = (self.errors.reindex(items, fill_value=self.floor)
+                  + other.errors.reindex(items, fill_value=other.floor))
+        merged = SpaceSaving(max(self.capacity, other.capacity), counts, errors,
+                             self.floor + other.floor, self.total + other.total)
+        return merged._truncate()
+
+    def _truncate(self) -> "SpaceSaving":
+        if len(self.counts) > self.capacity:
+            order = np.argsort(-self.counts.to_numpy(), kind="stable")
+            dropped = order[self.capacity:]
+            self.floor = max(self.floor, int(self.counts.iloc[dropped].max()))
+            kept = order[:self.capacity]
+            self.counts, self.errors = self.counts.iloc[kept], self.errors.iloc[kept]
+        return self
+
+    def top(self, k: int) -> pd.DataFrame:
+        """
+        Returns:
+            The k items with the highest counts: "item", "count" (upper bound of the true count) and
+            "lower" (lower bound), highest first
+        """
+        order = np.lexsort((self.counts.index.to_numpy(dtype=str), -self.counts.to_numpy()))[:k]
+        counts = self.counts.iloc[order]
+        return pd.DataFrame({
+            "item": counts.index.to_numpy(),
+            "count": counts.to_numpy(),
+            "lower": counts.to_numpy() - self.errors.iloc[order].to_numpy(),
+        })
+
+
+class EventSketch:
+    """Sketches of a set of events: distinct users and genres, and the most watched shows"""
+
+    def __init__(self, users: Optional[HyperLogLog] = None, genres: Optional[HyperLogLog] = None,
+                 shows: Optional[SpaceSaving] = None, events: int = 0):
+        self.users = users if users is not None else HyperLogLog(USER_PRECISION)
+        self.genres = genres if genres is not None else HyperLogLog(GENRE_PRECISION)
+        self.shows = shows if shows is not None else SpaceSaving(SHOW_CAPACITY)
+        self.events = events
+
+    @classmethod
+    def from_events(cls, events: pd.DataFrame) -> "EventSketch":
+        sketch = cls(events=len(events))
+        sketch.users.add(events["user_id"])
+        sketch.genres.add(events["genres_watched"])
+        sketch.shows.add(events["content_watched"])
+        return sketch
+
+    @property
+    def nbytes(self) -> int:
+        return self.users.nbytes + self.genres.nbytes + self.shows.nbytes
+
+    def merge(self, other: "EventSketch") -> "EventSketch":
+        return EventSketch(self.users.merge(other.users), self.genres.merge(other.genres),
+                           self.shows.merge(other.shows), self.events + other.events)
+
+    def save(self, path: str, replaces: Optional[List[str]] = None) -> None:
+        """Writes the sketch as an .npz file, `replaces` lists the files a merged file stands for"""
+        shows = self.shows
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                users=self.users.registers,
+                genres=self.genres.registers,
+                show_items=shows.counts.index.to_numpy(dtype=str),
+                show_counts=shows.counts.to_numpy(),
+                show_errors=shows.errors.to_numpy(),
+                totals=np.array([self.events, shows.floor, shows.total, shows.capacity], dtype=np.int64),
+                replaces=np.array(replaces or [], dtype=str),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "EventSketch":
+        with np.load(path, allow_pickle=False) as data:
+            events, floor, total, capacity = (int(value) for value in data["totals"])
+            items = pd.Index(data["show_items"].astype(object))
+            shows = SpaceSaving(capacity, pd.Series(data["show_counts"], index=items),
+                                pd.Series(data["show_errors"], index=items), floor, total)
+            users, genres = data["users"], data["genres"]
+        return cls(HyperLogLog(int(np.log2(len(users))), users), HyperLogLog(int(np.log2(len(genres))), genres),
+                   shows, events)
+
+
+class SketchStore(DayPartitionedStore):
+    """
+    Day partitioned EventSketch files (.npz), appended to at ingest and merged on read. A merged
+    file lists the files it replaces in its "replaces" array.
+
+    See `DayPartitionedStore` for how partial files are merged and read.
+    """
+
+    EXTENSION = ".npz"
+    SOURCE_COLUMNS = SOURCE_COLUMNS
+
+    def __init__(self, root: str = SKETCHES_DIR, max_parts: int = 64):
+        super().__init__(root, max_parts)
+
+    def _save(self, sketch: EventSketch, path: str, replaces: Optional[List[str]]) -> None:
+        sketch.save(path, replaces)
+
+    def _load(self, path: str) -> EventSketch:
+        return EventSketch.load(path)
+
+    def _read_replaces(self, path: str) -> List[str]:
+        with np.load(path, allow_pickle=False) as data:
+            return list(data["replaces"])
+
+    def merge(self, sketches: List[EventSketch]) -> EventSketch:
+        return _merge(sketches)
+
+    def append(self, events: Union[pd.DataFrame, List[Dict[str, Any]]]) -> None:
+        """Adds a batch of events to the sketches of their days, merging days that reached max_parts files"""
+        df = events if isinstance(events, pd.DataFrame) else pd.DataFrame.from_records(events)
+        days = to_login_time(df["login_time"]).dt.date
+        for day, rows in df.groupby(days, sort=False):
+            self.add(day, EventSketch.from_events(rows))
+
+    def rebuild_day(self, day: date, batches: Iterable[pd.DataFrame]) -> None:
+        """Replaces the sketch of one day with the sketch of `batches`, every event of that day"""
+        sketch = EventSketch()
+        for batch in batches:
+            sketch = sketch.merge(EventSketch.from_events(batch))
+        self.publish_day(day, sketch)
+
+    def window(self, days: Optional[int] = None) -> EventSketch:
+        """
+        Args:
+            days: Number of calendar days, ending on the latest day with events. None for every day.
+
+        Returns:
+            Sketch of every event in the window, empty when there are no sketches
+        """
+        all_days = self.days()
+        if days is not None and all_days:
+            first_day = all_days[-1] - timedelta(days=days - 1)
+            all_days = [day for day in all_days if day >= first_day]
+        return _merge(self.read_days(all_days))
+
+
+def _merge(sketches: List[EventSketch]) -> EventSketch:
+    merged = EventSketch()
+    for sketch in sketches:
+        merged = merged.merge(sketch)
+    return merged
+
+
+if __name__ == "__main__":
+    main(SketchStore, SKETCHES_DIR, "Event sketch utilities")
@@ -0,0 +1,174 @@
+import argparse
+import sqlite3
+import threading
+from typing import Any, Dict
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+USERS_DB = "data/users.db"
+
+USER_COLUMNS = [
+    "user_id",
+    "email",
+    "age",
+    "country",
+    "registration_date",
+    "preferred_genre",
+    "subscription_type",
+    "churn",
+]
+
+# Older users CSVs name some columns differently: legacy name -> column
+LEGACY_COLUMNS = {"preferred_genres": "preferred_genre"}
+# Filled in by import_csv when a CSV does not have them
+OPTIONAL_COLUMNS = {"churn": "no_churn"}
+
+# Columns with few distinct values, loaded as categoricals (one small dictionary plus an integer code per user)
+CATEGORICAL_COLUMNS = ["country", "registration_date", "preferred_genre", "subscription_type", "churn"]
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    email TEXT,
+    age INTEGER,
+    country TEXT,
+    registration_date TEXT,
+    preferred_genre TEXT,
+    subscription_type TEXT,
+    churn TEXT
+)
+"""
+
+
+class DuplicateUserError(Exception):
+    """Raised when registering a user_id that already exists"""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=30)
+    # WAL lets readers run alongside the single writer, so several server workers can share the file
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(_CREATE_TABLE)
+    return connection
+
+
+class UserStore:
+    """
+    Registered users in an embedded SQLite database, safe to share between server workers.
+
+    Each worker keeps an in-memory set of the user ids it knows about, so most duplicates are
+    rejected without touching the database. The primary key on user_id catches the rest (ids
+    registered by another worker since this one started). Connections are per thread, so calls
+    can be made from a thread pool.
+    """
+
+    def __init__(self, path: str = USERS_DB):
+        self.path = path
+        self._local = threading.local()
+        self._ids_lock = threading.Lock()
+        self._ids = {row[0] for row in self._connection().execute("SELECT user_id FROM users")}
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = _connect(self.path)
+        return connection
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._ids
+
+    def register(self, record: Dict[str, Any]) -> None:
+        """
+        Args:
+            record: User fields as in `UserRegistrationData`
+
+        Raises:
+            DuplicateUserError: if the user_id is already registered
+        """
+        user_id = record["user_id"]
+        if user_id in self._ids:
+            raise DuplicateUserError(user_id)
+        connection = self._connection()
+        try:
+            with connection:
+                connection.execute(
+                    f"INSERT INTO users ({', '.join(USER_COLUMNS)}) VALUES ({', '.join('?' * len(USER_COLUMNS))})",
+                    [record.get(column) for column in USER_COLUMNS],
+                )
+        except sqlite3.IntegrityError:
+            with self._ids_lock:
+                self._ids.add(user_id)
+            raise DuplicateUserError(user_id)
+        with self._ids_lock:
+            self._ids.add(user_id)
+
+    def import_csv(self, csv_path: str) -> int:
+        """
+        One-shot import of an existing users CSV, rows whose user_id already exists are skipped.
+
+        Returns:
+            Number of users imported
+
+        Raises:
+            ValueError: if the CSV lacks one of the USER_COLUMNS (other than the OPTIONAL_COLUMNS)
+        """
+        users = pd.read_csv(csv_path)
+        users = users.rename(columns={old: new for old, new in LEGACY_COLUMNS.items() if new not in users.columns})
+        missing = [column for column in USER_COLUMNS if column not in users.columns and column not in OPTIONAL_COLUMNS]
+        if missing:
+            raise ValueError(f"{csv_path} is missing the columns {missing}, found {list(users.columns)}")
+        users = users.reindex(columns=USER_COLUMNS)
+        for column, default in OPTIONAL_COLUMNS.items():
+            users[column] = users[column].fillna(default)
+        users = users.drop_duplicates(subset="user_id")
+        users = users[~users["user_id"].isin(self._ids)]
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                f"INSERT OR IGNORE INTO users ({', '.join(USER_COLUMNS)}) VALUES ({', '.join('?' * len(USER_COLUMNS))})",
+                users.astype(object).where(users.notna(), None).itertuples(index=False, name=None),
+            )
+        with self._ids_lock:
+            self._ids.update(users["user_id"])
+        return len(users)
+
+
+def read_users(path: str = USERS_DB, chunk_size: int = 1_000_000) -> pd.DataFrame:
+    """
+    All registered users as a pandas DataFrame with the users.csv columns.
+
+    Rows are read chunk_size at a time and the CATEGORICAL_COLUMNS of each chunk are encoded before
+    the next one is read, so those columns are never held as Python strings for more than one chunk.
+    """
+    connection = _connect(path)
+    try:
+        chunks = []
+        query = f"SELECT {', '.join(USER_COLUMNS)} FROM users ORDER BY rowid"
+        for chunk in pd.read_sql_query(query, connection, chunksize=chunk_size):
+            for column in CATEGORICAL_COLUMNS:
+                chunk[column] = chunk[column].astype("category")
+            chunks.append(chunk)
+    finally:
+        connection.close()
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype="category" if column in CATEGORICAL_COLUMNS else object)
+                             for column in USER_COLUMNS})
+    users = pd.concat(chunks, ignore_index=True)
+    for column in CATEGORICAL_COLUMNS:
+        users[column] = union_categoricals([chunk[column] for chunk in chunks])
+    return users
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="User store utilities")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    migrate = subcommands.add_parser("migrate", help="Copy a users CSV into the user store")
+    migrate.add_argument("csv_path", nargs="?", default="data/users.csv")
+    migrate.add_argument("--db", default=USERS_DB)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        count = UserStore(args.db).import_csv(args.csv_path)
+        print(f"✅ Migrated {count} users from {args.csv_path} to {args.db}")
@@ -0,0 +1,41 @@
+import os
+from typing import Optional, Tuple
+
+
+class FileWatcher:
+    """
+    Detects changes to a file by comparing its modification time and size between calls.
+
+    Several paths can be watched together, e.g. a SQLite database and its write-ahead log.
+    A change is reported until `commit` is called, so a caller whose reload failed sees it again:
+
+        if watcher.changed():
+            value = reload()
+            watcher.commit()
+    """
+
+    def __init__(self, *paths: str):
+        self.paths = paths
+        self._signature = self._stat()
+        # Signature seen by the last changed() call, stored by commit()
+        self._seen = self._signature
+
+    def _stat(self) -> Tuple[Optional[Tuple[int, int]], ...]:
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                signature.append(None)
+                continue
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def changed(self) -> bool:
+        """True if any file was modified, created or removed since the last commit (or creation)"""
+        self._seen = self._stat()
+        return self._seen != self._signature
+
+    def commit(self) -> None:
+        """Marks the files as seen in the state the last changed() call found, call it once they were reloaded"""
+        self._signature = self._seen
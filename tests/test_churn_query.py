@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features.churn_query import query_at_risk
+from storage.churn_results import ChurnResults, ChurnResultsWriter
+
+
+@pytest.fixture
+def results(tmp_path):
+    """A published run of 5 shards with 0 to 40 at-risk users each, and the same rows as one frame"""
+    rng = np.random.default_rng(0)
+    writer = ChurnResultsWriter(str(tmp_path))
+    shards, files = [], []
+    for shard, rows in enumerate([12, 0, 40, 7, 25]):
+        at_risk = pd.DataFrame({
+            'user_id': sorted(f's{shard}u{i:03d}' for i in range(rows)),
+            'reason': rng.choice(['price', 'content', 'engagement'], rows),
+            'churn_probability': rng.random(rows).astype('float32'),
+        })
+        shards.append(at_risk)
+        files.append({'file': writer.write_shard(shard, at_risk), 'rows': rows})
+    total = sum(len(shard) for shard in shards)
+    run_dir = writer.commit({'shards': files, 'at_risk_users': total, 'scored_users': 2 * total, 'reason_counts': {}})
+    return ChurnResults(run_dir), pd.concat(shards, ignore_index=True)
+
+
+@pytest.mark.parametrize('offset, limit', [(0, 10), (5, 10), (10, 30), (80, 10), (84, 5), (200, 10)])
+def test_unfiltered_pages_match_the_frame(results, offset, limit):
+    sharded, frame = results
+    total, page = query_at_risk(sharded, sort=None, offset=offset, limit=limit)
+    assert total == len(frame)
+    pd.testing.assert_frame_equal(page, query_at_risk(frame, sort=None, offset=offset, limit=limit)[1], check_dtype=False)
+
+
+def test_unfiltered_page_only_opens_the_overlapping_shards(results, monkeypatch):
+    sharded, frame = results
+    monkeypatch.setattr(ChurnResults, 'iter_shards', lambda self: pytest.fail('scanned every shard'))
+    _, page = query_at_risk(sharded, sort=None, offset=15, limit=10)
+    assert page['user_id'].tolist() == frame['user_id'].iloc[15:25].tolist()
+
+
+@pytest.mark.parametrize('sort', ['desc', 'asc', 'user_id', None])
+def test_filtered_pages_match_the_frame(results, sort):
+    sharded, frame = results
+    for offset in (0, 10):
+        total, page = query_at_risk(sharded, reason='price', sort=sort, offset=offset, limit=10)
+        expected_total, expected = query_at_risk(frame, reason='price', sort=sort, offset=offset, limit=10)
+        assert total == expected_total == (frame['reason'] == 'price').sum()
+        pd.testing.assert_frame_equal(page, expected, check_dtype=False)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_events
+from features.churn import churn_features
+from features.churn_state import ChurnFeatureState
+
+
+def feed(events: pd.DataFrame, chunks: int, seed: int = 0) -> ChurnFeatureState:
+    """ChurnFeatureState after update() with the events shuffled and split into chunks"""
+    shuffled = events.sample(frac=1, random_state=seed).reset_index(drop=True)
+    state = ChurnFeatureState()
+    for chunk in np.array_split(np.arange(len(shuffled)), chunks):
+        state.update(shuffled.iloc[chunk])
+    return state
+
+
+def assert_matches_batch(state: ChurnFeatureState, events: pd.DataFrame) -> None:
+    pd.testing.assert_frame_equal(state.features(), churn_features(events), check_dtype=False)
+
+
+@pytest.mark.parametrize('chunks', [1, 7, 50])
+def test_shuffled_chunks_match_batch(chunks):
+    events = make_events(20_000, n_users=300, days=20)
+    assert_matches_batch(feed(events, chunks), events)
+
+
+def test_chronological_chunks_expire_old_events():
+    # One chunk per day, so the window moves forward and every update expires a day of events
+    events = make_events(20_000, n_users=300, days=30).sort_values('login_time', ignore_index=True)
+    # Users only seen early on drop out of the state once their last session leaves the window
+    early = make_events(200, n_users=5, days=3, end='2025-06-05', seed=1)
+    early['user_id'] = early['user_id'].str.replace('u', 'x')
+    events = pd.concat([early, events], ignore_index=True).sort_values('login_time', ignore_index=True)
+
+    state = ChurnFeatureState()
+    for _, day in events.groupby(events['login_time'].dt.date):
+        state.update(day)
+    features = state.features()
+    assert not features['user_id'].str.startswith('x').any()
+    assert_matches_batch(state, events)
+
+
+def test_events_older_than_the_window_are_ignored():
+    events = make_events(10_000, n_users=200, days=10)
+    late = make_events(500, n_users=200, days=30, end='2025-06-10', seed=2)
+    state = feed(events, 5)
+    # Arrives after the window moved past it
+    state.update(late)
+    assert_matches_batch(state, pd.concat([events, late], ignore_index=True))
+
+
+def test_missing_genres_count_as_one_genre():
+    events = make_events(10_000, n_users=200, days=10)
+    events['genres_watched'] = events['genres_watched'].astype(object)
+    events.loc[events.index % 7 == 0, 'genres_watched'] = np.nan
+    assert_matches_batch(feed(events, 10), events)
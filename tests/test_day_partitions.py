@@ -0,0 +1,96 @@
+import json
+from collections import Counter
+from datetime import date
+
+
+from benchmarks.synthetic import make_events
+from storage.day_partitions import DayPartitionedStore, backfill
+from storage.event_store import write_events
+
+DAY = date(2025, 6, 30)
+
+
+class CountStore(DayPartitionedStore):
+    """Counts per show, the smallest summary that shows double counting"""
+
+    EXTENSION = ".json"
+    SOURCE_COLUMNS = ["login_time", "content_watched"]
+
+    def _save(self, counts, path, replaces):
+        with open(path, "w") as f:
+            json.dump({"counts": counts, "replaces": replaces or []}, f)
+
+    def _load(self, path):
+        with open(path) as f:
+            return Counter(json.load(f)["counts"])
+
+    def _read_replaces(self, path):
+        with open(path) as f:
+            return json.load(f)["replaces"]
+
+    def merge(self, summaries):
+        return sum(summaries, Counter())
+
+    def rebuild_day(self, day, batches):
+        self.publish_day(day, self.merge([Counter(batch["content_watched"].value_counts().to_dict()) for batch in batches]))
+
+
+def test_parts_are_merged_on_read_and_compacted_at_max_parts(tmp_path):
+    store = CountStore(str(tmp_path), max_parts=4)
+    for _ in range(3):
+        store.add(DAY, {"a": 1, "b": 2})
+    assert len(store._live_files(DAY)) == 3
+    assert store.read_day(DAY) == {"a": 3, "b": 6}
+
+    store.add(DAY, {"c": 1})
+    assert len(store._live_files(DAY)) == 1
+    assert store.read_day(DAY) == {"a": 3, "b": 6, "c": 1}
+    # The new file is read even though the day is cached
+    store.add(DAY, {"a": 1})
+    assert store.read_day(DAY) == {"a": 4, "b": 6, "c": 1}
+
+
+def test_a_reader_never_counts_a_day_twice_during_compaction(tmp_path):
+    writer = CountStore(str(tmp_path), max_parts=1_000)
+    for _ in range(4):
+        writer.add(DAY, {"a": 1})
+    files = writer._live_files(DAY)
+    # A crash after the merged file was published but before the parts were deleted
+    writer._write(DAY, Counter({"a": 4}), prefix="merged", replaces=[path.rsplit("/", 1)[1] for path in files])
+    assert CountStore(str(tmp_path)).read_day(DAY) == {"a": 4}
+
+
+def test_read_day_survives_a_compaction_between_listing_and_reading(tmp_path):
+    writer = CountStore(str(tmp_path), max_parts=1_000)
+    for _ in range(4):
+        writer.add(DAY, {"a": 1})
+
+    reader = CountStore(str(tmp_path))
+    live_files = reader._live_files
+
+    def compacted_after_listing(day):
+        files = live_files(day)
+        if len(files) > 1:
+            # The server merges the day and deletes the files this reader just listed
+            writer.compact(day)
+        return files
+
+    reader._live_files = compacted_after_listing
+    assert reader.read_day(DAY) == {"a": 4}
+    assert len(writer._live_files(DAY)) == 1
+
+
+def test_backfill_replaces_every_file_of_a_day(tmp_path):
+    events = make_events(3_000, days=3)
+    write_events(events, str(tmp_path / "events"))
+    store = CountStore(str(tmp_path / "counts"))
+    # Stale parts from before the backfill are replaced, not added to
+    store.add(DAY, {"s000": 1_000})
+
+    assert backfill(store, events_root=str(tmp_path / "events"), batch_size=500) == len(events)
+    for day in store.days():
+        expected = events.loc[events["login_time"].dt.date == day, "content_watched"].value_counts()
+        assert store.read_day(day) == expected.to_dict()
+        assert len(store._live_files(day)) == 1
+    assert store.days() == sorted(events["login_time"].dt.date.unique())
+    assert backfill(store, since=DAY, events_root=str(tmp_path / "events")) == (events["login_time"].dt.date >= DAY).sum()
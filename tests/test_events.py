@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_events, make_shows, make_users
+from features.average_watchtime import average_watchtime_for_7_days, daily_watchtime
+from features.churn import churn_features, total_and_categorial_churn
+from features.events import EventsDataset
+from features.show_time import country_shares
+from features.top_shows import get_top_watched_shows_last_week, top_watched_shows
+from features.user_table import UserTable
+
+
+class AlwaysAtRisk:
+    """Stands in for the churn and reason models, scores every row without looking at it"""
+
+    def predict(self, features):
+        return np.ones(len(features), dtype=int)
+
+    def predict_proba(self, features):
+        return np.tile([0.2, 0.8], (len(features), 1))
+
+
+USERS = UserTable(make_users(300))
+SHOWS = make_shows(200)
+
+FEATURES = {
+    'churn_features': lambda events: churn_features(events),
+    'total_and_categorial_churn': lambda events: total_and_categorial_churn(
+        events, USERS, AlwaysAtRisk(), AlwaysAtRisk(), with_probability=True),
+    'daily_watchtime': lambda events: daily_watchtime(events, days=14),
+    'daily_watchtime_by_country': lambda events: daily_watchtime(events, users_df=USERS, by=['country']),
+    'average_watchtime_for_7_days': average_watchtime_for_7_days,
+    'country_shares': lambda events: country_shares(events, USERS),
+    'top_watched_shows': lambda events: top_watched_shows(events, SHOWS, rank_by='watch_time'),
+    'get_top_watched_shows_last_week': lambda events: get_top_watched_shows_last_week(events, SHOWS),
+}
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return EventsDataset.from_frame(make_events(20_000, n_users=300, days=20))
+
+
+@pytest.mark.parametrize('name', FEATURES)
+def test_feature_functions_leave_the_dataset_unchanged(dataset, name):
+    before = dataset.frame.copy(deep=True)
+    FEATURES[name](dataset)
+    after = dataset.frame
+    assert list(after.columns) == list(before.columns)
+    pd.testing.assert_frame_equal(after, before)
+
+
+def test_frames_handed_out_are_copies(dataset):
+    before = dataset.frame.copy(deep=True)
+    window = dataset.since(dataset.latest - pd.Timedelta(days=1))
+    window['extra'] = 1
+    window['total_watch_time'] = 0.0
+    frame = dataset.frame
+    frame['login_time'] = frame['login_time'].dt.floor('D')
+    pd.testing.assert_frame_equal(dataset.frame, before)
+
+
+@pytest.mark.parametrize('name', FEATURES)
+def test_feature_functions_handle_an_empty_dataset(name):
+    empty = EventsDataset.from_frame(make_events(100).iloc[:0])
+    assert empty.latest is None
+    result = FEATURES[name](empty)
+    if isinstance(result, tuple):
+        churn_percentage, at_risk = result
+        assert churn_percentage == 0 and at_risk.empty
+    else:
+        assert len(result) == 0
+
+
+IN_PLACE_WRITES = {
+    'loc': lambda frame: frame.loc.__setitem__((0, 'total_watch_time'), -1.0),
+    'iloc': lambda frame: frame.iloc.__setitem__((0, list(frame.columns).index('num_pauses')), -1),
+    'values': lambda frame: frame['total_watch_time'].values.__setitem__(0, -1.0),
+    'to_numpy': lambda frame: frame['buffer_events'].to_numpy().__setitem__(0, -1),
+    'categorical': lambda frame: frame.loc.__setitem__((0, 'genres_watched'), 'Drama'),
+    'login_time': lambda frame: frame.loc.__setitem__((0, 'login_time'), pd.Timestamp('2000-01-01')),
+}
+
+
+@pytest.mark.parametrize('write', IN_PLACE_WRITES)
+@pytest.mark.parametrize('view', ['frame', 'since', 'window'])
+def test_in_place_writes_do_not_reach_the_dataset(dataset, view, write):
+    before = dataset.frame.copy(deep=True)
+    frame = {
+        'frame': lambda: dataset.frame,
+        'since': lambda: dataset.since(before['login_time'].iloc[0]),
+        'window': lambda: dataset.window(365),
+    }[view]()
+    with pytest.raises((ValueError, AssertionError)):
+        IN_PLACE_WRITES[write](frame)
+    pd.testing.assert_frame_equal(dataset.frame, before)
+
+
+def test_appended_and_trimmed_datasets_are_read_only(dataset):
+    appended = dataset.append(make_events(10, seed=5))
+    for derived in (appended, appended.trim_before(appended.latest - pd.Timedelta(days=3))):
+        with pytest.raises(ValueError):
+            derived.frame['total_watch_time'].values[0] = -1.0
@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+
+from precompute import Job, PrecomputeScheduler
+
+TICK = 0.01
+
+
+class FakeData:
+    """Stands in for DashboardData: refresh() bumps the version when `changes` is set"""
+
+    def __init__(self, changes: bool = False):
+        self.version = 0
+        self.changes = changes
+        self.values = {'value': 1}
+
+    def refresh(self, force: bool = False) -> bool:
+        if self.changes:
+            self.version += 1
+        return self.changes
+
+    def load(self, requires):
+        return {argument: self.values[name] for argument, name in requires.items()}
+
+
+class Recorder:
+    """Job function recording when it ran, failing while `fail` is set"""
+
+    def __init__(self):
+        self.runs = []
+        self.fail = False
+        self.lock = threading.Lock()
+
+    def __call__(self, value):
+        with self.lock:
+            self.runs.append(time.monotonic())
+        if self.fail:
+            raise RuntimeError('job failed')
+        return value * len(self.runs)
+
+
+@pytest.fixture
+def scheduler_for():
+    schedulers = []
+
+    def make(data, function, cadence):
+        scheduler = PrecomputeScheduler(data, {'job': Job({'value': 'value'}, function, cadence)}, tick=TICK)
+        schedulers.append(scheduler)
+        scheduler.start()
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.stop()
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(TICK)
+
+
+def test_jobs_only_run_once_a_page_asks(scheduler_for):
+    function = Recorder()
+    scheduler = scheduler_for(FakeData(changes=True), function, cadence=0.05)
+    time.sleep(10 * TICK)
+    assert function.runs == []
+    assert scheduler.snapshot('job') is None
+    assert scheduler.latest(['job'], timeout=5)['job'].value == 1
+
+
+def test_runs_every_cadence_while_the_data_changes(scheduler_for):
+    function = Recorder()
+    scheduler = scheduler_for(FakeData(changes=True), function, cadence=0.1)
+    scheduler.latest(['job'], timeout=5)
+    wait_for(lambda: len(function.runs) >= 4)
+    gaps = [later - earlier for earlier, later in zip(function.runs, function.runs[1:])]
+    assert min(gaps) >= 0.1
+    # The 4th run may still be going, its predecessor's snapshot is published
+    assert scheduler.snapshot('job').value >= 3
+
+
+def test_skips_runs_while_the_data_version_is_unchanged(scheduler_for):
+    function = Recorder()
+    data = FakeData(changes=False)
+    scheduler = scheduler_for(data, function, cadence=0.02)
+    first = scheduler.latest(['job'], timeout=5)['job']
+    time.sleep(0.2)
+    assert len(function.runs) == 1
+    assert scheduler.snapshot('job') is first
+
+    data.version += 1
+    wait_for(lambda: scheduler.snapshot('job') is not first)
+    assert scheduler.snapshot('job').data_version == data.version
+    assert len(function.runs) == 2
+
+
+def test_first_run_error_is_raised_by_latest(scheduler_for):
+    function = Recorder()
+    function.fail = True
+    scheduler = scheduler_for(FakeData(changes=True), function, cadence=0.05)
+    with pytest.raises(RuntimeError, match='job failed'):
+        scheduler.latest(['job'], timeout=5)
+    assert scheduler.snapshot('job') is None
+
+    # Retried on the next cadence, and the error is cleared once a run succeeds
+    function.fail = False
+    wait_for(lambda: scheduler.snapshot('job') is not None)
+    assert scheduler.latest(['job'], timeout=5)['job'].value == len(function.runs)
+
+
+def test_failed_runs_keep_the_previous_snapshot(scheduler_for):
+    function = Recorder()
+    scheduler = scheduler_for(FakeData(changes=True), function, cadence=0.03)
+    first = scheduler.latest(['job'], timeout=5)['job']
+    function.fail = True
+    failed = len(function.runs)
+    wait_for(lambda: len(function.runs) >= failed + 3)
+    assert scheduler.snapshot('job') is first
+    assert scheduler.latest(['job'], timeout=5)['job'] is first
+
+    function.fail = False
+    wait_for(lambda: scheduler.snapshot('job') is not first)
+    assert scheduler.snapshot('job').value > first.value
+
+
+def test_latest_times_out_before_the_first_run_finishes(scheduler_for):
+    release = threading.Event()
+    scheduler = scheduler_for(FakeData(), lambda value: release.wait(5), cadence=1)
+    with pytest.raises(TimeoutError):
+        scheduler.latest(['job'], timeout=0.05)
+    release.set()
+    assert scheduler.latest(['job'], timeout=5)['job'].value is True
+
+
+def test_unknown_cadence_is_rejected():
+    with pytest.raises(KeyError):
+        PrecomputeScheduler(FakeData(), {'job': Job({}, lambda: None, 1)}, cadences={'other': 1})
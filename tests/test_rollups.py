@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_events
+from storage.day_partitions import backfill
+from storage.event_store import write_events
+from storage.rollups import ROLLUPS, RollupStore
+
+
+def exact(events: pd.DataFrame, table: str) -> pd.DataFrame:
+    """The table computed directly from the raw events, sorted by its keys"""
+    keys = {
+        'hourly_logins': [events['login_time'].dt.floor('h').rename('hour_start')],
+        'user_daily': [events['login_time'].dt.floor('D').rename('date'), events['user_id']],
+        'show_daily': [events['login_time'].dt.floor('D').rename('date'), events['content_watched'].rename('show_id')],
+    }[table]
+    grouped = events['total_watch_time'].groupby(keys)
+    return pd.DataFrame({
+        'events': grouped.size(),
+        'watch_time': grouped.sum(),
+        'watch_time_count': grouped.count(),
+    }).reset_index().sort_values(ROLLUPS[table], ignore_index=True)
+
+
+def split(events: pd.DataFrame, n: int):
+    return [events.iloc[rows] for rows in np.array_split(np.arange(len(events)), n)]
+
+
+def assert_matches_events(store: RollupStore, events: pd.DataFrame) -> None:
+    for table in ROLLUPS:
+        rolled = store.read(table).sort_values(ROLLUPS[table], ignore_index=True)
+        expected = exact(events, table)
+        pd.testing.assert_frame_equal(rolled[expected.columns], expected, check_dtype=False)
+
+
+@pytest.fixture
+def events():
+    events = make_events(5_000, n_users=100, days=5)
+    # Events without a watch time count as events but not in the watch time mean
+    events.loc[events.index % 11 == 0, 'total_watch_time'] = np.nan
+    return events
+
+
+def test_batches_add_up_to_the_events(tmp_path, events):
+    store = RollupStore(str(tmp_path), max_parts=1_000)
+    for batch in split(events.sample(frac=1, random_state=0), 8):
+        store.append(batch)
+    assert len(store.tables['hourly_logins']._live_files(store.days()[0])) > 1
+    assert_matches_events(store, events)
+
+
+def test_compaction_keeps_the_totals(tmp_path, events):
+    store = RollupStore(str(tmp_path), max_parts=3)
+    for batch in split(events, 10):
+        store.append(batch)
+    assert all(len(store.tables['hourly_logins']._live_files(day)) < 3 for day in store.days())
+    store.compact_all()
+    assert all(len(store.tables['show_daily']._live_files(day)) == 1 for day in store.days('show_daily'))
+    # A fresh reader and the one that wrote the files agree
+    assert_matches_events(store, events)
+    assert_matches_events(RollupStore(str(tmp_path)), events)
+
+
+def test_backfill_rebuilds_from_the_event_store(tmp_path, events):
+    write_events(events, str(tmp_path / 'events'))
+    store = RollupStore(str(tmp_path / 'rollups'))
+    # Rollups of a first, partial ingest are replaced rather than added to
+    store.append(events.iloc[:100])
+    assert backfill(store, events_root=str(tmp_path / 'events'), batch_size=700) == len(events)
+    assert_matches_events(store, events)
+    assert store.latest_hour() == events['login_time'].max().floor('h')
+
+
+def test_read_since_a_day(tmp_path, events):
+    store = RollupStore(str(tmp_path))
+    store.append(events)
+    since = store.days()[2]
+    recent = events[events['login_time'].dt.date >= since]
+    assert store.read('hourly_logins', since=since)['events'].sum() == len(recent)
+    assert store.read('hourly_logins', since=store.days()[-1] + pd.Timedelta(days=1)).empty
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_events
+from storage.sketches import EventSketch, HyperLogLog, SketchStore, SpaceSaving
+
+
+def ids(start: int, stop: int) -> pd.Series:
+    return pd.Series(np.char.add('u', np.arange(start, stop).astype(str)))
+
+
+@pytest.mark.parametrize('distinct', [10, 1_000, 40_000, 300_000])
+def test_hyperloglog_estimate_within_its_relative_error(distinct):
+    hll = HyperLogLog(12).add(ids(0, distinct))
+    # Three standard errors, the hashes are fixed so this never flakes
+    assert abs(hll.estimate() / distinct - 1) < 3 * hll.relative_error
+
+
+def test_hyperloglog_merge_is_the_sketch_of_the_union():
+    left = HyperLogLog(12).add(ids(0, 60_000))
+    right = HyperLogLog(12).add(ids(40_000, 100_000))
+    union = HyperLogLog(12).add(ids(0, 100_000))
+    np.testing.assert_array_equal(left.merge(right).registers, union.registers)
+    # Repeated and missing values change nothing
+    np.testing.assert_array_equal(union.add(pd.Series(['u5', None, 'u7'])).registers, union.registers)
+    with pytest.raises(ValueError):
+        left.merge(HyperLogLog(10))
+
+
+def test_hyperloglog_categoricals_hash_like_their_values():
+    values = ids(0, 5_000)
+    np.testing.assert_array_equal(HyperLogLog(10).add(values).registers,
+                                  HyperLogLog(10).add(values.astype('category')).registers)
+
+
+def zipf_batches(n_batches: int, size: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [pd.Series(np.char.add('s', (rng.zipf(1.3, size) % 2_000).astype(str))) for _ in range(n_batches)]
+
+
+def test_space_saving_bounds_bracket_the_true_counts_after_merges():
+    batches = zipf_batches(12, 5_000)
+    true_counts = pd.concat(batches).value_counts()
+    # Small sketches so every add and merge truncates
+    sketches = [SpaceSaving(50).add(batch) for batch in batches]
+    merged = sketches[0]
+    for sketch in sketches[1:]:
+        merged = merged.merge(sketch)
+
+    assert merged.total == true_counts.sum()
+    assert len(merged.counts) <= 50
+    top = merged.top(50)
+    truth = true_counts.reindex(top['item']).fillna(0).to_numpy()
+    assert (top['lower'].to_numpy() <= truth).all()
+    assert (truth <= top['count'].to_numpy()).all()
+    assert (top['count'] - top['lower']).max() <= merged.max_error <= merged.total / 50
+    # Every item more frequent than the floor is kept
+    assert set(true_counts[true_counts > merged.floor].index) <= set(merged.counts.index)
+    assert list(top['item'][:3]) == list(true_counts.index[:3])
+
+
+def test_space_saving_is_exact_below_capacity():
+    batch = zipf_batches(1, 2_000)[0]
+    sketch = SpaceSaving(10_000).add(batch).add(batch)
+    top = sketch.top(5)
+    assert sketch.max_error == 0
+    assert (top['count'] == top['lower']).all()
+    assert top['count'].tolist() == (batch.value_counts() * 2).head(5).tolist()
+
+
+def test_event_sketch_save_load_round_trip(tmp_path):
+    events = make_events(5_000, n_users=500, days=1)
+    events.loc[events.index % 9 == 0, 'content_watched'] = np.nan
+    sketch = EventSketch.from_events(events)
+    path = str(tmp_path / 'sketch.npz')
+    sketch.save(path, replaces=['part-1.npz'])
+    loaded = EventSketch.load(path)
+
+    assert loaded.events == sketch.events == len(events)
+    np.testing.assert_array_equal(loaded.users.registers, sketch.users.registers)
+    np.testing.assert_array_equal(loaded.genres.registers, sketch.genres.registers)
+    assert loaded.users.precision == sketch.users.precision
+    pd.testing.assert_series_equal(loaded.shows.counts, sketch.shows.counts, check_index_type=False)
+    pd.testing.assert_series_equal(loaded.shows.errors, sketch.shows.errors, check_index_type=False)
+    assert (loaded.shows.floor, loaded.shows.total, loaded.shows.capacity) == \
+        (sketch.shows.floor, sketch.shows.total, sketch.shows.capacity)
+    assert SketchStore(str(tmp_path))._read_replaces(path) == ['part-1.npz']
+
+
+def test_store_window_matches_the_events(tmp_path):
+    events = make_events(20_000, n_users=2_000, days=10)
+    store = SketchStore(str(tmp_path), max_parts=3)
+    for rows in np.array_split(np.arange(len(events)), 7):
+        store.append(events.iloc[rows])
+
+    recent = events[events['login_time'].dt.date >= store.days()[-3]]
+    window = store.window(3)
+    assert window.events == len(recent)
+    assert abs(window.users.estimate() / recent['user_id'].nunique() - 1) < 3 * window.users.relative_error
+    assert round(window.genres.estimate()) == recent['genres_watched'].nunique()
+    assert store.window().events == len(events)
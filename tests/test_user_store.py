@@ -0,0 +1,25 @@
+import pytest
+
+from benchmarks.synthetic import make_users
+from storage.user_store import UserStore, read_users
+
+
+def test_import_csv_maps_the_legacy_genre_column(tmp_path):
+    users = make_users(20).drop(columns='churn').rename(columns={'preferred_genre': 'preferred_genres'})
+    users.to_csv(tmp_path / 'users.csv', index=False)
+    store = UserStore(str(tmp_path / 'users.db'))
+    assert store.import_csv(str(tmp_path / 'users.csv')) == 20
+
+    imported = read_users(str(tmp_path / 'users.db'))
+    assert imported['preferred_genre'].astype(object).tolist() == users['preferred_genres'].tolist()
+    assert (imported['churn'] == 'no_churn').all()
+    # Already imported users are skipped
+    assert store.import_csv(str(tmp_path / 'users.csv')) == 0
+
+
+def test_import_csv_rejects_missing_columns(tmp_path):
+    make_users(5).drop(columns=['country', 'preferred_genre']).to_csv(tmp_path / 'users.csv', index=False)
+    store = UserStore(str(tmp_path / 'users.db'))
+    with pytest.raises(ValueError, match='country'):
+        store.import_csv(str(tmp_path / 'users.csv'))
+    assert read_users(str(tmp_path / 'users.db')).empty
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import dashboard_data
+from dashboard_data import DashboardData
+from storage.watch import FileWatcher
+
+
+def touch(path, text: str) -> None:
+    with open(path, 'w') as f:
+        f.write(text)
+    # mtime resolution differs between filesystems, the size changes with every write here
+    os.utime(path, ns=(os.stat(path).st_mtime_ns + 1_000_000, os.stat(path).st_mtime_ns + 1_000_000))
+
+
+def test_change_is_reported_until_committed(tmp_path):
+    path = tmp_path / 'file.csv'
+    touch(path, 'a')
+    watcher = FileWatcher(str(path))
+    assert not watcher.changed()
+
+    touch(path, 'ab')
+    assert watcher.changed()
+    assert watcher.changed()
+    watcher.commit()
+    assert not watcher.changed()
+
+
+def test_commit_keeps_changes_made_after_the_check(tmp_path):
+    path = tmp_path / 'file.csv'
+    touch(path, 'a')
+    watcher = FileWatcher(str(path))
+    touch(path, 'ab')
+    assert watcher.changed()
+    # Written while the caller reloads the previous version
+    touch(path, 'abc')
+    watcher.commit()
+    assert watcher.changed()
+
+
+def test_created_and_removed_files_are_changes(tmp_path):
+    path = tmp_path / 'file.csv'
+    watcher = FileWatcher(str(path))
+    touch(path, 'a')
+    assert watcher.changed()
+    watcher.commit()
+    os.remove(path)
+    assert watcher.changed()
+
+
+def test_failed_reload_is_retried_on_the_next_refresh(tmp_path, monkeypatch):
+    path = tmp_path / 'shows.csv'
+    touch(path, 'v1')
+    failures = []
+
+    def loader(path):
+        with open(path) as f:
+            text = f.read()
+        if failures:
+            raise failures.pop()
+        return {'text': text}
+
+    monkeypatch.setattr(dashboard_data, 'FILE_RESOURCES', {'shows': (str(path), loader)})
+    data = DashboardData(refresh_interval=0)
+    assert data.get('shows') == {'text': 'v1'}
+
+    touch(path, 'v2')
+    failures.append(OSError('half written'))
+    with pytest.raises(OSError):
+        data.refresh(force=True)
+    assert data.get('shows') == {'text': 'v1'}
+    assert data.version == 0
+
+    assert data.refresh(force=True)
+    assert data.get('shows') == {'text': 'v2'}
+    assert data.version == 1
+    assert not data.refresh(force=True)
+
+
+def test_only_the_users_database_watches_a_wal(tmp_path, monkeypatch):
+    monkeypatch.setattr(dashboard_data, 'FILE_RESOURCES', {
+        'shows': (str(tmp_path / 'shows.csv'), lambda path: {}),
+        'users': (dashboard_data.USERS_DB, lambda path: {}),
+    })
+    data = DashboardData()
+    data.get('shows')
+    data.get('users')
+    assert data._watchers['shows'].paths == (str(tmp_path / 'shows.csv'),)
+    assert data._watchers['users'].paths == (dashboard_data.USERS_DB, f'{dashboard_data.USERS_DB}-wal')
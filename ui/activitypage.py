@@ -1,92 +1,217 @@
+import requests
+from datetime import datetime
 import streamlit as st
 import plotly.graph_objects as go
 
-from features.show_time import predicted_hourly_user_activity
-from features.average_watchtime import average_watchtime_for_7_days
+import config
+
+from features.show_time import country_shares
+from features.average_watchtime import daily_watchtime
 from features.top_shows import get_top_watched_shows_last_week
+from precompute import Job
+from profiling import timer
+
+BREAKDOWNS = {'None': None, 'Country': 'country', 'Subscription': 'subscription_type'}
+STATISTICS = {'Average': 'mean', 'Median': 'p50', 'P90': 'p90'}
+HORIZONS = {'Today': 1, 'Next 7 days': 7}
+
+# Page argument -> dashboard resource, loaded lazily by main.py
+REQUIRES = {
+    'events_df': 'recent_events',
+    'show_catalog': 'shows',
+    'users_df': 'users',
+    'forecast': 'forecast',
+    'rollups': 'rollups',
+}
+
+def watchtime_trends(events_df, users_df, rollups=None):
+    """
+    Every frame the watchtime chart can show.
 
-def activitypage(events_df, shows_df, timing_model):
+    Returns:
+        dict (days, breakdown column or None, statistic column) -> daily_watchtime frame
+    """
+    trends = {}
+    for days in config.TREND_WINDOWS:
+        for by_column in BREAKDOWNS.values():
+            by = [by_column] if by_column else []
+            # One frame has every statistic
+            frame = daily_watchtime(events_df, days=days, users_df=users_df, by=by)
+            for column in STATISTICS.values():
+                trends[days, by_column, column] = frame
+            if rollups is not None:
+                trends[days, by_column, 'mean'] = daily_watchtime(rollups, days=days, users_df=users_df, by=by, percentiles=())
+    return trends
+
+def top_shows_last_week(events_df, show_catalog, rollups=None):
+    """The top shows table, read from the rollups when they are enabled"""
+    return get_top_watched_shows_last_week(rollups if rollups is not None else events_df, show_catalog)
+
+# Job name -> precompute job, run in the background when PRECOMPUTE_ENABLED=1. The forecast itself is a
+# table lookup, the job only keeps the country shares it is split by.
+PRECOMPUTE_JOBS = {
+    'forecast': Job({'events_df': 'recent_events', 'users_df': 'users'}, country_shares, cadence=300),
+    'watchtime': Job({'events_df': 'recent_events', 'users_df': 'users', 'rollups': 'rollups'}, watchtime_trends, cadence=60),
+    'top_shows': Job({'events_df': 'recent_events', 'show_catalog': 'shows', 'rollups': 'rollups'}, top_shows_last_week, cadence=60),
+}
+
+def approximate_reach(sketches, days=7):
+    """Distinct viewers and genres of the last days, estimated from the ingest sketches"""
+    window = sketches.window(days)
+    users_col, genres_col, events_col = st.columns(3)
+    users_col.metric(f"Unique viewers ({days} days)", f"≈ {window.users.estimate():,.0f}",
+                     help=f"HyperLogLog estimate, within ±{2 * window.users.relative_error:.1%} 95% of the time")
+    genres_col.metric(f"Genres watched ({days} days)", f"≈ {window.genres.estimate():,.0f}",
+                      help=f"HyperLogLog estimate, within ±{2 * window.genres.relative_error:.1%} 95% of the time")
+    events_col.metric(f"Events ({days} days)", f"{window.events:,}")
+
+@st.fragment(run_every=5)
+def live_panel():
+    """Live counters from the server's /metrics/live endpoint, refreshed on its own every few seconds"""
+    try:
+        live = requests.get(f"{config.LIVE_METRICS_URL}/metrics/live", timeout=1).json()
+    except (requests.RequestException, ValueError):
+        st.caption("Live metrics unavailable")
+        return
+    if 'events_per_second' not in live:
+        st.caption(live.get('message', "Live metrics unavailable"))
+        return
+    events_col, users_col, total_col = st.columns(3)
+    events_col.metric("Events / sec", f"{live['events_per_second']:.1f}")
+    users_col.metric(f"Active users ({live['active_users_window_minutes']} min)", live['active_users'])
+    total_col.metric("Events since server start", live['total_events'])
+
+def activitypage(events_df, show_catalog, users_df, forecast, rollups=None, snapshots=None, sketches=None):
     """
     This page will have 3 components
      - A graph that shows how many people will arrive in the 24 hours. Each hour will have its own vertical line. Use color green for all. This will be in the top left corner
+       The horizon (today or the next 7 days) and a country can be picked above it, a country's forecast is its share of last week's logins.
      - A line that shows total average watchtime. The x axis should be the dates from the tuple and y axis should be time in minutes. Use red color for line. This is in top right.
+       The window (7/30/90 days), a country or subscription breakdown and the statistic (average, p50, p90) can be picked above it.
      - A table that uses function get_top_watched_shows_last_week to shows the top watched shows. 2 columns, show name and genres( the fucntion will return list of genres). This is in bottom full span
+    When LIVE_METRICS_URL is set, live counters from the server are shown under the title.
+    When rollups are enabled the average watchtime and the top shows are read from them instead of the events.
+    With snapshots of the PRECOMPUTE_JOBS (job name -> Snapshot) the page renders those instead of reading the events.
+    With sketches (approximate mode) the top shows come from them, and estimated distinct viewers and genres are shown.
     
     """
-    # Set page to wide mode
-    st.set_page_config(layout="wide",)
-    
     st.title("User Activity Dashboard")
     
+    if config.LIVE_METRICS_URL:
+        live_panel()
+    if sketches is not None and not sketches.days():
+        st.info("No sketches yet, showing exact results. Run `python -m storage.sketches backfill` to sketch the stored events.")
+        sketches = None
+    if sketches is not None:
+        approximate_reach(sketches)
+    
     # Create top row with two columns
     top_left, top_right = st.columns(2)
     
     with top_left:
-        # Top left: Hourly prediction graph
-        hourly_data = predicted_hourly_user_activity(events_df, timing_model)
+        # Top left: Hourly prediction graph, looked up in the precomputed forecast table
+        horizon_col, country_col = st.columns(2)
+        horizon = horizon_col.selectbox("Horizon", list(HORIZONS))
+        shares = snapshots['forecast'].value if snapshots else country_shares(events_df, users_df)
+        country = country_col.selectbox("Country", ['All', *shares.index])
+        scale = 1.0 if country == 'All' else shares[country]
+
+        forecast_data = forecast.next_days(datetime.now(), days=HORIZONS[horizon], scale=scale)
+        hourly_data = forecast_data['predicted_users'].tolist()
+        if HORIZONS[horizon] == 1:
+            x_values, x_title = list(range(1,25)), "Hour of Day"
+            xaxis = dict(tickmode='linear', dtick=1, tickangle=0)  # Keep x-axis labels horizontal
+        else:
+            x_values, x_title = forecast_data['time'], "Time"
+            xaxis = dict(tickangle=0)
         
-        fig1 = go.Figure(data=[
-            go.Bar(
-                x=list(range(1,25)),
-                y=hourly_data,
-                marker_color='green',
-                name='Predicted Users'
-            )
-        ])
+        with timer('activitypage.forecast_figure'):
+            fig1 = go.Figure(data=[
+                go.Bar(
+                    x=x_values,
+                    y=hourly_data,
+                    marker_color='green',
+                    name='Predicted Users'
+                )
+            ])
         
-        # Calculate dynamic y-axis range with padding
-        y_min, y_max = min(hourly_data), max(hourly_data)
-        y_range = y_max - y_min
-        padding = max(y_range * 0.1, 100)  # 10% padding or minimum 100 users
+            # Calculate dynamic y-axis range with padding
+            y_min, y_max = min(hourly_data), max(hourly_data)
+            y_range = y_max - y_min
+            padding = max(y_range * 0.1, 100 * scale)  # 10% padding or minimum 100 users (scaled for a country)
         
-        fig1.update_layout(
-            title="Predicted Hourly User Activity",
-            xaxis_title="Hour of Day",
-            yaxis_title="Number of Users",
-            xaxis=dict(
-                tickmode='linear', 
-                dtick=1,
-                tickangle=0  # Keep x-axis labels horizontal
-            ),
-            yaxis=dict(
-                range=[max(0, y_min - padding), y_max + padding]
-            ),
-            showlegend=False
-        )
+            fig1.update_layout(
+                title="Predicted Hourly User Activity" + ("" if country == 'All' else f" ({country})"),
+                xaxis_title=x_title,
+                yaxis_title="Number of Users",
+                xaxis=xaxis,
+                yaxis=dict(
+                    range=[max(0, y_min - padding), y_max + padding]
+                ),
+                showlegend=False
+            )
         
-        st.plotly_chart(fig1, use_container_width=True)
+            st.plotly_chart(fig1, use_container_width=True)
+        if snapshots:
+            st.caption(snapshots['forecast'].describe())
     
     with top_right:
-        # Top right: Average watchtime line chart
-        watchtime_data = average_watchtime_for_7_days(events_df)
+        # Top right: Watchtime trend line chart
+        window_col, breakdown_col, stat_col = st.columns(3)
+        days = window_col.selectbox("Window", config.TREND_WINDOWS, format_func=lambda d: f"{d} days")
+        breakdown = breakdown_col.selectbox("Breakdown", list(BREAKDOWNS))
+        statistic = stat_col.selectbox("Statistic", list(STATISTICS))
+
+        by = [BREAKDOWNS[breakdown]] if BREAKDOWNS[breakdown] else []
+        column = STATISTICS[statistic]
+        if snapshots:
+            watchtime_data = snapshots['watchtime'].value[days, BREAKDOWNS[breakdown], column]
+        elif rollups is not None and column == 'mean':
+            watchtime_data = daily_watchtime(rollups, days=days, users_df=users_df, by=by, percentiles=())
+        else:
+            watchtime_data = daily_watchtime(events_df, days=days, users_df=users_df, by=by)
         
-        fig2 = go.Figure(data=[
-            go.Scatter(
-            x=[item[0] for item in watchtime_data],
-            y=[item[1] for item in watchtime_data],
-            mode='lines+markers',
-            line=dict(color='red'),
-            name='Average Watchtime'
-            )
-        ])
+        with timer('activitypage.watchtime_figure'):
+            if by:
+                fig2 = go.Figure(data=[
+                    go.Scatter(
+                    x=group["date"],
+                    y=group[column],
+                    mode='lines+markers',
+                    name=str(name)
+                    )
+                    for name, group in watchtime_data.groupby(by[0])
+                ])
+            else:
+                fig2 = go.Figure(data=[
+                    go.Scatter(
+                    x=watchtime_data["date"],
+                    y=watchtime_data[column],
+                    mode='lines+markers',
+                    line=dict(color='red'),
+                    name='Average Watchtime'
+                    )
+                ])
         
-        # Calculate dynamic y-axis range with padding
-        y_values = [item[1] for item in watchtime_data]
-        y_min, y_max = min(y_values), max(y_values)
-        y_range = y_max - y_min
-        padding = max(y_range * 0.2, 0.2)  # 20% padding or minimum 5 minutes
+            # Calculate dynamic y-axis range with padding
+            y_values = watchtime_data[column] if len(watchtime_data) else [0]
+            y_min, y_max = min(y_values), max(y_values)
+            y_range = y_max - y_min
+            padding = max(y_range * 0.2, 0.2)  # 20% padding or minimum 5 minutes
         
-        fig2.update_layout(
-            title="7-Day Average Watchtime",
-            xaxis_title="Date",
-            yaxis_title="Time (minutes)",
-            yaxis=dict(
-            range=[y_min - padding, y_max + padding]
-            ),
-            showlegend=False
-        )
+            fig2.update_layout(
+                title=f"{days}-Day {statistic} Watchtime",
+                xaxis_title="Date",
+                yaxis_title="Time (minutes)",
+                yaxis=dict(
+                range=[y_min - padding, y_max + padding]
+                ),
+                showlegend=bool(by)
+            )
         
-        st.plotly_chart(fig2, use_container_width=True)
+            st.plotly_chart(fig2, use_container_width=True)
+        if snapshots:
+            st.caption(snapshots['watchtime'].describe())
     
     # Bottom: Top shows table (80% width)
     st.subheader("Top Watched Shows")
@@ -95,7 +220,12 @@ def activitypage(events_df, shows_df, timing_model):
     col1, col2, col3 = st.columns([0.1, 0.8, 0.1])
     
     with col2:
-        top_shows = get_top_watched_shows_last_week(events_df, shows_df)
+        if sketches is not None:
+            top_shows = get_top_watched_shows_last_week(sketches, show_catalog)
+        elif snapshots:
+            top_shows = snapshots['top_shows'].value
+        else:
+            top_shows = top_shows_last_week(events_df, show_catalog, rollups)
         
         # Format data for display
         show_data = []
@@ -105,4 +235,8 @@ def activitypage(events_df, shows_df, timing_model):
                 "Genres": ", ".join(show[1])
             })
         
-        st.dataframe(show_data, use_container_width=True)
\ No newline at end of file
+        st.dataframe(show_data, use_container_width=True)
+        if sketches is not None:
+            st.caption(f"Approximate ranking (Space-Saving): watch counts are at most {sketches.window(7).shows.max_error:,} above the true counts")
+        elif snapshots:
+            st.caption(snapshots['top_shows'].describe())
\ No newline at end of file
@@ -4,16 +4,35 @@ import plotly.graph_objects as go
 import pandas as pd
 
 from features.churn import total_and_categorial_churn
+from features.churn_query import query_at_risk
+from features.user_table import UserTable
+from precompute import Job
+from profiling import timer
 
-def churnpage(event_df, users_df, churn_model, churn_reason_model):
-    """
-    This is a streamlit page. The background color should be white and the default color of text should be black.
-    The components in this page are
-        - A donut chart in the top left area(center) and inside it should be percentage
-        - A graph which has vertical graph lines in 4 category(name them as 1, 2 ,3 ,4) and the y axis should be percentage from 0 to 100
-        - The bottom will have a table. For now have 10 people from 1 to 10. The table should be scrollable and it should only take 40 percentage of screen height and 80 percentage of screen width
-    """
-    
+# Page argument -> dashboard resource, loaded lazily by main.py
+REQUIRES = {
+    'event_df': 'events',
+    'users_df': 'users',
+    'churn_model': 'churn_model',
+    'churn_reason_model': 'churn_reason_model',
+    'churn_state': 'churn_state',
+}
+
+# With PRECOMPUTE_ENABLED=1 the page renders the 'churn' job's snapshot, only the at-risk table reads the users
+SNAPSHOT_REQUIRES = {
+    'users_df': 'users',
+}
+
+# With CHURN_SCORING=sharded the page only reads the results table written by features/churn_scoring.py
+RESULTS_REQUIRES = {
+    'churn_results': 'churn_results',
+    'users_df': 'users',
+}
+# At-risk users shown per table page
+PAGE_SIZE = 100
+SORTS = {'Highest probability': 'desc', 'Lowest probability': 'asc', 'User ID': 'user_id'}
+
+def _apply_style():
     # Apply custom CSS for white background, black text, and full screen utilization
     st.markdown("""
         <style>
@@ -55,77 +74,50 @@ def churnpage(event_df, users_df, churn_model, churn_reason_model):
         }
         </style>
         """, unsafe_allow_html=True)
-    
-    st.markdown('<h1 style="color: black; margin-bottom: 1rem;">Churn Analysis Dashboard</h1>', unsafe_allow_html=True)
-    
-    col1, col2 = st.columns([1, 1], gap="medium")
 
-    # using calculate churn function from features find the churn stats
-    total_churn_percent, user_data = total_and_categorial_churn(event_df, users_df, churn_model, churn_reason_model)
-    each_type_of_user = {}
-    for user_id, reason in user_data:
-        if reason not in each_type_of_user:
-            each_type_of_user[reason] = 1
-        else:
-            each_type_of_user[reason] += 1
- 
-    # The data will be used by the bar chart (top right).
-    if len(user_data) > 0:
-        category_data = {
-            'Category': [key for key in each_type_of_user.keys()],
-            'Percentage': [val*100/len(user_data) for val in each_type_of_user.values()]
-        }
-    else:
-        category_data = {
-            'Category': ['No Risk Users'],
-            'Percentage': [100]
-        }
-
-   # Data for the table at bottom. The keys ('User ID, Reason..etc) are column names
-    bottom_table_data = {
-        'User ID': [user[0] for user in user_data],
-        'Reason': [user[1] for user in user_data]
-    }
+def _overview(total_churn_percent, category_data, total_users):
+    """Donut chart of the overall churn rate (top left) and bar chart of the reasons (top right)"""
+    col1, col2 = st.columns([1, 1], gap="medium")
 
     # DONUT CHART (Left column)
     with col1:
         st.markdown('<h3 style="color: black;">Overall Churn Rate</h3>', unsafe_allow_html=True)
         
-        # Get total user count for hover display
-        total_users = len(event_df['user_id'].unique()) if not event_df.empty else 1
+        # Total user count for hover display
         at_risk_count = int(total_churn_percent * total_users)
         safe_count = total_users - at_risk_count
         
         # Create donut chart
-        fig_donut = go.Figure(data=[go.Pie(
-            labels=['At Risk', 'Safe'], 
-            values=[total_churn_percent * 100, 100 - (total_churn_percent * 100)],
-            hole=.6,
-            marker_colors=['#ff6b6b', '#51cf66'],
-            hovertemplate='<b>%{label}</b><br>Count: %{customdata}<br>Percentage: %{percent}<extra></extra>',
-            customdata=[at_risk_count, safe_count]
-        )])
+        with timer('churnpage.donut_figure'):
+            fig_donut = go.Figure(data=[go.Pie(
+                labels=['At Risk', 'Safe'], 
+                values=[total_churn_percent * 100, 100 - (total_churn_percent * 100)],
+                hole=.6,
+                marker_colors=['#ff6b6b', '#51cf66'],
+                hovertemplate='<b>%{label}</b><br>Count: %{customdata}<br>Percentage: %{percent}<extra></extra>',
+                customdata=[at_risk_count, safe_count]
+            )])
         
-        # Add percentage text in the center
-        fig_donut.add_annotation(
-            text=f"{total_churn_percent*100}%",
-            x=0.5, y=0.5,
-            font_size=35,
-            font_color="black",
-            showarrow=False
-        )
+            # Add percentage text in the center
+            fig_donut.add_annotation(
+                text=f"{total_churn_percent*100}%",
+                x=0.5, y=0.5,
+                font_size=35,
+                font_color="black",
+                showarrow=False
+            )
         
-        fig_donut.update_layout(
-            showlegend=True,
-            height=300,
-            margin=dict(t=20, b=20, l=20, r=20),
-            paper_bgcolor='white',
-            plot_bgcolor='white',
-            font=dict(color='black', size=12),
-            legend=dict(font=dict(color='black'))
-        )
+            fig_donut.update_layout(
+                showlegend=True,
+                height=300,
+                margin=dict(t=20, b=20, l=20, r=20),
+                paper_bgcolor='white',
+                plot_bgcolor='white',
+                font=dict(color='black', size=12),
+                legend=dict(font=dict(color='black'))
+            )
         
-        st.plotly_chart(fig_donut, use_container_width=True)
+            st.plotly_chart(fig_donut, use_container_width=True)
     
     # VERTICAL BAR CHART (Right column)
     with col2:
@@ -134,40 +126,168 @@ def churnpage(event_df, users_df, churn_model, churn_reason_model):
         
         # Create vertical bar chart
         import pandas as pd
-        df_category = pd.DataFrame(category_data)
-        fig_bar = px.bar(
-            df_category,
-            x='Category',
-            y='Percentage',
-            labels={'Category': 'Risk Category', 'Percentage': 'Percentage (%)'},
-            color='Category',
-            color_discrete_sequence=['#51cf66', '#ffd43b', '#ff8787', '#ff6b6b']
-        )
+        with timer('churnpage.category_figure'):
+            df_category = pd.DataFrame(category_data)
+            fig_bar = px.bar(
+                df_category,
+                x='Category',
+                y='Percentage',
+                labels={'Category': 'Risk Category', 'Percentage': 'Percentage (%)'},
+                color='Category',
+                color_discrete_sequence=['#51cf66', '#ffd43b', '#ff8787', '#ff6b6b']
+            )
         
-        fig_bar.update_layout(
-            height=300,
-            yaxis=dict(range=[0, 100]),
-            showlegend=False,
-            paper_bgcolor='white',
-            plot_bgcolor='white',
-            font=dict(color='black'),
-            margin=dict(t=20, b=40, l=40, r=20)
-        )
+            fig_bar.update_layout(
+                height=300,
+                yaxis=dict(range=[0, 100]),
+                showlegend=False,
+                paper_bgcolor='white',
+                plot_bgcolor='white',
+                font=dict(color='black'),
+                margin=dict(t=20, b=40, l=40, r=20)
+            )
         
-        fig_bar.update_xaxes(showgrid=False, color='black')
-        fig_bar.update_yaxes(showgrid=True, gridcolor='lightgray', color='black')
+            fig_bar.update_xaxes(showgrid=False, color='black')
+            fig_bar.update_yaxes(showgrid=True, gridcolor='lightgray', color='black')
         
-        st.plotly_chart(fig_bar, use_container_width=True)
-    
-    # USER TABLE (Bottom section) - fit remaining height
+            st.plotly_chart(fig_bar, use_container_width=True)
+
+def _category_data(reason_counts, at_risk_count):
+    """The data used by the bar chart (top right): share of at-risk users per reason"""
+    if at_risk_count > 0:
+        return {
+            'Category': list(reason_counts.index),
+            'Percentage': list(reason_counts * 100 / at_risk_count)
+        }
+    return {
+        'Category': ['No Risk Users'],
+        'Percentage': [100]
+    }
+
+def _users_at_risk(results, users_df, reasons):
+    """
+    Table of at-risk users (bottom). Filters, sorting and paging are applied by query_at_risk,
+    so only the current page of rows is ever sent to the browser.
+    """
     st.markdown('<h3 style="color: black; margin-top: 1rem;">Users at Risk</h3>', unsafe_allow_html=True)
+
+    users = UserTable.wrap(users_df)
+    reason_col, country_col, subscription_col, sort_col = st.columns(4)
+    reason = reason_col.selectbox("Reason", ['All', *reasons])
+    country = country_col.selectbox("Country", ['All', *sorted(users.frame['country'].dropna().unique())])
+    subscription = subscription_col.selectbox("Subscription", ['All', *sorted(users.frame['subscription_type'].dropna().unique())])
+    sort = sort_col.selectbox("Sort by", list(SORTS))
+
+    filters = dict(
+        reason=None if reason == 'All' else reason,
+        country=None if country == 'All' else country,
+        subscription_type=None if subscription == 'All' else subscription,
+        sort=SORTS[sort],
+    )
+    # Start from the first page whenever the filters change
+    if st.session_state.get('churn_table_filters') != filters:
+        st.session_state['churn_table_filters'] = filters
+        st.session_state['churn_table_page'] = 1
+    page = st.session_state.get('churn_table_page', 1)
+
+    with timer('churnpage.users_table'):
+        total, df_users = query_at_risk(results, users, offset=(page - 1) * PAGE_SIZE, limit=PAGE_SIZE, **filters)
+        df_users = df_users.rename(columns={
+            'user_id': 'User ID',
+            'reason': 'Reason',
+            'churn_probability': 'Churn Probability',
+            'country': 'Country',
+            'subscription_type': 'Subscription',
+        })
+
+        # Display table with remaining height
+        st.dataframe(
+            df_users,
+            height=280,  # Fixed height to fit in remaining space
+            use_container_width=True,
+            hide_index=True
+        )
+
+    pages = max((total + PAGE_SIZE - 1) // PAGE_SIZE, 1)
+    if page > pages:
+        # The results shrank under the current page (e.g. a new scoring run), go to the last page
+        st.session_state['churn_table_page'] = pages
+        st.rerun()
+    st.number_input(f"Page (of {pages}, {total} users)", min_value=1, max_value=pages, step=1, key='churn_table_page')
+
+def churn_summary(event_df, users_df, churn_model, churn_reason_model, churn_state=None):
+    """
+    Everything churnpage shows: the churn rate, the at-risk users and how many there are per reason.
+
+    Returns:
+        dict with 'churn_percentage', 'at_risk' (DataFrame of at-risk users), 'reason_counts' and 'total_users'
+    """
+    # using calculate churn function from features find the churn stats
+    total_churn_percent, user_data = total_and_categorial_churn(event_df, users_df, churn_model, churn_reason_model, churn_state)
+    return {
+        'churn_percentage': total_churn_percent,
+        'at_risk': user_data,
+        # Users per reason, in order of first appearance so the bar colors stay put
+        'reason_counts': user_data['reason'].value_counts(sort=False),
+        # Total user count for hover display
+        'total_users': event_df.frame['user_id'].nunique() if len(event_df) else 1,
+    }
+
+# Job name -> precompute job, run in the background when PRECOMPUTE_ENABLED=1 (memory scoring only)
+PRECOMPUTE_JOBS = {
+    'churn': Job(REQUIRES, churn_summary, cadence=300),
+}
+
+def churnpage(event_df=None, users_df=None, churn_model=None, churn_reason_model=None, churn_state=None, snapshot=None, sketches=None):
+    """
+    This is a streamlit page. The background color should be white and the default color of text should be black.
+    The components in this page are
+        - A donut chart in the top left area(center) and inside it should be percentage
+        - A graph which has vertical graph lines in 4 category(name them as 1, 2 ,3 ,4) and the y axis should be percentage from 0 to 100
+        - The bottom will have a table. For now have 10 people from 1 to 10. The table should be scrollable and it should only take 40 percentage of screen height and 80 percentage of screen width
+    With a snapshot of the 'churn' precompute job the page renders it instead of scoring the users, and only
+    needs users_df (SNAPSHOT_REQUIRES).
+    With sketches (approximate mode) the total user count is their distinct user estimate.
+    """
     
-    # Convert mock data to DataFrame
-    df_users = pd.DataFrame(bottom_table_data)
+    _apply_style()
+    
+    st.markdown('<h1 style="color: black; margin-bottom: 1rem;">Churn Analysis Dashboard</h1>', unsafe_allow_html=True)
     
-    # Display table with remaining height
-    st.dataframe(
-        df_users,
-        height=280,  # Fixed height to fit in remaining space
-        use_container_width=True
-    )
\ No newline at end of file
+    if snapshot is not None:
+        summary = snapshot.value
+    else:
+        summary = churn_summary(event_df, users_df, churn_model, churn_reason_model, churn_state)
+    reason_counts = summary['reason_counts']
+    total_users = summary['total_users']
+    # Without sketches yet (e.g. before a backfill) the exact count stays
+    if sketches is not None and sketches.days():
+        distinct_users = sketches.window().users
+        total_users = round(distinct_users.estimate())
+        st.caption(f"Approximate: ≈ {total_users:,} users with events, within ±{2 * distinct_users.relative_error:.1%} 95% of the time (HyperLogLog)")
+
+    _overview(summary['churn_percentage'], _category_data(reason_counts, len(summary['at_risk'])), total_users)
+    
+    # USER TABLE (Bottom section) - fit remaining height
+    _users_at_risk(summary['at_risk'], users_df, reason_counts.index)
+    if snapshot is not None:
+        st.caption(snapshot.describe())
+
+def churnpage_from_results(churn_results, users_df):
+    """
+    Same page as churnpage, read from the latest sharded scoring run instead of scoring in the dashboard.
+    The charts come from the run's aggregate counts and the table scans the run one shard at a time.
+    """
+    _apply_style()
+
+    st.markdown('<h1 style="color: black; margin-bottom: 1rem;">Churn Analysis Dashboard</h1>', unsafe_allow_html=True)
+
+    if churn_results is None:
+        st.info("No churn scores yet. Run `python -m features.churn_scoring` to score the event store.")
+        return
+
+    reason_counts = churn_results.reason_counts
+    _overview(churn_results.churn_percentage, _category_data(reason_counts, len(churn_results)), churn_results.scored_users)
+
+    _users_at_risk(churn_results, users_df, reason_counts.index)
+    st.caption(f"Scored at {churn_results.manifest['created_at']} from events up to {churn_results.manifest['latest_event']}")
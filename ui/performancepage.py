@@ -0,0 +1,55 @@
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from profiling import profiler
+
+# Page argument -> dashboard resource, the timings live in this process so nothing is loaded
+REQUIRES = {}
+
+def performancepage():
+    """
+    This page shows where render time goes, from the timings recorded by the profiling layer
+    (loads, datetime parsing, groupbys, model calls and figure building) since the dashboard started
+     - A horizontal bar chart of the total time spent per call site. This is on top
+     - A table with calls, rows, mean / p50 / p90 / p99 / max latency and rows per second for each call site
+    Only registered by main.py when PROFILING_ENABLED is set.
+    """
+    st.title("Performance")
+
+    timings = pd.DataFrame(profiler.snapshot())
+    if timings.empty:
+        st.caption("Nothing recorded yet, open the other pages first")
+        return
+
+    fig = go.Figure(data=[
+        go.Bar(
+            x=timings['total_seconds'][::-1],
+            y=timings['name'][::-1],
+            orientation='h',
+            marker_color='steelblue',
+        )
+    ])
+    fig.update_layout(
+        title="Total Time per Call Site",
+        xaxis_title="Seconds",
+        height=max(300, 25 * len(timings)),
+        showlegend=False,
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+    table = pd.DataFrame({
+        'Call site': timings['name'],
+        'Calls': timings['calls'],
+        'Rows': timings['rows'].where(timings['rows'] > 0),
+        'Total (s)': timings['total_seconds'].round(3),
+    })
+    for label, column in [('Mean', 'mean_seconds'), ('P50', 'p50_seconds'), ('P90', 'p90_seconds'),
+                          ('P99', 'p99_seconds'), ('Max', 'max_seconds')]:
+        table[f'{label} (ms)'] = (timings[column] * 1000).round(2)
+    table['Rows / sec'] = (timings['rows'] / timings['total_seconds']).where(timings['rows'] > 0).round()
+    st.dataframe(table, use_container_width=True, hide_index=True)
+
+    if st.button("Reset timings"):
+        profiler.reset()
+        st.rerun()